@@ -1,102 +1,103 @@
-from pytubefix import YouTube
 import os
+import sqlite3
 import subprocess
 import argparse
-import shutil
+import atexit
 import sys
 
-
-def sanitize_title(title: str) -> str:
-    """Cria um nome de arquivo seguro para Windows."""
-    return "".join(c for c in title if c.isalnum() or c in (" ", ".", "_", "-")).strip()
-
-
-def stream_extension(stream) -> str:
-    """Obtém a extensão do stream a partir do mime_type (fallback para mp4)."""
-    try:
-        if stream.mime_type:
-            return stream.mime_type.split("/")[-1]
-    except Exception:
-        pass
-    return "mp4"
-
-
-def _resolve_ffmpeg():
-    p = shutil.which("ffmpeg")
-    if p:
-        return p
-    exe = "ffmpeg.exe" if os.name == "nt" else "ffmpeg"
-    if getattr(sys, "frozen", False):
-        base = os.path.dirname(sys.executable)
-    else:
-        base = os.getcwd()
-    local = os.path.join(base, exe)
-    if os.path.exists(local):
-        return local
-    return None
-
-def ffmpeg_merge(video_filename: str, audio_filename: str, output_filename: str, hide_console: bool = False):
-    ffmpeg_bin = _resolve_ffmpeg()
-    if not ffmpeg_bin:
-        raise RuntimeError("FFmpeg não encontrado. Instale e adicione ao PATH ou coloque ffmpeg.exe ao lado do executável.")
-    command = [
-        ffmpeg_bin,
-        "-y",
-        "-i",
-        video_filename,
-        "-i",
-        audio_filename,
-        "-c:v",
-        "copy",
-        "-c:a",
-        "aac",
-        "-strict",
-        "experimental",
-        output_filename,
-    ]
-    creationflags = subprocess.CREATE_NO_WINDOW if os.name == "nt" and hide_console else 0
-    subprocess.run(command, check=True, creationflags=creationflags, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-
-def ffmpeg_extract_audio(input_filename: str, audio_out_filename: str, hide_console: bool = False):
-    ffmpeg_bin = _resolve_ffmpeg()
-    if not ffmpeg_bin:
-        raise RuntimeError("FFmpeg não encontrado. Instale e adicione ao PATH ou coloque ffmpeg.exe ao lado do executável.")
-    command = [
-        ffmpeg_bin,
-        "-y",
-        "-i",
-        input_filename,
-        "-vn",
-        "-c:a",
-        "aac",
-        audio_out_filename,
-    ]
-    creationflags = subprocess.CREATE_NO_WINDOW if os.name == "nt" and hide_console else 0
-    subprocess.run(command, check=True, creationflags=creationflags, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-def baixar_video_youtube(url, modo_auto: bool = False, listar_apenas: bool = False, resolucao_especifica: str | None = None, saida_dir: str | None = None):
+from media import (
+    PLAN_SUFFIXES,
+    choose_container,
+    download_and_merge,
+    ffmpeg_extract_audio,
+    ffmpeg_merge,
+    remove_temp_files,
+    sanitize_title,
+    stream_extension,
+)
+from download_engine import DEFAULT_SEGMENTS, DEFAULT_SEGMENT_SIZE, download_pair, download_stream
+import adaptive
+from archive import DownloadArchive, get_default_archive, selection_key
+import content_cache
+from formats import FormatSelectorError, StreamIndex, parse_selector, stream_codecs
+from manifest_cache import resolve_video
+import metrics
+from metrics import job_scope
+from ratelimit import get_limiter, parse_rate, parse_schedule
+import retry
+import transport
+
+
+def _imprimir_progresso(baixados: int, total: int):
+    """Mostra o progresso combinado (bytes baixados / bytes totais) na mesma linha."""
+    mib = 1024 * 1024
+    print(f"\rProgresso: {baixados / total * 100:5.1f}% ({baixados / mib:.1f}/{total / mib:.1f} MiB)", end="", flush=True)
+    if baixados >= total:
+        print()
+
+
+def imprimir_ajuste(sp):
+    """Sink de métricas: mostra as conexões e o tamanho de faixa a que cada download chegou."""
+    if sp.phase != "download" or sp.outcome != "ok" or "connections" not in sp.attrs:
+        return
+    a = sp.attrs
+    print(
+        f"\nITAG {a.get('itag')}: {a['connections']} conexão(ões) (pico {a['peak_connections']}), "
+        f"faixas de {a['chunk_size'] / (1024 * 1024):.2f} MiB, {a['mib_s'] or 0:.2f} MiB/s"
+        + (f", {a['throttles']} resposta(s) de throttling" if a["throttles"] else "")
+        + (f", link renovado {a['renewals']} vez(es)" if a.get("renewals") else "")
+    )
+
+
+def baixar_video_youtube(url, modo_auto: bool = False, listar_apenas: bool = False, resolucao_especifica: str | None = None, saida_dir: str | None = None, segmentos: int = DEFAULT_SEGMENTS, tamanho_segmento: int = DEFAULT_SEGMENT_SIZE, merge_streaming: bool = True, usar_cache: bool = True, arquivo: DownloadArchive | None = None, forcar_mp4: bool = False, formato: str | None = None, perfil_audio: str | None = None, miniatura: bool = False, metadados: bool = False):
     """
     Baixa o vídeo do YouTube a partir da URL fornecida, permitindo a escolha da resolução
     e lidando com streams adaptativos (separados).
+
+    Com `arquivo`, os modos --auto e --res pulam vídeos já baixados com a mesma seleção
+    e registram cada download concluído. Faixas separadas são combinadas sem recodificar,
+    em MP4, WebM ou MKV conforme os codecs; `forcar_mp4` garante MP4 com áudio AAC.
+    `formato` é uma expressão de seleção (ex.: "bestvideo[height<=1080]+bestaudio/best")
+    que tem precedência sobre --res e --auto. `perfil_audio` (ver postprocess.AUDIO_PROFILES),
+    `miniatura` e `metadados` acrescentam passos de pós-processamento ao arquivo final.
     """
+    selecao = formato or resolucao_especifica
+    # Perfil de áudio e MP4 forçado geram outro arquivo: não contam como "já baixado"
+    chave_arquivo = selection_key(selecao, perfil_audio, forcar_mp4)
     try:
-        yt = YouTube(url)
+        if arquivo is not None and not listar_apenas and (modo_auto or selecao):
+            anterior = arquivo.lookup(url, chave_arquivo)
+            if anterior:
+                print(f"Já baixado anteriormente: '{anterior['output_path']}' (use --no-archive para baixar novamente)")
+                return
+
+        def registrar(caminho, *streams):
+            if arquivo is None or not (modo_auto or selecao):
+                return
+            try:
+                arquivo.record(url, chave_arquivo, caminho, [s.itag for s in streams])
+            except (OSError, sqlite3.Error) as e:
+                print(f"Aviso: não foi possível registrar no arquivo de downloads: {e}")
+
+        yt = resolve_video(url, use_cache=usar_cache)
         print(f"Título do vídeo: {yt.title}\n")
+        from postprocess import PostTask, finishing_steps, get_postprocessor
+
+        pos = finishing_steps(yt, perfil_audio, miniatura, metadados)
+
+        def pos_processar(caminho, has_video: bool = True):
+            # Downloads de um único stream: os passos rodam no pool e o CLI espera por eles
+            return get_postprocessor().submit(PostTask(pos, caminho, has_video=has_video)).result()
+
         base_title = sanitize_title(yt.title)
         out_dir = saida_dir or os.getcwd()
 
         print("Listando todos os streams disponíveis:")
-        # Use os filtros nativos do pytubefix para garantir listagem correta
-        progressive_streams = (
-            yt.streams.filter(progressive=True).order_by("resolution").desc()
-        )
-        video_only_streams = (
-            yt.streams.filter(only_video=True).order_by("resolution").desc()
-        )
-        audio_only_streams = (
-            yt.streams.filter(only_audio=True).order_by("abr").desc()
-        )
+        # Índice montado uma vez: listas já ordenadas da melhor para a pior opção
+        indice = StreamIndex.of(yt)
+        progressive_streams = indice.progressive
+        video_only_streams = indice.videos
+        audio_only_streams = indice.audios
 
         # Exibir streams progressivos
         if progressive_streams:
@@ -139,64 +140,83 @@ def baixar_video_youtube(url, modo_auto: bool = False, listar_apenas: bool = Fal
         if listar_apenas:
             return
 
+        if formato:
+            plano = indice.select(formato)
+            if plano is None:
+                print(f"Nenhum stream atende ao formato '{formato}'.")
+                return
+            kind, first, second = plano
+            if kind == "adaptive":
+                print(f"\nBaixando vídeo {first.resolution} (ITAG: {first.itag}) e áudio {second.abr} (ITAG: {second.itag}) em paralelo...")
+                try:
+                    output_filename = download_and_merge(
+                        first, second, out_dir, base_title, segmentos, tamanho_segmento, _imprimir_progresso, streaming=merge_streaming, require_mp4=forcar_mp4, steps=pos
+                    )
+                    print(f"Vídeo final combinado: '{output_filename}'")
+                    registrar(output_filename, first, second)
+                except subprocess.CalledProcessError as e:
+                    print(f"Erro ao combinar com FFmpeg: {e}")
+                return
+            filename = f"{base_title}{PLAN_SUFFIXES[kind]}.{stream_extension(first)}"
+            print(f"\nBaixando stream ITAG {first.itag} ({first.resolution or first.abr})...")
+            output_filename = pos_processar(download_stream(first, out_dir, filename, segmentos, tamanho_segmento), kind != "audio")
+            print("Download concluído com sucesso!")
+            registrar(output_filename, first)
+            return
+
         # Se o usuário pediu uma resolução específica, tentar baixar essa
         if resolucao_especifica:
-            target_video = None
-            for s in video_only_streams:
-                if s.resolution == resolucao_especifica:
-                    target_video = s
-                    break
+            target_video = indice.video_at(resolucao_especifica)
             if target_video:
-                vext = stream_extension(target_video)
-                video_filename = f"{base_title}_video_temp.{vext}"
-                print(
-                    f"\nBaixando vídeo {resolucao_especifica}: (ITAG: {target_video.itag})..."
-                )
-                target_video.download(output_path=out_dir, filename=video_filename)
-
                 # pegar melhor áudio
-                target_audio = audio_only_streams.first()
+                target_audio = indice.best_audio()
                 if target_audio:
-                    aext = stream_extension(target_audio)
-                    audio_filename = f"{base_title}_audio_temp.{aext}"
                     print(
-                        f"Baixando áudio: {target_audio.abr} (ITAG: {target_audio.itag})..."
+                        f"\nBaixando vídeo {resolucao_especifica} (ITAG: {target_video.itag}) e áudio {target_audio.abr} (ITAG: {target_audio.itag}) em paralelo..."
                     )
-                    target_audio.download(output_path=out_dir, filename=audio_filename)
+                    try:
+                        output_filename = download_and_merge(
+                            target_video, target_audio, out_dir, base_title, segmentos, tamanho_segmento, _imprimir_progresso, streaming=merge_streaming, require_mp4=forcar_mp4, steps=pos
+                        )
+                        print(f"Vídeo final combinado: '{output_filename}'")
+                        registrar(output_filename, target_video, target_audio)
+                    except subprocess.CalledProcessError as e:
+                        print(f"Erro ao combinar com FFmpeg: {e}")
+                    return
                 else:
                     # Fallback: extrai áudio do melhor progressivo
-                    best_prog = progressive_streams.first()
+                    vext = stream_extension(target_video)
+                    video_filename = f"{base_title}_video_temp.{vext}"
+                    best_prog = indice.best_progressive()
                     if best_prog:
                         prog_ext = stream_extension(best_prog)
                         prog_filename = f"{base_title}_prog_temp.{prog_ext}"
                         print(
-                            f"Nenhum áudio separado encontrado. Baixando progressivo {best_prog.resolution} para extrair áudio..."
+                            f"\nNenhum áudio separado encontrado. Baixando vídeo {resolucao_especifica} (ITAG: {target_video.itag}) e progressivo {best_prog.resolution} em paralelo para extrair áudio..."
                         )
-                        best_prog.download(output_path=out_dir, filename=prog_filename)
-                        audio_filename = f"{base_title}_audio_temp.aac"
+                        download_pair(target_video, best_prog, out_dir, video_filename, prog_filename, segmentos, tamanho_segmento, _imprimir_progresso)
+                        # Progressivos trazem AAC: extrai por cópia para .m4a em vez de recodificar
+                        audio_copy = stream_codecs(best_prog)[1] == "aac"
+                        audio_filename = f"{base_title}_audio_temp.{'m4a' if audio_copy else 'aac'}"
                         print("Extraindo áudio do progressivo com FFmpeg...")
-                        ffmpeg_extract_audio(os.path.join(out_dir, prog_filename), os.path.join(out_dir, audio_filename))
-                        try:
-                            os.remove(os.path.join(out_dir, prog_filename))
-                        except OSError:
-                            pass
+                        ffmpeg_extract_audio(os.path.join(out_dir, prog_filename), os.path.join(out_dir, audio_filename), copy=audio_copy)
+                        remove_temp_files(os.path.join(out_dir, prog_filename))
                     else:
                         print("Não foi possível obter áudio para combinar.")
                         return
 
                 print("\nCombinando vídeo e áudio com FFmpeg...")
-                output_filename = os.path.join(out_dir, f"{base_title}_final.mp4")
+                ext, codec_args = choose_container(stream_codecs(target_video)[0], "aac", forcar_mp4)
+                output_filename = os.path.join(out_dir, f"{base_title}_final.{ext}")
                 try:
-                    ffmpeg_merge(os.path.join(out_dir, video_filename), os.path.join(out_dir, audio_filename), output_filename)
+                    ffmpeg_merge(os.path.join(out_dir, video_filename), os.path.join(out_dir, audio_filename), output_filename, codec_args=codec_args)
+                    output_filename = pos_processar(output_filename)
                     print(f"Vídeo final combinado: '{output_filename}'")
+                    registrar(output_filename, target_video, best_prog)
                 except subprocess.CalledProcessError as e:
                     print(f"Erro ao combinar com FFmpeg: {e}")
                 finally:
-                    try:
-                        os.remove(os.path.join(out_dir, video_filename))
-                        os.remove(os.path.join(out_dir, audio_filename))
-                    except OSError:
-                        pass
+                    remove_temp_files(os.path.join(out_dir, video_filename), os.path.join(out_dir, audio_filename))
                 return
             else:
                 print(
@@ -207,78 +227,43 @@ def baixar_video_youtube(url, modo_auto: bool = False, listar_apenas: bool = Fal
         # Modo automático: tenta baixar o melhor progressivo, caso contrário combina melhor vídeo+áudio
         if modo_auto:
             try:
-                best_progressive = (
-                    yt.streams.filter(progressive=True, file_extension="mp4")
-                    .order_by("resolution")
-                    .desc()
-                    .first()
-                )
+                best_progressive = indice.best_progressive(ext="mp4")
                 if best_progressive:
                     ext = stream_extension(best_progressive)
                     filename = f"{base_title}_progressivo.{ext}"
                     print(
                         f"\nBaixando automaticamente: {best_progressive.resolution} (ITAG: {best_progressive.itag})..."
                     )
-                    best_progressive.download(output_path=out_dir, filename=filename)
+                    output_filename = pos_processar(download_stream(best_progressive, out_dir, filename, segmentos, tamanho_segmento))
                     print("Download concluído com sucesso!")
+                    registrar(output_filename, best_progressive)
                     return
 
                 # Caso não exista progressivo bom, baixa melhor vídeo e melhor áudio
-                best_video = (
-                    yt.streams.filter(only_video=True)
-                    .order_by("resolution")
-                    .desc()
-                    .first()
-                )
-                best_audio = (
-                    yt.streams.filter(only_audio=True)
-                    .order_by("abr")
-                    .desc()
-                    .first()
-                )
+                best_video = indice.best_video()
+                best_audio = indice.best_audio()
 
-                if best_video:
-                    vext = stream_extension(best_video)
-                    video_filename = f"{base_title}_video_temp.{vext}"
-                    print(
-                        f"\nBaixando vídeo: {best_video.resolution} (ITAG: {best_video.itag})..."
-                    )
-                    best_video.download(output_path=out_dir, filename=video_filename)
-                else:
+                if not best_video:
                     print("Não foi possível encontrar um stream de vídeo adequado.")
                     return
-
-                if best_audio:
-                    aext = stream_extension(best_audio)
-                    audio_filename = f"{base_title}_audio_temp.{aext}"
-                    print(
-                        f"Baixando áudio: {best_audio.abr} (ITAG: {best_audio.itag})..."
-                    )
-                    best_audio.download(output_path=out_dir, filename=audio_filename)
-                else:
+                if not best_audio:
                     print("Não foi possível encontrar um stream de áudio adequado.")
                     return
 
-                print("\nCombinando vídeo e áudio com FFmpeg...")
-                output_filename = os.path.join(out_dir, f"{base_title}_final.mp4")
+                print(
+                    f"\nBaixando vídeo {best_video.resolution} (ITAG: {best_video.itag}) e áudio {best_audio.abr} (ITAG: {best_audio.itag}) em paralelo..."
+                )
                 try:
-                    ffmpeg_merge(os.path.join(out_dir, video_filename), os.path.join(out_dir, audio_filename), output_filename)
+                    output_filename = download_and_merge(
+                        best_video, best_audio, out_dir, base_title, segmentos, tamanho_segmento, _imprimir_progresso, streaming=merge_streaming, require_mp4=forcar_mp4, steps=pos
+                    )
                     print(f"Vídeo final combinado: '{output_filename}'")
+                    registrar(output_filename, best_video, best_audio)
                 except subprocess.CalledProcessError as e:
                     print(f"Erro ao combinar com FFmpeg: {e}")
                     print(
                         "Certifique-se de que o FFmpeg está instalado e configurado no seu PATH."
                     )
-                    print(
-                        f"Você pode precisar combinar os arquivos manualmente usando: ffmpeg -i \"{os.path.join(out_dir, video_filename)}\" -i \"{os.path.join(out_dir, audio_filename)}\" -c:v copy -c:a aac \"{output_filename}\""
-                    )
-
-                try:
-                    os.remove(video_filename)
-                    os.remove(audio_filename)
-                    print("Arquivos temporários removidos.")
-                except OSError as e:
-                    print(f"Erro ao remover arquivos temporários: {e}")
                 return
             except Exception as e:
                 print(f"Erro no modo automático: {e}")
@@ -301,7 +286,7 @@ def baixar_video_youtube(url, modo_auto: bool = False, listar_apenas: bool = Fal
                             print(f"\nBaixando stream progressivo: {stream_selecionado.resolution} (ITAG: {stream_selecionado.itag})...")
                             pext = stream_extension(stream_selecionado)
                             filename = f"{base_title}_progressivo.{pext}"
-                            stream_selecionado.download(output_path=out_dir, filename=filename)
+                            pos_processar(download_stream(stream_selecionado, out_dir, filename, segmentos, tamanho_segmento))
                             print("Download concluído com sucesso!")
                             return
                         else:
@@ -315,14 +300,11 @@ def baixar_video_youtube(url, modo_auto: bool = False, listar_apenas: bool = Fal
                         index_video = int(escolha_stream_video[1:]) - 1
                         if 0 <= index_video < len(video_only_streams):
                             video_stream_selecionado = video_only_streams[index_video]
-                            print(f"\nBaixando stream de vídeo: {video_stream_selecionado.resolution} (ITAG: {video_stream_selecionado.itag})...")
                             # Sanitize filename for common OS issues and ensure unique temp names
                             vext = stream_extension(video_stream_selecionado)
                             video_filename = f"{base_title}_video_temp.{vext}"
-                            video_stream_selecionado.download(output_path=out_dir, filename=video_filename)
-                            print("Download do vídeo concluído!")
 
-                            # Agora, pede para escolher o áudio
+                            # Escolhe o áudio antes de baixar para buscar as duas faixas em paralelo
                             if audio_only_streams:
                                 while True:
                                     escolha_stream_audio = input("Digite o número do STREAM DE ÁUDIO para combinar (ex: A1): ").lower()
@@ -330,39 +312,35 @@ def baixar_video_youtube(url, modo_auto: bool = False, listar_apenas: bool = Fal
                                         index_audio = int(escolha_stream_audio[1:]) - 1
                                         if 0 <= index_audio < len(audio_only_streams):
                                             audio_stream_selecionado = audio_only_streams[index_audio]
-                                            print(f"\nBaixando stream de áudio: {audio_stream_selecionado.abr} (ITAG: {audio_stream_selecionado.itag})...")
-                                            aext = stream_extension(audio_stream_selecionado)
-                                            audio_filename = f"{base_title}_audio_temp.{aext}"
-                                            audio_stream_selecionado.download(output_path=out_dir, filename=audio_filename)
-                                            print("Download do áudio concluído!")
-
-                                            print("\nCombinando vídeo e áudio com FFmpeg...")
-                                            output_filename = os.path.join(out_dir, f"{base_title}_final.mp4")
-                                            # Comando FFmpeg para combinar vídeo e áudio
-                                            # -y para sobrescrever se o arquivo existir
+                                            print(
+                                                f"\nBaixando vídeo {video_stream_selecionado.resolution} (ITAG: {video_stream_selecionado.itag}) "
+                                                f"e áudio {audio_stream_selecionado.abr} (ITAG: {audio_stream_selecionado.itag}) em paralelo..."
+                                            )
                                             try:
-                                                ffmpeg_merge(os.path.join(out_dir, video_filename), os.path.join(out_dir, audio_filename), output_filename)
+                                                output_filename = download_and_merge(
+                                                    video_stream_selecionado,
+                                                    audio_stream_selecionado,
+                                                    out_dir,
+                                                    base_title,
+                                                    segmentos,
+                                                    tamanho_segmento,
+                                                    _imprimir_progresso,
+                                                    streaming=merge_streaming,
+                                                    require_mp4=forcar_mp4,
+                                                    steps=pos,
+                                                )
                                                 print(f"Vídeo final combinado: '{output_filename}'")
                                             except subprocess.CalledProcessError as e:
                                                 print(f"Erro ao combinar com FFmpeg: {e}")
                                                 print("Certifique-se de que o FFmpeg está instalado e configurado no seu PATH.")
-                                                print("Você pode precisar combinar os arquivos manualmente usando:")
-                                                print(f"ffmpeg -i \"{video_filename}\" -i \"{audio_filename}\" -c:v copy -c:a aac \"{output_filename}\"")
-
-
-                                            # Opcional: remover arquivos temporários
-                                            try:
-                                                os.remove(os.path.join(out_dir, video_filename))
-                                                os.remove(os.path.join(out_dir, audio_filename))
-                                                print("Arquivos temporários removidos.")
-                                            except OSError as e:
-                                                print(f"Erro ao remover arquivos temporários: {e}")
                                             return
                                         else:
                                             print("Número inválido para áudio. Por favor, digite um número da lista.")
                                     except (ValueError, IndexError):
                                         print("Entrada inválida. Por favor, digite no formato A<número>.")
                             else:
+                                print(f"\nBaixando stream de vídeo: {video_stream_selecionado.resolution} (ITAG: {video_stream_selecionado.itag})...")
+                                download_stream(video_stream_selecionado, out_dir, video_filename, segmentos, tamanho_segmento)
                                 print("Nenhum stream de áudio disponível para combinar. Baixado apenas o vídeo.")
                                 return
                         else:
@@ -379,7 +357,7 @@ def baixar_video_youtube(url, modo_auto: bool = False, listar_apenas: bool = Fal
                             print(f"\nBaixando stream de áudio: {stream_selecionado.abr} (ITAG: {stream_selecionado.itag})...")
                             aext = stream_extension(stream_selecionado)
                             filename = f"{base_title}_audio_only.{aext}"
-                            stream_selecionado.download(output_path=out_dir, filename=filename)
+                            pos_processar(download_stream(stream_selecionado, out_dir, filename, segmentos, tamanho_segmento), has_video=False)
                             print("Download do áudio concluído!")
                             return
                         else:
@@ -390,20 +368,152 @@ def baixar_video_youtube(url, modo_auto: bool = False, listar_apenas: bool = Fal
                 print("Escolha inválida ou tipo de stream não disponível. Tente novamente.")
 
     except Exception as e:
-        print(f"Ocorreu um erro: {e}")
+        print(f"Ocorreu um erro: {retry.describe(e)}")
+        if retry.classify(e) != retry.FATAL:
+            print("A falha é temporária: rode o mesmo comando de novo mais tarde; os trechos já baixados são aproveitados.")
 
 if __name__ == "__main__":
+    import postprocess
+
     parser = argparse.ArgumentParser(description="Downloader de YouTube com escolha de resolução e pós-processamento via FFmpeg")
     parser.add_argument("--url", help="URL do vídeo do YouTube")
     parser.add_argument("--auto", action="store_true", help="Modo automático: baixa melhor opção disponível e combina se necessário")
     parser.add_argument("--list", action="store_true", help="Apenas listar formatos disponíveis e sair")
     parser.add_argument("--res", help="Forçar download em resolução específica (ex.: 1080p, 720p)")
+    parser.add_argument("--format", "-f", dest="formato", help="Expressão de formato, ex.: 'bestvideo[height<=1080][fps<=30]+bestaudio[ext=m4a]/best'")
     parser.add_argument("--outdir", help="Diretório de saída para salvar os arquivos")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS, help="Conexões simultâneas por arquivo (ponto de partida do ajuste automático)")
+    parser.add_argument("--no-stream-merge", action="store_true", help="Desativa a mesclagem por pipes e usa arquivos temporários")
+    parser.add_argument("--no-cache", action="store_true", help="Ignora o cache de manifestos e extrai os streams novamente")
+    parser.add_argument("--content-cache", action="store_true", help="Reaproveita e guarda streams e mesclagens num cache de conteúdo local")
+    parser.add_argument("--content-cache-size", help="Tamanho máximo do cache de conteúdo (ex.: 20G; padrão: 10G)")
+    parser.add_argument("--content-cache-mode", choices=content_cache.MODES, default=content_cache.AUTO, help="Como materializar arquivos do cache (auto: reflink ou hardlink, sem cópia)")
+    parser.add_argument("--segment-size", type=int, default=DEFAULT_SEGMENT_SIZE, help="Tamanho de cada faixa de bytes em bytes (inicial, se ajustado)")
+    parser.add_argument("--no-adaptive", action="store_true", help="Mantém --segments e --segment-size fixos em vez de ajustá-los à vazão do host")
+    parser.add_argument("--max-connections", type=int, default=adaptive.MAX_CONNECTIONS, help="Teto de conexões por arquivo no ajuste automático")
+    parser.add_argument("--batch", metavar="FILE", help="Arquivo com uma URL por linha (use - para ler do stdin); playlists e canais são expandidos")
+    parser.add_argument("--sync", nargs="+", metavar="URL", help="Sincroniza playlists/canais: baixa só os vídeos novos desde a última execução")
+    parser.add_argument("--sync-db", metavar="PATH", help="Banco SQLite com a marca d'água de cada fonte de --sync (padrão: pasta de dados do usuário)")
+    parser.add_argument("--resolvers", type=int, default=4, help="Lote: manifestos resolvidos em paralelo")
+    parser.add_argument("--downloads", type=int, default=3, help="Lote: downloads simultâneos")
+    parser.add_argument("--merges", type=int, help="Processos FFmpeg simultâneos no pós-processamento (padrão: um por núcleo)")
+    parser.add_argument("--audio-format", choices=sorted(postprocess.AUDIO_PROFILES), help="Baixa só o áudio e o converte para este perfil")
+    parser.add_argument("--embed-thumbnail", action="store_true", help="Embute a miniatura do vídeo como capa (MP4, M4A, MP3 e MKV)")
+    parser.add_argument("--add-metadata", action="store_true", help="Grava título, autor e URL nos metadados do arquivo")
+    parser.add_argument("--limit-rate", help="Limite global de banda (ex.: 500K, 2M; 0 = sem limite)")
+    parser.add_argument("--limit-schedule", help="Limites por horário, ex.: 08:00-18:00=1M,18:00-08:00=0")
+    parser.add_argument("--job-rate", help="Lote: limite de banda por vídeo (ex.: 1M)")
+    parser.add_argument("--mp4", action="store_true", help="Sempre gera MP4 com áudio AAC (recodifica o áudio se necessário)")
+    parser.add_argument("--no-archive", action="store_true", help="Baixa mesmo que o vídeo já conste no arquivo de downloads")
+    parser.add_argument("--archive", metavar="PATH", help="Banco SQLite do arquivo de downloads (padrão: pasta de dados do usuário)")
+    parser.add_argument("--archive-verify", action="store_true", help="Confere os arquivos registrados (tamanho e SHA-256) e sai")
+    parser.add_argument("--archive-prune", action="store_true", help="Remove do arquivo as entradas ausentes ou alteradas e sai")
+    parser.add_argument("--profile", action="store_true", help="Ao final, imprime o tempo gasto em cada fase (extração, download, mesclagem, limpeza)")
+    parser.add_argument("--metrics-log", metavar="PATH", help="Grava cada fase concluída como uma linha JSON neste arquivo")
+    parser.add_argument("--metrics-port", type=int, help="Expõe métricas no formato do Prometheus em http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--http-pool", type=int, default=transport.DEFAULT_POOL_SIZE, help="Conexões keep-alive ociosas mantidas por host")
+    parser.add_argument("--http-timeout", type=float, default=transport.DEFAULT_READ_TIMEOUT, help="Tempo máximo (s) de espera por dados de uma conexão")
+    parser.add_argument("--read-buffer", type=int, default=transport.DEFAULT_READ_SIZE, help="Bytes lidos da conexão a cada leitura")
+    parser.add_argument("--retries", type=int, default=retry.DEFAULT_RETRIES, help="Novas tentativas de cada faixa (ou extração) após quedas de conexão e timeouts")
+    parser.add_argument("--throttle-pause", type=float, default=retry.BREAKER_COOLDOWN, help="Pausa (s) dos downloads de um host que está limitando as requisições; dobra a cada recusa")
+    parser.add_argument("--no-throttle-pause", action="store_true", help="Não pausa os downloads quando o host limita (só espera e repete cada faixa)")
     args = parser.parse_args()
 
+    if args.audio_format and not (args.formato or args.res):
+        args.formato = "bestaudio/best"
+    if args.formato:
+        try:
+            parse_selector(args.formato)
+        except FormatSelectorError as e:
+            parser.error(str(e))
+
+    arquivo = None
+    if not args.no_archive or args.archive_verify or args.archive_prune:
+        try:
+            arquivo = DownloadArchive(args.archive) if args.archive else get_default_archive()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Aviso: arquivo de downloads indisponível: {e}")
+    if args.archive_verify or args.archive_prune:
+        if arquivo is None:
+            sys.exit(1)
+        if args.archive_prune:
+            print(f"{arquivo.prune(check_hash=True)} entrada(s) removida(s) do arquivo de downloads.")
+            sys.exit(0)
+        problemas = arquivo.verify(check_hash=True)
+        for entrada, problema in problemas:
+            print(f"{entrada['video_id']} [{entrada['selection']}] {problema}: {entrada['output_path']}")
+        print(f"{len(arquivo.entries())} entrada(s) verificada(s), {len(problemas)} com problema.")
+        sys.exit(1 if problemas else 0)
+    if args.no_archive:
+        arquivo = None
+
+    try:
+        if metrics.configure(args.metrics_log, args.metrics_port):
+            print(f"Métricas em http://127.0.0.1:{args.metrics_port}/metrics")
+    except OSError as e:
+        print(f"Aviso: métricas indisponíveis: {e}")
+    if args.profile:
+        # atexit cobre também as saídas por sys.exit do modo em lote
+        atexit.register(lambda: print("\n" + metrics.get_recorder().format_profile()))
+    atexit.register(metrics.get_recorder().close)
+
+    transport.configure(args.http_pool, args.http_timeout, args.read_buffer)
+    retry.configure(args.retries, args.throttle_pause, breaker=not args.no_throttle_pause)
+    postprocess.configure(args.merges)
+    adaptive.configure(not args.no_adaptive, args.max_connections)
+    content_cache.configure(
+        args.content_cache, parse_rate(args.content_cache_size) if args.content_cache_size else None, args.content_cache_mode
+    )
+    if not args.no_adaptive:
+        metrics.get_recorder().add_sink(imprimir_ajuste)
+    limiter = get_limiter()
+    if args.limit_rate:
+        limiter.set_global_rate(parse_rate(args.limit_rate))
+    if args.limit_schedule:
+        limiter.set_schedule(parse_schedule(args.limit_schedule))
+
+    from batch import is_collection_url, read_batch_file, run_batch
+
+    lote = dict(
+        resolucao=args.res,
+        formato=args.formato,
+        resolvers=args.resolvers,
+        downloads=args.downloads,
+        merges=args.merges,
+        segments=args.segments,
+        segment_size=args.segment_size,
+        usar_cache=not args.no_cache,
+        job_rate=parse_rate(args.job_rate) if args.job_rate else 0,
+        arquivo=arquivo,
+        require_mp4=args.mp4,
+        perfil_audio=args.audio_format,
+        miniatura=args.embed_thumbnail,
+        metadados=args.add_metadata,
+    )
+
+    if args.sync:
+        invalidas = [u for u in args.sync if not is_collection_url(u)]
+        if invalidas:
+            parser.error(f"--sync aceita apenas playlists e canais: {', '.join(invalidas)}")
+        from sync import SyncState, run_sync
+
+        try:
+            estado = SyncState(args.sync_db)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Marca d'água da sincronização indisponível: {e}")
+            sys.exit(1)
+        sys.exit(run_sync(args.sync, args.outdir, estado, **lote))
+
+    if args.batch or (args.url and not args.list and is_collection_url(args.url)):
+        urls = read_batch_file(args.batch) if args.batch else []
+        if args.url:
+            urls.insert(0, args.url)
+        sys.exit(run_batch(urls, args.outdir, **lote))
+
     if not args.url:
         url_do_video = input("Por favor, insira a URL do vídeo do YouTube que você quer baixar: ")
     else:
         url_do_video = args.url
 
-    baixar_video_youtube(url_do_video, modo_auto=args.auto, listar_apenas=args.list, resolucao_especifica=args.res, saida_dir=args.outdir)
\ No newline at end of file
+    with job_scope(url_do_video):
+        baixar_video_youtube(url_do_video, modo_auto=args.auto, listar_apenas=args.list, resolucao_especifica=args.res, saida_dir=args.outdir, segmentos=args.segments, tamanho_segmento=args.segment_size, merge_streaming=not args.no_stream_merge, usar_cache=not args.no_cache, arquivo=arquivo, forcar_mp4=args.mp4, formato=args.formato, perfil_audio=args.audio_format, miniatura=args.embed_thumbnail, metadados=args.add_metadata)
\ No newline at end of file
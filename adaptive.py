@@ -0,0 +1,282 @@
+"""
+Controle do número de conexões e do tamanho das faixas de cada download.
+
+TransferController mantém os valores fixos (--segments / --segment-size). O
+AdaptiveController parte deles e os ajusta durante o download:
+
+- conexões por AIMD: a cada janela (WINDOW_SECONDS, ou a duração típica de uma requisição,
+  se maior, para que os picos do início de cada resposta se diluam) soma uma conexão e a mantém se a
+  vazão total subiu pelo menos GAIN_THRESHOLD; se não subiu, o link saturou, a conexão
+  extra é desfeita e o controlador passa a tirar conexões enquanto a vazão se mantiver.
+  Respostas de throttling (429/403/503) cortam as conexões pela metade, o teto passa a
+  ficar abaixo do nível recusado e a faixa espera antes de ser repetida.
+- tamanho das faixas pela vazão e latência medidas por conexão: a faixa cresce aos poucos
+  (CHUNK_GROWTH) até cada requisição durar cerca de TARGET_REQUEST_SECONDS, com a latência
+  até o primeiro byte em no máximo LATENCY_SHARE dela. Se o restante de uma resposta
+  chega bem mais devagar que o primeiro quarto, o host estrangula cada requisição depois
+  de um pico inicial e a faixa cai pela metade; hosts assim acabam com faixas pequenas e mais
+  conexões, links rápidos com poucas faixas grandes.
+
+Quem despacha as faixas (download_engine) consulta connections e chunk_for() a cada
+faixa nova; summary() resume os valores a que o controlador chegou.
+"""
+import threading
+import time
+
+from retry import backoff
+
+MIN_CONNECTIONS = 1
+MAX_CONNECTIONS = 16
+MIN_CHUNK = 256 * 1024
+MAX_CHUNK = 32 * 1024 * 1024
+CHUNK_ALIGN = 64 * 1024
+TARGET_REQUEST_SECONDS = 2.0
+LATENCY_SHARE = 0.1
+CHUNK_GROWTH = 1.25
+SLOWDOWN_RATIO = 2.0  # restante da resposta tantas vezes mais lento que o primeiro quarto
+# Faixas menores medem mal a desaceleração (poucas leituras); exige-se uma sequência delas
+SLOWDOWN_MIN_BYTES = 512 * 1024
+SLOWDOWN_STREAK = 2
+# O que falta é dividido em pelo menos SPLIT_FACTOR faixas por conexão, para que sobre
+# trabalho para as conexões acrescentadas depois
+SPLIT_FACTOR = 4
+WINDOW_SECONDS = 1.0
+GAIN_THRESHOLD = 0.1  # ganho mínimo de vazão para manter uma conexão a mais
+PROBE_AFTER_WINDOWS = 8  # janelas estáveis antes de testar de novo uma conexão a mais
+EWMA_ALPHA = 0.3
+MAX_THROTTLE_RETRIES = 6  # por faixa
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class TransferController:
+    """Conexões e tamanho de faixa fixos; base do AdaptiveController."""
+
+    adaptive = False
+
+    def __init__(self, connections: int, chunk_size: int):
+        self.connections = max(1, connections)
+        self.chunk_size = max(1, chunk_size)
+        self.max_connections = self.connections
+        self.peak_connections = self.connections
+        self.throttles = 0
+        self.slowdowns = 0  # respostas que desaceleraram no meio (estrangulamento por requisição)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._consecutive_throttles = 0
+        self._started = time.monotonic()
+
+    def chunk_for(self, remaining: int) -> int:
+        """Tamanho da próxima faixa, dado o que ainda falta despachar."""
+        return self.chunk_size
+
+    def add_bytes(self, nbytes: int):
+        with self._lock:
+            self._bytes += nbytes
+
+    def record(self, nbytes: int, seconds: float, first_byte: float, quarter: float):
+        """
+        Faixa concluída: bytes, duração total, latência até o primeiro byte e instante em que
+        um quarto dos bytes tinha chegado (s, contados do início da requisição).
+        """
+        with self._lock:
+            self._consecutive_throttles = 0
+
+    def throttled(self, status: int, retry_after: float | None = None) -> float:
+        """Registra uma resposta de throttling e retorna quantos segundos esperar antes de repetir."""
+        with self._lock:
+            self.throttles += 1
+            self._consecutive_throttles += 1
+            if retry_after is not None:
+                return min(BACKOFF_MAX, max(0.0, retry_after))
+            # Com jitter: as faixas recusadas juntas não voltam todas no mesmo instante
+            return backoff(self._consecutive_throttles - 1, BACKOFF_BASE, BACKOFF_MAX)
+
+    def draining(self):
+        """Todas as faixas já foram despachadas: a vazão que cai daqui em diante não é do link."""
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self._started
+        return {
+            "adaptive": self.adaptive,
+            "connections": self.connections,
+            "peak_connections": self.peak_connections,
+            "chunk_size": self.chunk_size,
+            "throttles": self.throttles,
+            "slowdowns": self.slowdowns,
+            "mib_s": round(self._bytes / elapsed / (1024 * 1024), 3) if elapsed else None,
+        }
+
+
+class AdaptiveController(TransferController):
+    adaptive = True
+
+    def __init__(
+        self,
+        connections: int,
+        chunk_size: int,
+        min_connections: int = MIN_CONNECTIONS,
+        max_connections: int = MAX_CONNECTIONS,
+        min_chunk: int = MIN_CHUNK,
+        max_chunk: int = MAX_CHUNK,
+    ):
+        self.min_connections = max(1, min_connections)
+        self.min_chunk = min_chunk
+        self.max_chunk = max(min_chunk, max_chunk)
+        max_connections = max(self.min_connections, max_connections)
+        super().__init__(min(max(connections, self.min_connections), max_connections), _align(chunk_size, min_chunk, self.max_chunk))
+        self.max_connections = max_connections
+        self._ceiling = max_connections
+        self._floor = self.min_connections
+        # A primeira janela mede a abertura das conexões, não o regime do link
+        self._settling = True
+        self._recover_to = 0
+        self._rate = None  # bytes/s por conexão (média móvel)
+        self._first_byte = None  # latência até o primeiro byte (média móvel)
+        self._duration = 0.0  # duração das requisições (média móvel)
+        self._last_action = None
+        self._prev_throughput = None
+        self._stable_windows = 0
+        self._frozen = False
+        self._slowdown_streak = 0
+        self._window_started = None
+        self._window_bytes = 0
+
+    def chunk_for(self, remaining: int) -> int:
+        with self._lock:
+            share = -(-remaining // (self.connections * SPLIT_FACTOR))
+            return _align(min(self.chunk_size, share), self.min_chunk, self.max_chunk)
+
+    def add_bytes(self, nbytes: int):
+        now = time.monotonic()
+        with self._lock:
+            self._bytes += nbytes
+            if self._window_started is None:
+                self._window_started = now
+                return
+            self._window_bytes += nbytes
+            elapsed = now - self._window_started
+            if elapsed >= max(WINDOW_SECONDS, self._duration):
+                if not self._frozen:
+                    self._decide(self._window_bytes / elapsed)
+                self._window_started = now
+                self._window_bytes = 0
+
+    def record(self, nbytes: int, seconds: float, first_byte: float, quarter: float):
+        with self._lock:
+            self._consecutive_throttles = 0
+            rate = nbytes / max(seconds - first_byte, 1e-3)
+            self._rate = rate if self._rate is None else _ewma(self._rate, rate)
+            self._first_byte = first_byte if self._first_byte is None else _ewma(self._first_byte, first_byte)
+            self._duration = seconds if not self._duration else _ewma(self._duration, seconds)
+            if self._frozen:
+                # Faixas finais, encurtadas por chunk_for: não representam o regime do link
+                return
+            # Segundos por quarto da resposta: no início e no restante
+            head, rest = quarter - first_byte, (seconds - quarter) / 3
+            if nbytes >= SLOWDOWN_MIN_BYTES and head > 0 and rest > head * SLOWDOWN_RATIO:
+                self._slowdown_streak += 1
+                if self._slowdown_streak >= SLOWDOWN_STREAK:
+                    self.chunk_size = _align(self.chunk_size // 2, self.min_chunk, self.max_chunk)
+                    self.slowdowns += 1
+                    self._slowdown_streak = 0
+                return
+            self._slowdown_streak = 0
+            if nbytes < self.chunk_size * 3 // 4:
+                # Faixa encurtada (fim do arquivo ou divisão entre conexões): não diz nada do tamanho atual
+                return
+            target = self._rate * max(TARGET_REQUEST_SECONDS, self._first_byte / LATENCY_SHARE)
+            self.chunk_size = _align(int(min(self.chunk_size * CHUNK_GROWTH, target)), self.min_chunk, self.max_chunk)
+
+    def _decide(self, throughput: float):
+        if self._settling:
+            # A janela logo após uma mudança mede a conexão nova ainda abrindo: descarta
+            self._settling = False
+            return
+        prev = self._prev_throughput
+        action = "hold"
+        if self.connections < self._recover_to:
+            # Depois de um corte por throttling, volta sem testes até o último nível aceito
+            self.connections += 1
+            action = "recover"
+        elif self._last_action == "increase" and prev and throughput < prev * (1 + GAIN_THRESHOLD):
+            # A conexão extra não rendeu: o link saturou
+            self.connections -= 1
+            self._ceiling = self.connections
+            action = "revert"
+        elif self._last_action == "decrease" and prev and throughput < prev * (1 - GAIN_THRESHOLD):
+            # Com uma conexão a menos a vazão caiu: a anterior fazia falta
+            self.connections += 1
+            self._floor = self.connections
+            action = "restore"
+        else:
+            if self._last_action == "decrease":
+                # A vazão se manteve com uma conexão a menos: esse passa a ser o teto
+                self._ceiling = self.connections
+            if self.connections < self._ceiling:
+                self.connections += 1
+                action = "increase"
+            elif self.connections > self._floor and self._last_action in ("revert", "decrease"):
+                # Link saturado: testa se dá para manter a vazão com menos conexões
+                self.connections -= 1
+                action = "decrease"
+        if action == "hold":
+            self._stable_windows += 1
+            if self._stable_windows >= PROBE_AFTER_WINDOWS:
+                # As condições do link mudam: volta a testar os limites
+                self._ceiling = min(self.max_connections, self._ceiling + 1)
+                self._floor = max(self.min_connections, self._floor - 1)
+                self._stable_windows = 0
+        else:
+            self._stable_windows = 0
+            self._settling = action in ("increase", "decrease")
+        self._last_action = action
+        # Só compara com janelas medidas depois da última mudança
+        self._prev_throughput = throughput if action in ("hold", "increase", "decrease") else None
+        self.peak_connections = max(self.peak_connections, self.connections)
+
+    def throttled(self, status: int, retry_after: float | None = None) -> float:
+        delay = super().throttled(status, retry_after)
+        with self._lock:
+            if self._last_action != "backoff":
+                # Um corte por episódio: as outras faixas em voo também vão ouvir o 429
+                self._ceiling = max(self.min_connections, self.connections - 1)
+                self._recover_to = self._ceiling
+                self.connections = max(self.min_connections, self.connections // 2)
+                self.chunk_size = _align(self.chunk_size // 2, self.min_chunk, self.max_chunk)
+            self._last_action = "backoff"
+            self._prev_throughput = None
+            self._stable_windows = 0
+            self._window_started = None
+            self._window_bytes = 0
+        return delay
+
+    def draining(self):
+        with self._lock:
+            self._frozen = True
+
+
+def _ewma(current: float, sample: float) -> float:
+    return current + EWMA_ALPHA * (sample - current)
+
+
+def _align(size: int, low: int, high: int) -> int:
+    size = min(max(size, low), high)
+    return max(low, size - size % CHUNK_ALIGN)
+
+
+_settings = {"enabled": True, "max_connections": MAX_CONNECTIONS}
+
+
+def configure(enabled: bool = True, max_connections: int | None = None):
+    """Liga ou desliga o ajuste automático para os próximos downloads."""
+    _settings["enabled"] = enabled
+    if max_connections:
+        _settings["max_connections"] = max(1, max_connections)
+
+
+def new_controller(connections: int, chunk_size: int) -> TransferController:
+    """Controlador de um download: adaptativo (padrão) ou fixo, conforme configure()."""
+    if _settings["enabled"]:
+        return AdaptiveController(connections, chunk_size, max_connections=_settings["max_connections"])
+    return TransferController(connections, chunk_size)
@@ -0,0 +1,161 @@
+"""
+Índice persistente (SQLite) dos vídeos já baixados.
+
+Cada entrada é indexada por (ID do vídeo, seleção), onde a seleção é a resolução ou a
+expressão de formato pedida (ou "auto"), mais o perfil de conversão de áudio e o MP4
+forçado quando usados, e guarda o caminho de saída, os itags usados, o tamanho e o SHA-256 do arquivo.
+A consulta acontece antes de qualquer acesso à rede.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from manifest_cache import extract_video_id
+
+AUTO = "auto"
+
+
+def default_archive_path() -> str:
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "YouTubeDownloader", "archive.sqlite")
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "youtube-downloader", "archive.sqlite")
+
+
+def selection_key(resolucao: str | None, perfil_audio: str | None = None, mp4: bool = False) -> str:
+    """
+    Normaliza a seleção: resolução explícita ("1080p"), expressão de formato ou "auto"
+    (inclui "Automático" da GUI). O perfil de áudio e o MP4 forçado mudam o arquivo gerado,
+    então entram na chave: "1080p;audio=mp3", "auto;mp4". Uma chave pronta pode ser passada
+    a lookup/record no lugar da resolução.
+    """
+    key = AUTO if not resolucao or resolucao == "Automático" else resolucao
+    if perfil_audio:
+        key += f";audio={perfil_audio}"
+    if mp4:
+        key += ";mp4"
+    return key
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class DownloadArchive:
+    def __init__(self, path: str | None = None):
+        self.path = path or default_archive_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS downloads (
+                    video_id TEXT NOT NULL,
+                    selection TEXT NOT NULL,
+                    itags TEXT,
+                    output_path TEXT NOT NULL,
+                    size INTEGER,
+                    sha256 TEXT,
+                    created_at REAL,
+                    PRIMARY KEY (video_id, selection)
+                )
+                """
+            )
+
+    def lookup(self, url: str, resolucao: str | None = None) -> dict | None:
+        """
+        Retorna a entrada se o vídeo já foi baixado com essa seleção e o arquivo ainda
+        existe; entradas cujo arquivo sumiu são removidas.
+        """
+        video_id = extract_video_id(url)
+        if not video_id:
+            return None
+        selection = selection_key(resolucao)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT video_id, selection, itags, output_path, size, sha256, created_at FROM downloads WHERE video_id = ? AND selection = ?",
+                (video_id, selection),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(("video_id", "selection", "itags", "output_path", "size", "sha256", "created_at"), row))
+        if not os.path.exists(entry["output_path"]):
+            self.remove(video_id, selection)
+            return None
+        return entry
+
+    def record(self, url: str, resolucao: str | None, output_path: str, itags: list | None = None, compute_hash: bool = True):
+        video_id = extract_video_id(url)
+        if not video_id or not output_path or not os.path.exists(output_path):
+            return
+        size = os.path.getsize(output_path)
+        digest = file_sha256(output_path) if compute_hash else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    video_id,
+                    selection_key(resolucao),
+                    "+".join(str(i) for i in (itags or [])),
+                    os.path.abspath(output_path),
+                    size,
+                    digest,
+                    time.time(),
+                ),
+            )
+
+    def remove(self, video_id: str, selection: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM downloads WHERE video_id = ? AND selection = ?", (video_id, selection))
+
+    def entries(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id, selection, itags, output_path, size, sha256, created_at FROM downloads ORDER BY created_at"
+            ).fetchall()
+        keys = ("video_id", "selection", "itags", "output_path", "size", "sha256", "created_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def verify(self, check_hash: bool = False) -> list[tuple[dict, str]]:
+        """Lista (entrada, problema) para arquivos ausentes, com tamanho diferente ou hash divergente."""
+        problems = []
+        for entry in self.entries():
+            path = entry["output_path"]
+            if not os.path.exists(path):
+                problems.append((entry, "ausente"))
+            elif entry["size"] is not None and os.path.getsize(path) != entry["size"]:
+                problems.append((entry, "tamanho diferente"))
+            elif check_hash and entry["sha256"] and file_sha256(path) != entry["sha256"]:
+                problems.append((entry, "hash divergente"))
+        return problems
+
+    def prune(self, check_hash: bool = False) -> int:
+        """Remove as entradas com problema (ver verify) e retorna quantas foram removidas."""
+        problems = self.verify(check_hash)
+        for entry, _ in problems:
+            self.remove(entry["video_id"], entry["selection"])
+        return len(problems)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_archive = None
+_default_lock = threading.Lock()
+
+
+def get_default_archive() -> DownloadArchive:
+    global _default_archive
+    with _default_lock:
+        if _default_archive is None:
+            _default_archive = DownloadArchive()
+        return _default_archive
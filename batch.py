@@ -0,0 +1,335 @@
+"""
+Modo em lote do CLI: processa muitas URLs (arquivo, stdin, playlists e canais) em um
+único processo, por um pipeline de três estágios com concorrência própria:
+resolução do manifesto -> download -> pós-processamento (mesclagem, conversão, capa...).
+"""
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from archive import selection_key
+from download_engine import DEFAULT_SEGMENTS, DEFAULT_SEGMENT_SIZE, download_pair, download_stream
+from manifest_cache import extract_video_id, iter_collection, resolve_video
+from media import (
+    PLAN_SUFFIXES,
+    cached_merge,
+    merge_plan,
+    sanitize_title,
+    select_streams,
+    stream_extension,
+)
+from metrics import job_scope
+from postprocess import Merge, PostProcessor, PostTask, finishing_steps
+from ratelimit import get_limiter
+from retry import describe, throttle_pause, wait_circuits
+
+DEFAULT_RESOLVERS = 4
+DEFAULT_DOWNLOADS = 3
+
+_CHANNEL_RE = re.compile(r"youtube\.com/(@[^/?#]+|channel/[^/?#]+|c/[^/?#]+|user/[^/?#]+)")
+
+
+def read_batch_file(path: str) -> list[str]:
+    """Lê URLs de um arquivo (ou stdin com "-"), ignorando linhas vazias e comentários (#)."""
+    fh = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [line.strip() for line in fh if line.strip() and not line.lstrip().startswith("#")]
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+def is_collection_url(url: str) -> bool:
+    """Playlists (/playlist?list=...) e canais (/@nome, /channel/...) viram vários jobs."""
+    return "/playlist" in url or bool(_CHANNEL_RE.search(url))
+
+
+def expand_url(url: str) -> list[str]:
+    """Expande playlists e canais nas URLs de seus vídeos; URLs de vídeo passam direto."""
+    if not is_collection_url(url):
+        return [url]
+    return list(iter_collection(url))
+
+
+def expand_urls(urls: list[str], workers: int = DEFAULT_RESOLVERS) -> tuple[list[str], list[tuple[str, Exception]]]:
+    """
+    Expande todas as entradas em paralelo, preservando a ordem e removendo vídeos
+    repetidos. Retorna (urls_de_vídeo, [(entrada, erro), ...]).
+    """
+    def safe_expand(url):
+        try:
+            return expand_url(url), None
+        except Exception as e:
+            return [], e
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        expanded = list(pool.map(safe_expand, urls))
+    seen = set()
+    result = []
+    failures = []
+    for url, (group, error) in zip(urls, expanded):
+        if error is not None:
+            failures.append((url, error))
+        for u in group:
+            key = extract_video_id(u) or u
+            if key not in seen:
+                seen.add(key)
+                result.append(u)
+    return result, failures
+
+
+class BatchJob:
+    def __init__(self, index: int, url: str):
+        self.index = index
+        self.url = url
+        self.title = None
+        self.base_title = None
+        self.plan = None
+        self.steps = []
+        self.output = None
+        self.status = "pendente"
+        self.error = None
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("concluído", "já baixado")
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+
+class BatchRunner:
+    """
+    Pipeline resolução -> download -> pós-processamento. Resolução e download têm cada um
+    seu pool de threads, ligados por uma fila; os workers de download entregam os arquivos
+    ao PostProcessor (merges processos FFmpeg, por padrão um por núcleo) e seguem para o
+    próximo job. Um job que falha sai do pipeline e o restante continua.
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        resolucao: str | None = None,
+        formato: str | None = None,
+        resolvers: int = DEFAULT_RESOLVERS,
+        downloads: int = DEFAULT_DOWNLOADS,
+        merges: int | None = None,
+        segments: int = DEFAULT_SEGMENTS,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        usar_cache: bool = True,
+        job_rate: int = 0,
+        arquivo=None,
+        require_mp4: bool = False,
+        perfil_audio: str | None = None,
+        miniatura: bool = False,
+        metadados: bool = False,
+    ):
+        if perfil_audio and not (formato or resolucao):
+            # Só o áudio será mantido: não baixa o vídeo
+            formato = "bestaudio/best"
+        self.out_dir = out_dir
+        self.resolucao = resolucao
+        self.formato = formato
+        # Chave do arquivo de downloads: a expressão de formato (ou a resolução), o perfil
+        # de áudio e o MP4 forçado
+        self.selecao = selection_key(formato or resolucao, perfil_audio, require_mp4)
+        self.workers = {"resolve": max(1, resolvers), "download": max(1, downloads)}
+        self.merges = merges
+        self.segments = segments
+        self.segment_size = segment_size
+        self.usar_cache = usar_cache
+        self.job_rate = job_rate
+        self.arquivo = arquivo
+        self.require_mp4 = require_mp4
+        self.perfil_audio = perfil_audio
+        self.miniatura = miniatura
+        self.metadados = metadados
+        self._postprocessor = None
+        self._posts = []
+        self._posts_lock = threading.Lock()
+        self._print_lock = threading.Lock()
+        self._names_lock = threading.Lock()
+        self._names = set()
+        self._total = 0
+
+    def _log(self, job: BatchJob, msg: str):
+        with self._print_lock:
+            label = job.title or job.url
+            print(f"[{job.index}/{self._total}] {label}: {msg}", flush=True)
+
+    def _fail(self, job: BatchJob, error: Exception):
+        job.status = "erro"
+        job.error = error
+        job.finished = time.monotonic()
+        self._log(job, f"erro: {describe(error)}")
+
+    def _finish(self, job: BatchJob):
+        job.status = "concluído"
+        job.finished = time.monotonic()
+        self._log(job, f"concluído -> {job.output}")
+        if self.arquivo is not None:
+            try:
+                self.arquivo.record(job.url, self.selecao, job.output, [s.itag for s in job.plan[1:] if s is not None])
+            except (OSError, sqlite3.Error) as e:
+                self._log(job, f"aviso: não foi possível registrar no arquivo de downloads: {e}")
+
+    def _unique_base_title(self, title: str, url: str) -> str:
+        # Dois vídeos com o mesmo título no lote não podem dividir arquivos temporários
+        base = sanitize_title(title) or (extract_video_id(url) or "video")
+        with self._names_lock:
+            if base in self._names:
+                base = f"{base}_{extract_video_id(url) or len(self._names)}"
+            self._names.add(base)
+        return base
+
+    # --- estágios ---
+
+    def _resolve(self, job: BatchJob) -> bool:
+        if self.arquivo is not None:
+            anterior = self.arquivo.lookup(job.url, self.selecao)
+            if anterior:
+                job.output = anterior["output_path"]
+                job.status = "já baixado"
+                job.finished = time.monotonic()
+                self._log(job, f"já baixado -> {job.output}")
+                return False
+        yt = resolve_video(job.url, use_cache=self.usar_cache)
+        job.title = yt.title
+        job.base_title = self._unique_base_title(yt.title, job.url)
+        job.plan = select_streams(yt, self.resolucao, self.formato)
+        if job.plan is None:
+            raise RuntimeError("nenhum stream adequado encontrado")
+        job.steps = finishing_steps(yt, self.perfil_audio, self.miniatura, self.metadados)
+        self._log(job, "manifesto resolvido")
+        return True
+
+    def _download(self, job: BatchJob) -> bool:
+        kind, first, second = job.plan
+        if throttle_pause():
+            self._log(job, f"servidor limitando as requisições: aguardando {throttle_pause():.0f} s para começar")
+            wait_circuits()
+        if kind != "adaptive":
+            filename = f"{job.base_title}{PLAN_SUFFIXES[kind]}.{stream_extension(first)}"
+            path = download_stream(first, self.out_dir, filename, self.segments, self.segment_size, job_id=job.index)
+            self._post(job, PostTask(job.steps, path, job.index, has_video=kind != "audio"))
+            return False
+        ext, codec_args = merge_plan(first, second, self.require_mp4)
+        output_filename = os.path.join(self.out_dir, f"{job.base_title}_final.{ext}")
+        if cached_merge(first, second, output_filename, codec_args):
+            # Par já combinado antes: materializado do cache de conteúdo, sem download nem mesclagem
+            self._post(job, PostTask(job.steps, output_filename, job.index))
+            return False
+        video_filename = f"{job.base_title}_video_temp.{stream_extension(first)}"
+        audio_filename = f"{job.base_title}_audio_temp.{stream_extension(second)}"
+        video_path, audio_path = download_pair(
+            first, second, self.out_dir, video_filename, audio_filename, self.segments, self.segment_size, job_id=job.index
+        )
+        self._log(job, "download concluído")
+        self._post(job, PostTask([Merge(video_path, audio_path, output_filename, codec_args), *job.steps], job_id=job.index))
+        return False
+
+    def _post(self, job: BatchJob, task: PostTask):
+        """Entrega o job ao pós-processamento; o worker de download segue para o próximo."""
+
+        def done(future):
+            error = future.exception()
+            if error is not None:
+                self._fail(job, error)
+                return
+            job.output = future.result()
+            self._finish(job)
+
+        future = self._postprocessor.submit(task)
+        with self._posts_lock:
+            self._posts.append(future)
+        future.add_done_callback(done)
+
+    # --- execução ---
+
+    def _stage(self, name: str, fn, in_q: queue.Queue, out_q: queue.Queue | None) -> list[threading.Thread]:
+        def worker():
+            while True:
+                job = in_q.get()
+                if job is None:
+                    return
+                try:
+                    with job_scope(job.index):
+                        advance = fn(job)
+                    if advance and out_q is not None:
+                        out_q.put(job)
+                except Exception as e:
+                    self._fail(job, e)
+
+        threads = [threading.Thread(target=worker, daemon=True, name=f"batch-{name}") for _ in range(self.workers[name])]
+        for t in threads:
+            t.start()
+        return threads
+
+    def run(self, urls: list[str]) -> list[BatchJob]:
+        jobs = [BatchJob(i + 1, u) for i, u in enumerate(urls)]
+        self._total = len(jobs)
+        limiter = get_limiter()
+        if self.job_rate:
+            for job in jobs:
+                limiter.set_job_rate(job.index, self.job_rate)
+        resolve_q, download_q = queue.Queue(), queue.Queue()
+        self._postprocessor = PostProcessor(self.merges)
+
+        stages = [
+            ("resolve", self._stage("resolve", self._resolve, resolve_q, download_q), download_q, "download"),
+            ("download", self._stage("download", self._download, download_q, None), None, None),
+        ]
+        for job in jobs:
+            resolve_q.put(job)
+        for _ in range(self.workers["resolve"]):
+            resolve_q.put(None)
+
+        # Quando um estágio termina, encerra os workers do seguinte
+        for _, threads, next_q, next_name in stages:
+            for t in threads:
+                t.join()
+            if next_q is not None:
+                for _ in range(self.workers[next_name]):
+                    next_q.put(None)
+        # Depois do último download, espera o pós-processamento do que foi entregue
+        with self._posts_lock:
+            posts = list(self._posts)
+        wait(posts)
+        self._postprocessor.shutdown()
+        for job in jobs:
+            limiter.release_job(job.index)
+        return jobs
+
+
+def print_summary(jobs: list[BatchJob]):
+    ok = sum(1 for j in jobs if j.ok)
+    skipped = sum(1 for j in jobs if j.status == "já baixado")
+    print(f"\n--- RESUMO DO LOTE: {ok}/{len(jobs)} concluídos ({skipped} já baixados) ---")
+    for j in jobs:
+        label = (j.title or j.url)[:60]
+        detail = j.output if j.ok else f"{j.status}: {j.error}"
+        tag = "PULADO" if j.status == "já baixado" else ("OK" if j.ok else "FALHA")
+        print(f"{j.index:>4}. [{tag}] {label} ({j.elapsed:.1f}s) -> {detail}")
+
+
+def run_batch(urls: list[str], out_dir: str | None = None, **kwargs) -> int:
+    """Expande as URLs, executa o pipeline, imprime o resumo e retorna o código de saída."""
+    out_dir = out_dir or os.getcwd()
+    targets, failures = expand_urls(urls, kwargs.get("resolvers", DEFAULT_RESOLVERS))
+    for url, error in failures:
+        print(f"Não foi possível expandir {url}: {error}")
+    if not targets:
+        print("Nenhuma URL para processar.")
+        return 1
+    print(f"Processando {len(targets)} vídeo(s) em lote...")
+    jobs = BatchRunner(out_dir, **kwargs).run(targets)
+    print_summary(jobs)
+    return 0 if all(j.ok for j in jobs) and not failures else 1
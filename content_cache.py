@@ -0,0 +1,277 @@
+"""
+Cache local de conteúdo: os bytes de cada stream por (ID do vídeo, itag) e as saídas do
+FFmpeg pelo par de entradas que as gerou.
+
+Jobs que pedem o mesmo vídeo, em qualquer pasta de saída, materializam o arquivo a partir
+do cache em vez de baixá-lo de novo: por reflink (cópia sob demanda, em btrfs/XFS) ou
+hardlink, sem ocupar espaço extra. Cópia só com o modo COPY explícito: em AUTO, uma pasta de
+saída noutro sistema de arquivos simplesmente não usa o cache. O índice (SQLite) guarda
+tamanho e mtime de cada objeto para descartar entradas alteradas depois de gravadas, e o
+total é limitado por max_bytes com remoção LRU.
+
+O cache é opcional: fica desligado até configure(True) (--content-cache na linha de comando).
+"""
+from collections import OrderedDict
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem reflink
+    fcntl = None
+
+from manifest_cache import default_cache_dir
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024 * 1024  # 10 GiB
+MAX_ORIGINS = 4096  # caminhos lembrados por key_of (os mais antigos são esquecidos)
+
+AUTO = "auto"
+REFLINK = "reflink"
+HARDLINK = "hardlink"
+COPY = "copy"
+MODES = (AUTO, REFLINK, HARDLINK, COPY)
+
+_FICLONE = 0x40049409  # ioctl do Linux que clona o arquivo inteiro
+
+
+def _reflink(src: str, dest: str):
+    if fcntl is None:
+        raise OSError("reflink indisponível nesta plataforma")
+    with open(src, "rb") as s, open(dest, "wb") as d:
+        fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def place(src: str, dest: str, mode: str = AUTO) -> str:
+    """
+    Cria dest com o conteúdo de src e retorna o método usado. Em AUTO tenta reflink e
+    hardlink, nessa ordem, sem recorrer à cópia. Grava num nome temporário e troca com os.replace:
+    um dest existente é substituído, nunca alterado no lugar.
+    """
+    methods = (REFLINK, HARDLINK) if mode == AUTO else (mode,)
+    tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    error = None
+    for method in methods:
+        try:
+            if method == REFLINK:
+                _reflink(src, tmp)
+            elif method == HARDLINK:
+                os.link(src, tmp)
+            else:
+                shutil.copyfile(src, tmp)
+        except OSError as e:
+            error = e
+            _remove(tmp)
+            continue
+        os.replace(tmp, dest)
+        return method
+    raise error
+
+
+def detach(path: str):
+    """
+    Se path é um hardlink (por exemplo, de um objeto do cache), remove o vínculo para que
+    quem for regravar o caminho crie um arquivo novo em vez de truncar o conteúdo compartilhado.
+    """
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+class ContentCache:
+    def __init__(self, cache_dir: str | None = None, max_bytes: int = DEFAULT_MAX_BYTES, mode: str = AUTO):
+        self.cache_dir = cache_dir or os.path.join(default_cache_dir(), "content")
+        self.max_bytes = max_bytes
+        self.mode = mode
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # Caminho materializado ou guardado -> (chave, tamanho, mtime_ns) naquele momento,
+        # do mais antigo ao mais recente; limitado a MAX_ORIGINS entradas
+        self._origins = OrderedDict()
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS objects (
+                    key TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    last_used REAL,
+                    created_at REAL
+                )
+                """
+            )
+
+    @staticmethod
+    def stream_key(stream) -> str | None:
+        """Chave de um stream: "<ID do vídeo>.<itag>" (None se o stream não conhece o vídeo)."""
+        video_id = getattr(stream, "video_id", None)
+        itag = getattr(stream, "itag", None)
+        if not video_id or itag is None:
+            return None
+        return f"{video_id}.{itag}"
+
+    @staticmethod
+    def merge_key(video_key: str | None, audio_key: str | None, codec_args: list[str]) -> str | None:
+        """Chave da saída do FFmpeg para o par de entradas e os argumentos de codec."""
+        if not video_key or not audio_key:
+            return None
+        digest = hashlib.sha256("\0".join([video_key, audio_key, *codec_args]).encode("utf-8")).hexdigest()
+        return f"merge.{digest[:32]}"
+
+    def _object_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "objects", key)
+
+    def key_lock(self, key: str) -> threading.Lock:
+        """Lock por chave: jobs simultâneos do mesmo stream esperam o primeiro em vez de baixar de novo."""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def lookup(self, key: str, size: int | None = None) -> str | None:
+        """
+        Caminho do objeto, se existir e não tiver mudado desde que foi guardado (e, com size,
+        se tiver esse tamanho); marca como usado (LRU). Entradas inválidas são removidas.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns FROM objects WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        path = self._object_path(key)
+        try:
+            st = os.stat(path)
+            valid = st.st_size == row[0] and st.st_mtime_ns == row[1] and (not size or size == row[0])
+        except OSError:
+            valid = False
+        if not valid:
+            self.remove(key)
+            return None
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE objects SET last_used = ? WHERE key = ?", (time.time(), key))
+        return path
+
+    def materialize(self, key: str, dest: str, size: int | None = None) -> str | None:
+        """Cria dest a partir do objeto em cache; retorna o método usado ou None se não houver entrada."""
+        path = self.lookup(key, size)
+        if path is None:
+            return None
+        try:
+            method = place(path, dest, self.mode)
+        except OSError:
+            return None
+        self._remember(dest, key)
+        return method
+
+    def store(self, key: str, src: str) -> bool:
+        """Guarda o conteúdo de src sob key (com hardlink, src e o objeto dividem o mesmo arquivo)."""
+        try:
+            size = os.path.getsize(src)
+            if size > self.max_bytes:
+                return False
+            path = self._object_path(key)
+            place(src, path, self.mode)
+            st = os.stat(path)
+        except OSError:
+            return False
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)", (key, st.st_size, st.st_mtime_ns, now, now)
+            )
+        self._remember(src, key)
+        self._evict()
+        return True
+
+    def key_of(self, path: str) -> str | None:
+        """Chave do conteúdo de path, se ele veio do cache (ou foi guardado nele) e não mudou desde então."""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._origins.get(path)
+        if entry is None:
+            return None
+        key, size, mtime_ns = entry
+        try:
+            st = os.stat(path)
+            if st.st_size == size and st.st_mtime_ns == mtime_ns:
+                return key
+        except OSError:
+            pass
+        with self._lock:
+            self._origins.pop(path, None)
+        return None
+
+    def _remember(self, path: str, key: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            self._origins[path] = (key, st.st_size, st.st_mtime_ns)
+            self._origins.move_to_end(path)
+            while len(self._origins) > MAX_ORIGINS:
+                self._origins.popitem(last=False)
+
+    def remove(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM objects WHERE key = ?", (key,))
+        _remove(self._object_path(key))
+
+    def _evict(self):
+        """Remove os objetos usados há mais tempo até o total caber em max_bytes."""
+        with self._lock:
+            rows = self._conn.execute("SELECT key, size FROM objects ORDER BY last_used").fetchall()
+        total = sum(size for _, size in rows)
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.remove(key)
+            total -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_settings = {"enabled": False, "max_bytes": DEFAULT_MAX_BYTES, "mode": AUTO}
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def configure(enabled: bool = True, max_bytes: int | None = None, mode: str | None = None):
+    """Liga ou desliga o cache de conteúdo e ajusta limite e método para os próximos downloads."""
+    with _default_lock:
+        _settings["enabled"] = enabled
+        if max_bytes:
+            _settings["max_bytes"] = max_bytes
+        if mode:
+            _settings["mode"] = mode
+        if _default_cache is not None:
+            _default_cache.max_bytes = _settings["max_bytes"]
+            _default_cache.mode = _settings["mode"]
+
+
+def get_content_cache() -> ContentCache | None:
+    """Cache padrão (na pasta de cache do usuário), ou None se desativado (o padrão) ou inacessível."""
+    global _default_cache
+    with _default_lock:
+        if not _settings["enabled"]:
+            return None
+        if _default_cache is None:
+            try:
+                _default_cache = ContentCache(max_bytes=_settings["max_bytes"], mode=_settings["mode"])
+            except (OSError, sqlite3.Error):
+                return None
+        return _default_cache
@@ -0,0 +1,590 @@
+"""
+Modo daemon: os downloads rodam num único processo, controlado por uma API HTTP/JSON local.
+
+Vários clientes compartilham o mesmo pool de workers, o cache de manifestos e o limitador
+de banda. Os jobs ficam num JobStore (SQLite): ao reiniciar, os que não terminaram voltam
+para a fila e os downloads parciais são retomados pelo diário de segmentos.
+
+Endpoints:
+  POST   /jobs            {"url", "res"?, "format"?, "mp4"?, "audio"?, "outdir"?, "priority"?} -> 201 job
+                          ("audio": perfil de postprocess.AUDIO_PROFILES, ex.: "mp3";
+                          "outdir": subpasta da pasta de saída do daemon)
+  GET    /jobs            lista (filtro opcional ?status=queued|running|done|failed|cancelled|skipped)
+  GET    /jobs/<id>       estado do job, com o progresso atual
+  DELETE /jobs/<id>       cancela o job
+  GET    /events          server-sent events de status e progresso (?job=<id> filtra)
+  GET    /metrics         métricas por fase no formato do Prometheus
+  GET    /health          fila, pós-processamento, HTTP e hosts limitando as requisições
+
+Uso: python daemon.py --port 8765 --outdir /srv/videos --workers 4
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import adaptive
+from archive import get_default_archive, selection_key
+import content_cache
+from download_engine import DEFAULT_SEGMENTS, DEFAULT_SEGMENT_SIZE, DownloadCancelled, download_stream
+from formats import FormatSelectorError, parse_selector
+from job_store import CANCELLED, DONE, FAILED, FINAL_STATES, QUEUED, RUNNING, SKIPPED, JobStore
+from manifest_cache import extract_video_id, resolve_video
+from media import (
+    PLAN_SUFFIXES,
+    sanitize_title,
+    select_streams,
+    stream_extension,
+    submit_download_and_merge,
+)
+from metrics import get_recorder, job_scope
+from postprocess import AUDIO_PROFILES, PostProcessor, PostTask, finishing_steps
+from progress import ProgressBus
+from ratelimit import parse_rate
+import retry
+from retry import describe
+from scheduler import DownloadScheduler
+import transport
+
+DEFAULT_PORT = 8765
+EVENT_INTERVAL = 0.5  # segundos entre rodadas de eventos de progresso
+KEEPALIVE_INTERVAL = 15
+# Campos opcionais de POST /jobs e o tipo JSON aceito para cada um (null = ausente)
+JOB_FIELDS = {"res": str, "format": str, "audio": str, "outdir": str, "mp4": bool, "priority": int}
+_JSON_TYPES = {str: "texto", bool: "true ou false", int: "inteiro"}
+SUBSCRIBER_BUFFER = 1000  # eventos pendentes por cliente antes de descartar
+
+
+class EventHub:
+    """Distribui eventos aos clientes SSE; um cliente lento perde eventos em vez de travar os demais."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event: str, data: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                pass
+
+
+class DownloadDaemon:
+    def __init__(
+        self,
+        store: JobStore,
+        out_dir: str,
+        workers: int = 3,
+        max_fetches: int = 3,
+        max_merges: int = 2,
+        segments: int = DEFAULT_SEGMENTS,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        usar_cache: bool = True,
+        arquivo=None,
+        post_workers: int | None = None,
+        miniatura: bool = False,
+        metadados: bool = False,
+    ):
+        self.store = store
+        self.out_dir = out_dir
+        self.segments = segments
+        self.segment_size = segment_size
+        self.usar_cache = usar_cache
+        self.arquivo = arquivo
+        self.scheduler = DownloadScheduler(workers, max_fetches, max_merges)
+        # Mesclagens com arquivos e os demais passos: os workers de rede entregam e seguem
+        self.postprocessor = PostProcessor(post_workers)
+        self.miniatura = miniatura
+        self.metadados = metadados
+        self.progress_bus = ProgressBus()
+        self.events = EventHub()
+        # Progresso mais recente de cada job em execução: id -> (baixados, total, vazão)
+        self._progress = {}
+        self._active = set()
+        # cancel_event do job no agendador enquanto ele roda ou está no pós-processamento
+        self._cancel_events = {}
+        self._names_lock = threading.Lock()
+        self._names = set()
+        self._stop = threading.Event()
+        self._pump_thread = threading.Thread(target=self._pump, daemon=True, name="daemon-events")
+
+    def start(self) -> int:
+        """Reenfileira os jobs pendentes do JobStore e inicia o envio de eventos; retorna quantos voltaram."""
+        pending = self.store.requeue_unfinished()
+        for job in pending:
+            self._enqueue(job)
+        self._pump_thread.start()
+        return len(pending)
+
+    def shutdown(self):
+        self._stop.set()
+        self.scheduler.shutdown()
+        self.postprocessor.shutdown(wait=False)
+
+    # --- API ---
+
+    def submit(
+        self,
+        url: str,
+        resolution: str | None = None,
+        format: str | None = None,
+        require_mp4: bool = False,
+        out_dir: str | None = None,
+        priority: int = 0,
+        audio_profile: str | None = None,
+    ) -> dict:
+        if not extract_video_id(url):
+            raise ValueError(f"URL de vídeo inválida: {url}")
+        if format:
+            parse_selector(format)
+        if audio_profile and audio_profile not in AUDIO_PROFILES:
+            raise ValueError(f"Perfil de áudio desconhecido: {audio_profile} (opções: {', '.join(AUDIO_PROFILES)})")
+        job = self.store.add(
+            url, self.resolve_out_dir(out_dir), resolution, format, require_mp4, priority, audio_profile=audio_profile
+        )
+        self._enqueue(job)
+        self._publish_status(job)
+        return self.view(job)
+
+    def resolve_out_dir(self, out_dir: str | None) -> str:
+        """
+        Pasta de saída de um job: out_dir relativo à pasta do daemon (ou absoluto, desde que
+        dentro dela). Os clientes da API não escolhem onde gravar fora dessa pasta.
+        """
+        root = os.path.realpath(self.out_dir)
+        path = os.path.realpath(os.path.join(root, out_dir or ""))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Pasta de saída fora de {root}: {out_dir}")
+        return path
+
+    def get(self, job_id: int) -> dict | None:
+        job = self.store.get(job_id)
+        return self.view(job) if job else None
+
+    def list_jobs(self, status: str | None = None) -> list[dict]:
+        return [self.view(job) for job in self.store.list_jobs(status)]
+
+    def cancel(self, job_id: int) -> dict | None:
+        """
+        Cancela o job: se ainda está na fila sai do agendador; em execução, a rede e a
+        mesclagem por pipes param no próximo bloco e os passos de pós-processamento ainda
+        não iniciados não rodam. Um passo do FFmpeg já em curso termina, mas o resultado é
+        descartado (o job fica "cancelled" e não entra no arquivo de downloads).
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job["status"] not in FINAL_STATES:
+            self.scheduler.cancel(job_id)
+            # Depois que a rede termina o job já saiu do agendador: sinaliza o evento direto
+            cancel_event = self._cancel_events.get(job_id)
+            if cancel_event is not None:
+                cancel_event.set()
+            self._set_status(job_id, CANCELLED)
+        return self.get(job_id)
+
+    def view(self, job: dict) -> dict:
+        """Job do JobStore com o progresso ao vivo, se estiver em execução."""
+        live = self._progress.get(job["id"])
+        if live is not None:
+            done, total, rate = live
+            job = dict(job, bytes_done=done, bytes_total=total, rate=rate)
+        return job
+
+    # --- execução ---
+
+    def _enqueue(self, job: dict):
+        self.scheduler.submit(job["id"], lambda sjob, job_id=job["id"]: self._run(job_id, sjob), priority=job["priority"])
+
+    def _set_status(self, job_id: int, status: str, **fields):
+        current = self.store.get(job_id)
+        if current is None:
+            return
+        # Um job cancelado durante a execução não volta a aparecer como concluído
+        if current["status"] == CANCELLED and status != CANCELLED:
+            return
+        live = self._progress.get(job_id)
+        if live is not None:
+            fields.setdefault("bytes_done", live[0])
+            fields.setdefault("bytes_total", live[1])
+        self.store.update(job_id, status=status, **fields)
+        self._publish_status(self.store.get(job_id))
+
+    def _publish_status(self, job: dict):
+        self.events.publish("status", self.view(job))
+
+    def _claim_name(self, out_dir: str, title: str, url: str) -> str:
+        # Jobs simultâneos com o mesmo título na mesma pasta não podem dividir arquivos temporários
+        base = sanitize_title(title) or (extract_video_id(url) or "video")
+        with self._names_lock:
+            if (out_dir, base) in self._names:
+                base = f"{base}_{extract_video_id(url)}"
+            self._names.add((out_dir, base))
+        return base
+
+    def _release_name(self, out_dir: str, base: str):
+        with self._names_lock:
+            self._names.discard((out_dir, base))
+
+    def _run(self, job_id: int, sjob):
+        job = self.store.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+        self._active.add(job_id)
+        self._cancel_events[job_id] = sjob.cancel_event
+        self._set_status(job_id, RUNNING)
+        selecao = selection_key(job["format"] or job["resolution"], job["audio_profile"], job["require_mp4"])
+        base = None
+        handed_off = False
+        try:
+            with job_scope(job_id):
+                if self.arquivo is not None:
+                    anterior = self.arquivo.lookup(job["url"], selecao)
+                    if anterior:
+                        self._set_status(job_id, SKIPPED, output_path=anterior["output_path"])
+                        return
+                yt = resolve_video(job["url"], use_cache=self.usar_cache)
+                self.store.update(job_id, title=yt.title)
+                # Conversão de áudio sem formato explícito: baixa só o melhor áudio
+                formato = job["format"] or ("bestaudio/best" if job["audio_profile"] and not job["resolution"] else None)
+                plan = select_streams(yt, job["resolution"], formato)
+                if plan is None:
+                    raise RuntimeError("nenhum stream adequado encontrado")
+                kind, first, second = plan
+                steps = finishing_steps(yt, job["audio_profile"], self.miniatura, self.metadados)
+                base = self._claim_name(job["out_dir"], yt.title, job["url"])
+                os.makedirs(job["out_dir"], exist_ok=True)
+                on_progress = lambda done, total: self.progress_bus.publish(job_id, done, total)
+                if kind == "adaptive":
+                    future = submit_download_and_merge(
+                        first,
+                        second,
+                        job["out_dir"],
+                        base,
+                        self.segments,
+                        self.segment_size,
+                        on_progress,
+                        fetch_slot=self.scheduler.fetch_slot,
+                        merge_slot=self.scheduler.merge_slot,
+                        job_id=job_id,
+                        require_mp4=job["require_mp4"],
+                        steps=steps,
+                        postprocessor=self.postprocessor,
+                        cancel_event=sjob.cancel_event,
+                    )
+                    itags = [first.itag, second.itag]
+                else:
+                    total = first.filesize
+                    filename = f"{base}{PLAN_SUFFIXES[kind]}.{stream_extension(first)}"
+                    with self.scheduler.fetch_slot:
+                        path = download_stream(
+                            first,
+                            job["out_dir"],
+                            filename,
+                            self.segments,
+                            self.segment_size,
+                            on_progress=lambda stream, chunk, remaining: on_progress(total - remaining, total),
+                            cancel_event=sjob.cancel_event,
+                            job_id=job_id,
+                        )
+                    future = self.postprocessor.submit(
+                        PostTask(steps, path, job_id, has_video=kind != "audio", cancel_event=sjob.cancel_event)
+                    )
+                    itags = [first.itag]
+            self.progress_bus.finish(job_id)
+            # O worker volta ao agendador; o job termina quando o pós-processamento concluir
+            handed_off = True
+            future.add_done_callback(lambda f: self._complete(job_id, job, selecao, itags, base, sjob.cancel_event, f))
+        except DownloadCancelled:
+            self._set_status(job_id, CANCELLED)
+        except Exception as e:
+            self._set_status(job_id, FAILED, error=describe(e))
+        finally:
+            if not handed_off:
+                self._release(job_id, job, base)
+
+    def _complete(self, job_id: int, job: dict, selecao, itags: list, base: str, cancel_event, future):
+        # O evento vem do próprio job: a entrada em _cancel_events pode já ter saído
+        try:
+            output_path = future.result()
+            if cancel_event.is_set():
+                return
+            if self.arquivo is not None:
+                try:
+                    self.arquivo.record(job["url"], selecao, output_path, itags)
+                except (OSError, sqlite3.Error):
+                    pass
+            size = os.path.getsize(output_path)
+            self._set_status(job_id, DONE, output_path=output_path, error=None, bytes_done=size, bytes_total=size)
+        except DownloadCancelled:
+            self._set_status(job_id, CANCELLED)
+        except Exception as e:
+            self._set_status(job_id, FAILED, error=str(e))
+        finally:
+            self._release(job_id, job, base)
+
+    def _release(self, job_id: int, job: dict, base: str | None):
+        if base is not None:
+            self._release_name(job["out_dir"], base)
+        self._active.discard(job_id)
+        self._cancel_events.pop(job_id, None)
+        self.progress_bus.forget(job_id)
+        self._progress.pop(job_id, None)
+
+    def _pump(self):
+        """Converte o progresso acumulado no barramento em eventos "progress" a cada EVENT_INTERVAL."""
+        while not self._stop.wait(EVENT_INTERVAL):
+            for snap in self.progress_bus.drain():
+                if snap.item_id not in self._active:
+                    continue
+                self._progress[snap.item_id] = (snap.done, snap.total, snap.rate)
+                self.events.publish(
+                    "progress",
+                    {
+                        "id": snap.item_id,
+                        "bytes_done": snap.done,
+                        "bytes_total": snap.total,
+                        "percent": round(snap.percent, 1),
+                        "rate": snap.rate,
+                        "eta": snap.eta,
+                    },
+                )
+
+
+def make_handler(daemon: DownloadDaemon):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = "YouTubeDownloaderDaemon"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status: int, message: str):
+            self._send_json(status, {"error": message})
+
+        def _route(self) -> tuple[list[str], dict]:
+            parsed = urllib.parse.urlparse(self.path)
+            parts = [p for p in parsed.path.split("/") if p]
+            params = {k: v[-1] for k, v in urllib.parse.parse_qs(parsed.query).items()}
+            return parts, params
+
+        def _job_id(self, parts: list[str]) -> int | None:
+            if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+                return int(parts[1])
+            return None
+
+        def do_GET(self):
+            parts, params = self._route()
+            if parts == ["health"]:
+                self._send_json(
+                    200,
+                    {
+                        "status": "ok",
+                        "pending": len(daemon.scheduler.pending()),
+                        "postprocess_pending": daemon.postprocessor.pending,
+                        "http": transport.get_transport().stats.snapshot(),
+                        # Hosts limitando as requisições: {host: segundos até voltar a tentar}
+                        "throttled_hosts": {host: round(left, 1) for host, left in retry.open_circuits().items()},
+                    },
+                )
+            elif parts == ["jobs"]:
+                self._send_json(200, {"jobs": daemon.list_jobs(params.get("status"))})
+            elif parts == ["events"]:
+                self._stream_events(int(params["job"]) if params.get("job", "").isdigit() else None)
+            elif parts == ["metrics"]:
+                body = get_recorder().prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif self._job_id(parts) is not None:
+                job = daemon.get(self._job_id(parts))
+                if job is None:
+                    self._error(404, "job não encontrado")
+                else:
+                    self._send_json(200, job)
+            else:
+                self._error(404, "rota desconhecida")
+
+        def do_POST(self):
+            parts, _ = self._route()
+            if parts != ["jobs"]:
+                self._error(404, "rota desconhecida")
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(payload, dict) or not isinstance(payload.get("url"), str) or not payload["url"]:
+                    raise ValueError("informe ao menos {\"url\": ...}")
+                for field, kind in JOB_FIELDS.items():
+                    value = payload.get(field)
+                    # bool é subclasse de int: {"priority": true} não é uma prioridade
+                    if value is not None and (not isinstance(value, kind) or (kind is int and isinstance(value, bool))):
+                        raise ValueError(f"campo \"{field}\" deve ser {_JSON_TYPES[kind]}")
+                job = daemon.submit(
+                    payload["url"],
+                    resolution=payload.get("res"),
+                    format=payload.get("format"),
+                    require_mp4=bool(payload.get("mp4")),
+                    out_dir=payload.get("outdir"),
+                    priority=payload.get("priority") or 0,
+                    audio_profile=payload.get("audio"),
+                )
+            except (ValueError, FormatSelectorError) as e:
+                self._error(400, str(e))
+                return
+            self._send_json(201, job)
+
+        def do_DELETE(self):
+            parts, _ = self._route()
+            job_id = self._job_id(parts)
+            job = daemon.cancel(job_id) if job_id is not None else None
+            if job is None:
+                self._error(404, "job não encontrado")
+            else:
+                self._send_json(200, job)
+
+        def _stream_events(self, job_id: int | None):
+            # Sem Content-Length: o corpo termina quando a conexão fecha
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            q = daemon.events.subscribe()
+            try:
+                # Estado inicial, para o cliente não depender de uma consulta separada
+                initial = [daemon.get(job_id)] if job_id is not None else daemon.list_jobs(RUNNING) + daemon.list_jobs(QUEUED)
+                for job in initial:
+                    if job is not None:
+                        self._write_event("status", job)
+                while True:
+                    try:
+                        event, data = q.get(timeout=KEEPALIVE_INTERVAL)
+                    except queue.Empty:
+                        self.wfile.write(b": keepalive\n\n")
+                        self.wfile.flush()
+                        continue
+                    if job_id is None or data.get("id") == job_id:
+                        self._write_event(event, data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                daemon.events.unsubscribe(q)
+
+        def _write_event(self, event: str, data: dict):
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(daemon: DownloadDaemon, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """Cria o servidor HTTP da API (chame serve_forever ou rode em outra thread)."""
+    server = ThreadingHTTPServer((host, port), make_handler(daemon))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daemon de downloads com API HTTP/JSON local")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta (padrão: só a máquina local)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--outdir", default=os.getcwd(), help="Pasta de saída padrão dos jobs")
+    parser.add_argument("--db", help="Banco SQLite dos jobs (padrão: pasta de dados do usuário)")
+    parser.add_argument("--workers", type=int, default=3, help="Jobs executados ao mesmo tempo")
+    parser.add_argument("--max-fetches", type=int, default=3, help="Jobs baixando ao mesmo tempo")
+    parser.add_argument("--max-merges", type=int, default=2, help="Mesclagens por pipes simultâneas (rede e FFmpeg juntos)")
+    parser.add_argument("--post-workers", type=int, help="Processos FFmpeg simultâneos no pós-processamento (padrão: um por núcleo)")
+    parser.add_argument("--embed-thumbnail", action="store_true", help="Embute a miniatura como capa nos arquivos finais")
+    parser.add_argument("--add-metadata", action="store_true", help="Grava título, autor e URL nos metadados dos arquivos finais")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS)
+    parser.add_argument("--segment-size", type=int, default=DEFAULT_SEGMENT_SIZE)
+    parser.add_argument("--no-adaptive", action="store_true", help="Mantém conexões e tamanho de faixa fixos")
+    parser.add_argument("--max-connections", type=int, default=adaptive.MAX_CONNECTIONS, help="Teto de conexões por arquivo")
+    parser.add_argument("--no-cache", action="store_true", help="Ignora o cache de manifestos")
+    parser.add_argument("--content-cache", action="store_true", help="Reaproveita streams e mesclagens já baixados (cache de conteúdo local)")
+    parser.add_argument("--content-cache-size", help="Tamanho máximo do cache de conteúdo (ex.: 20G)")
+    parser.add_argument("--content-cache-mode", choices=content_cache.MODES, default=content_cache.AUTO, help="auto: reflink ou hardlink, sem cópia")
+    parser.add_argument("--no-archive", action="store_true", help="Não consulta nem atualiza o arquivo de downloads")
+    parser.add_argument("--metrics-log", metavar="PATH", help="Grava cada fase concluída como uma linha JSON")
+    parser.add_argument("--http-pool", type=int, default=transport.DEFAULT_POOL_SIZE, help="Conexões keep-alive ociosas mantidas por host")
+    parser.add_argument("--http-timeout", type=float, default=transport.DEFAULT_READ_TIMEOUT, help="Tempo máximo (s) de espera por dados")
+    parser.add_argument("--read-buffer", type=int, default=transport.DEFAULT_READ_SIZE, help="Bytes lidos da conexão a cada leitura")
+    parser.add_argument("--retries", type=int, default=retry.DEFAULT_RETRIES, help="Novas tentativas de cada faixa após quedas de conexão e timeouts")
+    parser.add_argument("--throttle-pause", type=float, default=retry.BREAKER_COOLDOWN, help="Pausa (s) da fila quando um host limita as requisições")
+    args = parser.parse_args()
+
+    arquivo = None
+    if not args.no_archive:
+        try:
+            arquivo = get_default_archive()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Aviso: arquivo de downloads indisponível: {e}")
+    if args.metrics_log:
+        get_recorder().open_log(args.metrics_log)
+    transport.configure(args.http_pool, args.http_timeout, args.read_buffer)
+    retry.configure(args.retries, args.throttle_pause)
+    adaptive.configure(not args.no_adaptive, args.max_connections)
+    content_cache.configure(
+        args.content_cache, parse_rate(args.content_cache_size) if args.content_cache_size else None, args.content_cache_mode
+    )
+    if args.host not in ("127.0.0.1", "localhost", "::1"):
+        print("Aviso: a API não tem autenticação; exponha-a só em redes confiáveis.")
+
+    daemon = DownloadDaemon(
+        JobStore(args.db),
+        args.outdir,
+        workers=args.workers,
+        max_fetches=args.max_fetches,
+        max_merges=args.max_merges,
+        post_workers=args.post_workers,
+        miniatura=args.embed_thumbnail,
+        metadados=args.add_metadata,
+        segments=args.segments,
+        segment_size=args.segment_size,
+        usar_cache=not args.no_cache,
+        arquivo=arquivo,
+    )
+    server = serve(daemon, args.host, args.port)
+    retomados = daemon.start()
+    print(f"Daemon ouvindo em http://{args.host}:{server.server_address[1]} ({retomados} job(s) retomado(s))")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando; jobs em andamento serão retomados na próxima execução.")
+    finally:
+        server.server_close()
+        daemon.shutdown()
+        get_recorder().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,650 @@
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import retry
+from adaptive import MAX_THROTTLE_RETRIES, new_controller
+from content_cache import detach, get_content_cache
+from manifest_cache import refresh_stream_url
+from metrics import span
+from ratelimit import get_limiter
+from transport import get_transport
+
+DEFAULT_SEGMENTS = 4
+DEFAULT_SEGMENT_SIZE = 8 * 1024 * 1024  # 8 MiB por faixa de bytes
+CHUNK_SIZE = 64 * 1024
+# Teto do que iter_stream_chunks mantém em memória entre faixas buscadas à frente
+STREAM_BUFFER_LIMIT = 64 * 1024 * 1024
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Language": "en-US,en",
+}
+
+
+class RangeNotSupported(Exception):
+    """O servidor ignorou o cabeçalho Range (respondeu 200 em vez de 206)."""
+
+
+class DownloadCancelled(Exception):
+    """O download foi interrompido por um cancel_event."""
+
+
+class StreamSource:
+    """
+    URL assinada de um stream, compartilhada pelas faixas de um download. Com refresh (uma
+    função que extrai o vídeo de novo e retorna a URL atual), renew() troca uma URL vencida;
+    várias faixas que recebem o 403 ao mesmo tempo disparam uma só reextração.
+    """
+
+    def __init__(self, url: str, refresh=None):
+        self.url = url
+        self.refresh = refresh
+        self.generation = 0
+        self.renewals = 0
+        self._lock = threading.Lock()
+
+    def renew(self, generation: int):
+        """Renova a URL vista na geração generation (se outra faixa já não a renovou)."""
+        with self._lock:
+            if self.generation != generation:
+                return
+            self.url = self.refresh()
+            self.generation += 1
+            self.renewals += 1
+
+
+def stream_source(stream) -> StreamSource:
+    """StreamSource da URL de um stream, renovada pela reextração do vídeo (manifest_cache.refresh_stream_url)."""
+
+    def refresh():
+        stream.url = refresh_stream_url(stream)
+        return stream.url
+
+    return StreamSource(stream.url, refresh if getattr(stream, "video_id", None) else None)
+
+
+def _iter_range(url: str, start: int, end: int, headers: dict, cancel_event=None, job_id=None):
+    """Gera os blocos dos bytes [start, end] de url, verificando Range e cancelamento.
+
+    Cada bloco passa pelo limitador de banda global (e pelo limite do job_id, se houver).
+    A requisição usa o transporte ativo, que reaproveita conexões keep-alive do host.
+    """
+    limiter = get_limiter()
+    transport = get_transport()
+    req_headers = dict(headers)
+    req_headers["Range"] = f"bytes={start}-{end}"
+    with transport.request("GET", url, req_headers) as resp:
+        if resp.status != 206:
+            raise RangeNotSupported(f"Resposta {resp.status} para Range {start}-{end}")
+        remaining = end - start + 1
+        while remaining > 0:
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled()
+            chunk = resp.read(min(transport.read_size, remaining))
+            if not chunk:
+                raise retry.TruncatedResponse(f"Conexão encerrada com {remaining} bytes faltando no segmento {start}-{end}")
+            remaining -= len(chunk)
+            limiter.throttle(len(chunk), job_id)
+            yield chunk
+
+
+def _fetch_range(url: str, start: int, end: int, dest_path: str, headers: dict, on_chunk=None, cancel_event=None, job_id=None, cursor=None) -> int:
+    """
+    Baixa os bytes [start, end], grava no offset correspondente e retorna o CRC32 da faixa.
+
+    cursor ({"pos", "crc"}) acompanha o que já foi gravado: chamado de novo com o mesmo
+    cursor depois de uma queda, continua do último byte recebido.
+    """
+    cursor = cursor if cursor is not None else {"pos": start, "crc": 0}
+    # Cada segmento usa seu próprio handle: seek+write é seguro entre threads
+    with open(dest_path, "r+b") as fh:
+        if cursor["pos"] <= end:
+            fh.seek(cursor["pos"])
+            for chunk in _iter_range(url, cursor["pos"], end, headers, cancel_event, job_id):
+                fh.write(chunk)
+                cursor["pos"] += len(chunk)
+                cursor["crc"] = zlib.crc32(chunk, cursor["crc"])
+                if on_chunk:
+                    on_chunk(chunk)
+        fh.flush()
+        os.fsync(fh.fileno())
+    return cursor["crc"]
+
+
+def _read_range(url: str, start: int, end: int, headers: dict, cancel_event=None, job_id=None, on_chunk=None, received=None) -> bytes:
+    """Bytes [start, end] em memória; received (lista de blocos) guarda o já recebido entre tentativas."""
+    chunks = received if received is not None else []
+    pos = start + sum(len(c) for c in chunks)
+    if pos <= end:
+        for chunk in _iter_range(url, pos, end, headers, cancel_event, job_id):
+            chunks.append(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+    return b"".join(chunks)
+
+
+def _controlled(controller, fetch, nbytes: int, cancel_event, source: StreamSource):
+    """
+    Roda fetch(url, on_chunk) para uma faixa de nbytes da URL de source, medindo vazão e
+    latência para o controlador, e se recupera das falhas conforme retry.classify:
+
+    - throttling: espera o tempo indicado pelo controlador e repete, até MAX_THROTTLE_RETRIES
+      vezes; a resposta conta no disjuntor do host, que segura as requisições enquanto aberto
+    - URL vencida (ou 403 que persiste depois das repetições): extrai o vídeo de novo
+      (source.renew) e repete na hora, até retry.MAX_URL_RENEWALS vezes
+    - falha transitória: repete com retry.backoff, até retry.max_retries() vezes; fetch deve
+      continuar do último byte recebido
+    """
+    throttles = transients = renewals = 0
+    while True:
+        url, generation = source.url, source.generation
+        breaker = retry.get_breaker(url)
+        probe = breaker.acquire(cancel_event) if breaker is not None else False
+        if probe is None:
+            raise DownloadCancelled()
+        t0 = time.monotonic()
+        measured = {"bytes": 0, "first_byte": None, "quarter": None}
+
+        def on_chunk(chunk):
+            nonlocal probe
+            now = time.monotonic() - t0
+            if measured["first_byte"] is None:
+                measured["first_byte"] = now
+                if probe:
+                    # O host voltou a responder: libera as requisições que esperam o teste
+                    breaker.record(None, probe=True)
+                    probe = False
+            measured["bytes"] += len(chunk)
+            if measured["quarter"] is None and measured["bytes"] * 4 >= nbytes:
+                measured["quarter"] = now
+            controller.add_bytes(len(chunk))
+
+        try:
+            result = fetch(url, on_chunk)
+        except Exception as e:
+            kind = retry.classify(e)
+            if breaker is not None:
+                breaker.record(kind, retry.retry_after(e), probe)
+            if kind == retry.THROTTLED and throttles < MAX_THROTTLE_RETRIES:
+                throttles += 1
+                delay = controller.throttled(retry.status_of(e), retry.retry_after(e))
+            elif (
+                (kind == retry.EXPIRED or (kind == retry.THROTTLED and retry.status_of(e) == 403))
+                and source.refresh is not None
+                and renewals < retry.MAX_URL_RENEWALS
+            ):
+                renewals += 1
+                source.renew(generation)
+                kind, delay = retry.EXPIRED, 0
+            elif kind == retry.TRANSIENT and transients < retry.max_retries():
+                delay = retry.backoff(transients)
+                transients += 1
+            else:
+                raise
+            retry.note_retry(kind)
+        else:
+            if breaker is not None and probe:
+                breaker.record(None, probe=True)
+            elapsed = time.monotonic() - t0
+            first_byte = measured["first_byte"] or 0.0
+            # Numa tentativa retomada, só o restante da faixa passou por esta requisição
+            controller.record(measured["bytes"], elapsed, first_byte, measured["quarter"] or first_byte)
+            return result
+        if cancel_event is not None:
+            if cancel_event.wait(delay):
+                raise DownloadCancelled()
+        else:
+            time.sleep(delay)
+
+
+def part_path(dest_path: str) -> str:
+    return dest_path + ".part"
+
+
+def journal_path(dest_path: str) -> str:
+    return dest_path + ".part.json"
+
+
+def has_partial(dest_path: str) -> bool:
+    """Indica se há um download interrompido (arquivo .part com diário) para dest_path."""
+    return os.path.exists(journal_path(dest_path)) and os.path.exists(part_path(dest_path))
+
+
+def _file_crc(fh, start: int, length: int) -> int:
+    crc = 0
+    fh.seek(start)
+    while length > 0:
+        data = fh.read(min(CHUNK_SIZE * 16, length))
+        if not data:
+            break
+        crc = zlib.crc32(data, crc)
+        length -= len(data)
+    return crc
+
+
+def _load_journal(dest_path: str, key, total_size: int) -> dict[int, tuple[int, int]]:
+    """
+    Lê o diário de um .part e retorna {início: (fim, crc32)} das faixas concluídas
+    cujo conteúdo em disco confere com o checksum registrado.
+    """
+    part = part_path(dest_path)
+    try:
+        with open(journal_path(dest_path), "r", encoding="utf-8") as fh:
+            journal = json.load(fh)
+        if journal.get("key") != key or journal.get("filesize") != total_size or os.path.getsize(part) != total_size:
+            return {}
+        recorded = {}
+        for start, entry in journal.get("done", {}).items():
+            start = int(start)
+            if isinstance(entry, int):
+                # Diário antigo, com faixas de tamanho fixo
+                recorded[start] = (min(start + journal["segment_size"], total_size) - 1, entry)
+            else:
+                recorded[start] = (int(entry[0]), int(entry[1]))
+    except (OSError, ValueError, TypeError, AttributeError, KeyError, IndexError):
+        return {}
+
+    verified = {}
+    with open(part, "rb") as fh:
+        for start, (end, crc) in recorded.items():
+            if 0 <= start <= end < total_size and _file_crc(fh, start, end - start + 1) == crc:
+                verified[start] = (end, crc)
+    return verified
+
+
+def _write_journal(dest_path: str, key, total_size: int, done: dict[int, tuple[int, int]]):
+    path = journal_path(dest_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"key": key, "filesize": total_size, "done": {str(k): list(v) for k, v in done.items()}}, fh)
+    os.replace(tmp, path)
+
+
+def _missing_ranges(total_size: int, done: dict[int, tuple[int, int]]) -> list[tuple[int, int]]:
+    """Faixas inclusivas de [0, total_size) ainda não cobertas pelas faixas concluídas."""
+    gaps = []
+    pos = 0
+    for start, (end, _) in sorted(done.items()):
+        if start > pos:
+            gaps.append((pos, start - 1))
+        pos = max(pos, end + 1)
+    if pos < total_size:
+        gaps.append((pos, total_size - 1))
+    return gaps
+
+
+def download_segmented(
+    url: str | StreamSource,
+    total_size: int,
+    dest_path: str,
+    segments: int = DEFAULT_SEGMENTS,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    on_progress=None,
+    headers: dict | None = None,
+    cancel_event=None,
+    resume_key=None,
+    job_id=None,
+    controller=None,
+):
+    """
+    Baixa url para dest_path usando várias conexões simultâneas com requisições Range.
+
+    Os dados vão para dest_path + ".part", pré-alocado com total_size bytes, e cada faixa
+    é gravada diretamente na sua posição. Um diário (".part.json") registra as faixas
+    concluídas com seu CRC32; se o processo morrer, a próxima chamada com o mesmo
+    resume_key (ex.: itag) e tamanho verifica as faixas e busca só as que faltam.
+    Ao final o .part é renomeado para dest_path.
+
+    O número de conexões e o tamanho de cada faixa vêm do controller (ver adaptive.py);
+    sem um, segments e segment_size são o ponto de partida do controlador padrão. Falhas
+    de cada faixa são tratadas por _controlled: uma queda retoma do último byte recebido e,
+    se url for um StreamSource com refresh, uma URL vencida é renovada sem perder o baixado.
+
+    on_progress(chunk, bytes_remaining) é chamado a cada bloco recebido (e uma vez no
+    início, com chunk vazio, informando o que falta). Se cancel_event (threading.Event)
+    for sinalizado, os segmentos param e DownloadCancelled é levantada.
+    """
+    headers = {**DEFAULT_HEADERS, **(headers or {})}
+    source = url if isinstance(url, StreamSource) else StreamSource(url)
+    if os.path.exists(dest_path) and os.path.getsize(dest_path) == total_size and not has_partial(dest_path):
+        # Já concluído em uma execução anterior
+        if on_progress:
+            on_progress(b"", 0)
+        return dest_path
+
+    if controller is None:
+        controller = new_controller(segments, segment_size)
+    # Evento próprio: a falha de uma faixa para as outras sem marcar o job do chamador como
+    # cancelado; o cancel_event do chamador é repassado a ele no laço abaixo
+    stop = threading.Event()
+    part = part_path(dest_path)
+    done = _load_journal(dest_path, resume_key, total_size)
+    if not done:
+        with open(part, "wb") as fh:
+            fh.truncate(total_size)
+    _write_journal(dest_path, resume_key, total_size, done)
+
+    gaps = deque(_missing_ranges(total_size, done))
+    lock = threading.Lock()
+    missing = sum(end - start + 1 for start, end in gaps)
+    state = {"remaining": missing, "unassigned": missing}
+    if on_progress:
+        on_progress(b"", state["remaining"])
+
+    def on_chunk(chunk):
+        with lock:
+            state["remaining"] -= len(chunk)
+            remaining = state["remaining"]
+        if on_progress:
+            on_progress(chunk, remaining)
+
+    def next_range():
+        # As faixas são cortadas na hora, com o tamanho que o controlador indicar
+        start, end = gaps.popleft()
+        size = controller.chunk_for(state["unassigned"])
+        if end - start + 1 > size:
+            gaps.appendleft((start + size, end))
+            end = start + size - 1
+        state["unassigned"] -= end - start + 1
+        return start, end
+
+    def fetch_range(start, end):
+        cursor = {"pos": start, "crc": 0}
+
+        def fetch(url, measure):
+            def both(chunk):
+                measure(chunk)
+                on_chunk(chunk)
+
+            return _fetch_range(url, start, end, part, headers, both, stop, job_id, cursor)
+
+        crc = _controlled(controller, fetch, end - start + 1, stop, source)
+        with lock:
+            done[start] = (end, crc)
+            _write_journal(dest_path, resume_key, total_size, done)
+
+    # Uma thread por conexão possível; o controlador decide quantas faixas ficam em voo
+    error = None
+    with ThreadPoolExecutor(max_workers=controller.max_connections) as pool:
+        running = set()
+        while gaps or running:
+            if cancel_event is not None and cancel_event.is_set():
+                stop.set()
+            while gaps and len(running) < controller.connections and not stop.is_set():
+                running.add(pool.submit(fetch_range, *next_range()))
+                if not gaps:
+                    controller.draining()
+            finished, running = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                exc = fut.exception()
+                if exc is not None:
+                    # Interrompe as demais conexões antes de propagar o erro
+                    stop.set()
+                    if error is None or isinstance(error, DownloadCancelled):
+                        error = exc
+            if stop.is_set() and not running:
+                break
+    if error is not None:
+        raise error
+    if gaps:
+        raise DownloadCancelled()
+
+    os.replace(part, dest_path)
+    try:
+        os.remove(journal_path(dest_path))
+    except OSError:
+        pass
+    return dest_path
+
+
+def iter_stream_chunks(
+    url: str | StreamSource,
+    total_size: int,
+    segments: int = DEFAULT_SEGMENTS,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    headers: dict | None = None,
+    cancel_event=None,
+    job_id=None,
+    controller=None,
+):
+    """
+    Gera o conteúdo de url em ordem, para consumidores sequenciais como um pipe do FFmpeg.
+
+    Faixas são buscadas à frente em paralelo, tantas quanto as conexões liberadas pelo
+    controller, e mantidas em memória até STREAM_BUFFER_LIMIT bytes. As falhas de cada faixa
+    são tratadas como em download_segmented.
+    """
+    headers = {**DEFAULT_HEADERS, **(headers or {})}
+    source = url if isinstance(url, StreamSource) else StreamSource(url)
+    if controller is None:
+        controller = new_controller(segments, segment_size)
+    pending = deque()
+    state = {"pos": 0, "buffered": 0}
+
+    def submit():
+        start = state["pos"]
+        end = min(start + controller.chunk_for(total_size - start), total_size) - 1
+        state["pos"] = end + 1
+        state["buffered"] += end - start + 1
+        if state["pos"] >= total_size:
+            controller.draining()
+
+        received = []
+
+        def fetch(url, measure):
+            return _read_range(url, start, end, headers, cancel_event, job_id, measure, received)
+
+        pending.append(pool.submit(_controlled, controller, fetch, end - start + 1, cancel_event, source))
+
+    def fill():
+        while (
+            state["pos"] < total_size
+            and len(pending) < controller.connections
+            and (not pending or state["buffered"] < STREAM_BUFFER_LIMIT)
+        ):
+            submit()
+
+    with ThreadPoolExecutor(max_workers=controller.max_connections) as pool:
+        try:
+            fill()
+            while pending:
+                data = pending.popleft().result()
+                state["buffered"] -= len(data)
+                fill()
+                yield data
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+
+def _fallback_download(stream, output_path: str, filename: str, job_id=None) -> str:
+    """stream.download() do pytubefix, com cada bloco passando pelo limitador de banda."""
+    limiter = get_limiter()
+    original = stream.on_progress
+
+    def throttled(chunk, file_handler, bytes_remaining):
+        limiter.throttle(len(chunk), job_id)
+        original(chunk, file_handler, bytes_remaining)
+
+    # Sobrescreve só nesta instância: o pytubefix chama self.on_progress a cada bloco
+    stream.on_progress = throttled
+    try:
+        return stream.download(output_path=output_path, filename=filename)
+    finally:
+        del stream.on_progress
+
+
+def download_stream(
+    stream,
+    output_path: str,
+    filename: str,
+    segments: int = DEFAULT_SEGMENTS,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    on_progress=None,
+    cancel_event=None,
+    job_id=None,
+) -> str:
+    """
+    Substituto de stream.download() com download segmentado.
+
+    on_progress segue a assinatura do pytubefix: (stream, chunk, bytes_remaining). Se não
+    for informado, usa o callback registrado no objeto YouTube. Quando o tamanho é
+    desconhecido ou o servidor não aceita Range, cai para stream.download().
+    Downloads interrompidos são retomados do ponto verificado (ver download_segmented).
+    As conexões e o tamanho de faixa a que o controlador chegou ficam no span "download".
+    Streams já presentes no cache de conteúdo (content_cache) são materializados sem rede,
+    e os baixados são guardados nele.
+    """
+    dest_path = os.path.join(output_path, filename)
+    if on_progress is None:
+        monostate = getattr(stream, "_monostate", None)
+        on_progress = getattr(monostate, "on_progress", None)
+
+    try:
+        total_size = stream.filesize
+    except Exception:
+        total_size = 0
+
+    def progress(chunk, bytes_remaining):
+        if on_progress:
+            try:
+                on_progress(stream, chunk, bytes_remaining)
+            except Exception:
+                pass
+
+    cache = get_content_cache()
+    key = cache.stream_key(stream) if cache else None
+    if key is None:
+        return _download_stream(stream, output_path, filename, total_size, segments, segment_size, progress, cancel_event, job_id)
+
+    lock = cache.key_lock(key)
+    # Outro job baixando o mesmo stream: espera por ele e aproveita o resultado
+    while not lock.acquire(timeout=0.2):
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelled()
+    try:
+        method = None
+        if cache.lookup(key, total_size):
+            with span("download", job_id, itag=getattr(stream, "itag", None), cached=True) as sp:
+                method = cache.materialize(key, dest_path, total_size)
+                sp.set(materialized=method)
+                sp.bytes = os.path.getsize(dest_path) if method else 0
+        if method:
+            for stale in (part_path(dest_path), journal_path(dest_path)):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            progress(b"", 0)
+            return dest_path
+        path = _download_stream(stream, output_path, filename, total_size, segments, segment_size, progress, cancel_event, job_id)
+        cache.store(key, path)
+        return path
+    finally:
+        lock.release()
+
+
+def _download_stream(stream, output_path, filename, total_size, segments, segment_size, progress, cancel_event, job_id) -> str:
+    dest_path = os.path.join(output_path, filename)
+    # O destino pode ser um hardlink do cache de conteúdo: não regravar o conteúdo compartilhado
+    detach(dest_path)
+    controller = new_controller(segments, segment_size)
+    with span("download", job_id, itag=getattr(stream, "itag", None), segmented=bool(total_size)) as sp:
+        if not total_size:
+            path = _fallback_download(stream, output_path, filename, job_id)
+        else:
+            source = stream_source(stream)
+            try:
+                path = download_segmented(
+                    source,
+                    total_size,
+                    dest_path,
+                    segments,
+                    segment_size,
+                    progress,
+                    cancel_event=cancel_event,
+                    resume_key=getattr(stream, "itag", None),
+                    job_id=job_id,
+                    controller=controller,
+                )
+                # Conexões e tamanho de faixa a que o download chegou
+                sp.set(**controller.summary(), renewals=source.renewals)
+            except RangeNotSupported:
+                for stale in (part_path(dest_path), journal_path(dest_path)):
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+                sp.set(segmented=False)
+                path = _fallback_download(stream, output_path, filename, job_id)
+        sp.bytes = total_size or os.path.getsize(path)
+    return path
+
+
+def download_pair(
+    video_stream,
+    audio_stream,
+    output_path: str,
+    video_filename: str,
+    audio_filename: str,
+    segments: int = DEFAULT_SEGMENTS,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    on_progress=None,
+    job_id=None,
+    cancel_event=None,
+) -> tuple[str, str]:
+    """
+    Baixa as faixas de vídeo e áudio em paralelo e retorna (caminho_video, caminho_audio).
+
+    on_progress(bytes_baixados, bytes_totais) recebe o progresso combinado das duas faixas.
+    Se uma das faixas falhar, a outra é interrompida e a exceção original é propagada;
+    os arquivos .part ficam no disco para que a próxima tentativa retome de onde parou.
+    cancel_event (ex.: o do job no agendador) interrompe as duas com DownloadCancelled.
+    """
+    sizes = {}
+    for key, stream in (("video", video_stream), ("audio", audio_stream)):
+        try:
+            sizes[key] = stream.filesize or 0
+        except Exception:
+            sizes[key] = 0
+    total = sizes["video"] + sizes["audio"]
+
+    lock = threading.Lock()
+    # Bytes que faltam por faixa: partes já retomadas do diário contam como baixadas
+    remaining = {id(video_stream): sizes["video"], id(audio_stream): sizes["audio"]}
+
+    def progress(stream, chunk, bytes_remaining):
+        with lock:
+            remaining[id(stream)] = bytes_remaining
+            done = total - sum(remaining.values())
+        if on_progress and total:
+            on_progress(min(max(done, 0), total), total)
+
+    # Evento próprio: o erro de uma faixa para a outra sem marcar o job como cancelado
+    stop = threading.Event()
+    paths = [os.path.join(output_path, video_filename), os.path.join(output_path, audio_filename)]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [
+            pool.submit(download_stream, video_stream, output_path, video_filename, segments, segment_size, progress, stop, job_id),
+            pool.submit(download_stream, audio_stream, output_path, audio_filename, segments, segment_size, progress, stop, job_id),
+        ]
+        # Ao primeiro erro (ou ao cancelamento do chamador), sinaliza as faixas para parar
+        while True:
+            done, running = wait(futures, timeout=0.2, return_when=FIRST_EXCEPTION)
+            if any(fut.exception() is not None for fut in done) or (cancel_event is not None and cancel_event.is_set()):
+                stop.set()
+            if not running or stop.is_set():
+                break
+        error = None
+        for fut in futures:
+            exc = fut.exception()
+            if exc is not None and (error is None or isinstance(error, DownloadCancelled)):
+                error = exc
+    if error is not None:
+        raise error
+    return paths[0], paths[1]
@@ -0,0 +1,314 @@
+"""
+Índice de streams por vídeo e linguagem de seleção de formatos.
+
+StreamIndex classifica e ordena os streams uma única vez (vídeo, áudio, progressivo) e
+responde consultas por itag, resolução, fps, codec, contêiner e bitrate sem refazer
+filter/order_by. select() avalia expressões no estilo do yt-dlp:
+
+    bestvideo[height<=1080][fps<=30]+bestaudio[ext=m4a]/best
+
+Alternativas separadas por "/" são tentadas em ordem; "+" junta vídeo e áudio; cada
+termo aceita filtros [campo op valor] com =, !=, <, <=, >, >= e ^= (prefixo). Um "?"
+depois do operador (ex.: [fps<=?30]) aceita streams sem o campo.
+"""
+import functools
+import re
+
+# Famílias de codec a partir do prefixo RFC 6381 (avc1.640028, mp4a.40.2, vp09.00..., opus)
+_CODEC_FAMILIES = {
+    "avc1": "h264",
+    "avc3": "h264",
+    "hev1": "hevc",
+    "hvc1": "hevc",
+    "av01": "av1",
+    "vp9": "vp9",
+    "vp09": "vp9",
+    "vp8": "vp8",
+    "mp4a": "aac",
+    "opus": "opus",
+    "vorbis": "vorbis",
+}
+_VIDEO_FAMILIES = {"h264", "hevc", "av1", "vp9", "vp8"}
+
+VIDEO = "video"
+AUDIO = "audio"
+PROGRESSIVE = "progressive"
+
+
+class FormatSelectorError(ValueError):
+    pass
+
+
+def _container(stream) -> str:
+    mime = getattr(stream, "mime_type", None) or "video/mp4"
+    return mime.split("/")[-1]
+
+
+def stream_codecs(stream) -> tuple[str | None, str | None]:
+    """
+    Retorna as famílias (vídeo, áudio) do stream, ex.: ("h264", "aac") ou (None, "opus").
+
+    Usa stream.codecs quando disponível; sem ele, deduz pelo mime_type (o YouTube serve
+    H.264/AAC em MP4 e VP9/Opus em WebM).
+    """
+    video = audio = None
+    for codec in getattr(stream, "codecs", None) or []:
+        family = _CODEC_FAMILIES.get(str(codec).split(".")[0].strip().lower())
+        if family in _VIDEO_FAMILIES:
+            video = video or family
+        elif family:
+            audio = audio or family
+    if video or audio:
+        return video, audio
+    has_video = getattr(stream, "includes_video_track", True)
+    has_audio = getattr(stream, "includes_audio_track", True)
+    if _container(stream) == "webm":
+        return ("vp9" if has_video else None), ("opus" if has_audio else None)
+    return ("h264" if has_video else None), ("aac" if has_audio else None)
+
+
+def _leading_int(value) -> int | None:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    m = re.match(r"\s*(\d+)", str(value))
+    return int(m.group(1)) if m else None
+
+
+class IndexedStream:
+    """Stream com os campos de seleção já extraídos (altura, fps, abr, codecs, extensão)."""
+
+    __slots__ = ("stream", "itag", "kind", "height", "fps", "abr", "bitrate", "container", "ext", "vcodec", "acodec")
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.itag = _leading_int(getattr(stream, "itag", None))
+        if getattr(stream, "is_progressive", False):
+            self.kind = PROGRESSIVE
+        elif getattr(stream, "includes_video_track", False):
+            self.kind = VIDEO
+        else:
+            self.kind = AUDIO
+        self.height = _leading_int(getattr(stream, "resolution", None))
+        self.fps = _leading_int(getattr(stream, "fps", None)) if self.kind != AUDIO else None
+        self.abr = _leading_int(getattr(stream, "abr", None))
+        self.bitrate = _leading_int(getattr(stream, "bitrate", None))
+        self.container = _container(stream)
+        self.ext = "m4a" if self.kind == AUDIO and self.container == "mp4" else self.container
+        self.vcodec, self.acodec = stream_codecs(stream)
+
+    def field(self, name: str):
+        return getattr(self, name)
+
+    def video_rank(self) -> tuple:
+        return (self.height or 0, self.fps or 0, self.bitrate or 0)
+
+    def audio_rank(self) -> tuple:
+        return (self.abr or 0, self.bitrate or 0)
+
+
+class StreamIndex:
+    """
+    Índice construído uma vez por vídeo. videos/audios/progressive são listas de streams
+    já ordenadas da melhor para a pior.
+    """
+
+    def __init__(self, streams):
+        entries = [IndexedStream(s) for s in streams]
+        self._by_itag = {e.itag: e for e in entries}
+        self._entries = {
+            VIDEO: sorted((e for e in entries if e.kind == VIDEO), key=IndexedStream.video_rank, reverse=True),
+            AUDIO: sorted((e for e in entries if e.kind == AUDIO), key=IndexedStream.audio_rank, reverse=True),
+            PROGRESSIVE: sorted((e for e in entries if e.kind == PROGRESSIVE), key=IndexedStream.video_rank, reverse=True),
+        }
+        self._by_height = {}
+        for e in self._entries[VIDEO]:
+            self._by_height.setdefault(e.height, []).append(e)
+        self.videos = [e.stream for e in self._entries[VIDEO]]
+        self.audios = [e.stream for e in self._entries[AUDIO]]
+        self.progressive = [e.stream for e in self._entries[PROGRESSIVE]]
+
+    @classmethod
+    def of(cls, source) -> "StreamIndex":
+        """Aceita um StreamIndex, um objeto com .streams (YouTube/CachedVideo) ou uma lista de streams."""
+        if isinstance(source, cls):
+            return source
+        return cls(getattr(source, "streams", source))
+
+    def by_itag(self, itag):
+        e = self._by_itag.get(_leading_int(itag))
+        return e.stream if e else None
+
+    def resolutions(self) -> list[str]:
+        return [f"{h}p" for h in sorted((h for h in self._by_height if h), reverse=True)]
+
+    def find(self, kind: str, **fields) -> list:
+        """Streams do tipo (video/audio/progressive) cujos campos são iguais aos informados, do melhor ao pior."""
+        if kind == VIDEO and "height" in fields:
+            candidates = self._by_height.get(_leading_int(fields.pop("height")), [])
+        else:
+            candidates = self._entries[kind]
+        return [e.stream for e in candidates if all(e.field(k) == v for k, v in fields.items())]
+
+    def video_at(self, resolution):
+        """Melhor stream só de vídeo na resolução ("1080p" ou 1080), ou None."""
+        found = self._by_height.get(_leading_int(resolution))
+        return found[0].stream if found else None
+
+    def best_video(self):
+        return self.videos[0] if self.videos else None
+
+    def best_audio(self, ext: str | None = None):
+        found = self.find(AUDIO, ext=ext) if ext else self.audios
+        return found[0] if found else None
+
+    def best_progressive(self, ext: str | None = None):
+        found = self.find(PROGRESSIVE, ext=ext) if ext else self.progressive
+        return found[0] if found else None
+
+    def select(self, spec: str):
+        """
+        Avalia uma expressão de formato. Retorna ("adaptive", vídeo, áudio),
+        ("progressive", stream, None), ("video", stream, None), ("audio", stream, None)
+        ou None se nenhuma alternativa for atendida.
+        """
+        for alternative in parse_selector(spec):
+            picked = [self._pick(term) for term in alternative]
+            if any(e is None for e in picked):
+                continue
+            if len(picked) == 2:
+                video, audio = picked
+                return ("adaptive", video.stream, audio.stream)
+            (e,) = picked
+            return (e.kind, e.stream, None)
+        return None
+
+    def _pick(self, term):
+        kind, best, filters, itag = term
+        if itag is not None:
+            e = self._by_itag.get(itag)
+            return e if e is not None and all(f(e) for f in filters) else None
+        candidates = self._entries[kind]
+        if not best:
+            candidates = reversed(candidates)
+        for e in candidates:
+            if all(f(e) for f in filters):
+                return e
+        return None
+
+
+# --- linguagem de seleção ---
+
+_ATOMS = {
+    "best": (PROGRESSIVE, True),
+    "b": (PROGRESSIVE, True),
+    "worst": (PROGRESSIVE, False),
+    "w": (PROGRESSIVE, False),
+    "bestvideo": (VIDEO, True),
+    "bv": (VIDEO, True),
+    "worstvideo": (VIDEO, False),
+    "wv": (VIDEO, False),
+    "bestaudio": (AUDIO, True),
+    "ba": (AUDIO, True),
+    "worstaudio": (AUDIO, False),
+    "wa": (AUDIO, False),
+}
+_NUMERIC_FIELDS = {"height": "height", "res": "height", "fps": "fps", "abr": "abr", "tbr": "bitrate", "itag": "itag"}
+_TEXT_FIELDS = {"ext", "container", "vcodec", "acodec"}
+_TERM_RE = re.compile(r"\s*([A-Za-z]+|\d+)((?:\[[^\]]*\])*)\s*$")
+_FILTER_RE = re.compile(r"\[\s*([a-z]+)\s*(!=|<=|>=|\^=|=|<|>)(\??)\s*([^\]]*?)\s*\]")
+_NUMERIC_OPS = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+_TEXT_OPS = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "^=": lambda a, b: a.startswith(b),
+}
+
+
+def _make_filter(field: str, op: str, optional: bool, raw: str):
+    if field in _NUMERIC_FIELDS:
+        attr = _NUMERIC_FIELDS[field]
+        value = _leading_int(raw)
+        if value is None or op not in _NUMERIC_OPS:
+            raise FormatSelectorError(f"Filtro inválido: [{field}{op}{raw}]")
+        compare = _NUMERIC_OPS[op]
+    elif field in _TEXT_FIELDS:
+        if op not in _TEXT_OPS:
+            raise FormatSelectorError(f"Operador {op} não se aplica a {field}")
+        attr = field
+        value = raw.lower()
+        if field in ("vcodec", "acodec"):
+            value = _CODEC_FAMILIES.get(value.split(".")[0], value)
+        compare = _TEXT_OPS[op]
+    else:
+        raise FormatSelectorError(f"Campo desconhecido no filtro: {field}")
+
+    def check(entry: IndexedStream) -> bool:
+        actual = entry.field(attr)
+        if actual is None:
+            return optional
+        if attr == "ext" and op in ("=", "!=") and value == entry.container:
+            # [ext=mp4] também casa com áudio MP4 (ext m4a)
+            return op == "="
+        return compare(actual, value)
+
+    return check
+
+
+def _parse_term(text: str):
+    m = _TERM_RE.match(text)
+    if not m:
+        raise FormatSelectorError(f"Termo inválido: {text.strip()!r}")
+    name, filter_text = m.groups()
+    filters = []
+    consumed = 0
+    for f in _FILTER_RE.finditer(filter_text):
+        if f.start() != consumed:
+            break
+        filters.append(_make_filter(f.group(1), f.group(2), bool(f.group(3)), f.group(4)))
+        consumed = f.end()
+    if consumed != len(filter_text):
+        raise FormatSelectorError(f"Filtro inválido em {text.strip()!r}")
+    if name.isdigit():
+        return (None, True, filters, int(name))
+    if name.lower() not in _ATOMS:
+        raise FormatSelectorError(f"Formato desconhecido: {name!r}")
+    kind, best = _ATOMS[name.lower()]
+    return (kind, best, filters, None)
+
+
+@functools.lru_cache(maxsize=64)
+def parse_selector(spec: str) -> tuple:
+    """Compila a expressão em alternativas de um termo ou de um par vídeo+áudio."""
+    if not spec or not spec.strip():
+        raise FormatSelectorError("Expressão de formato vazia")
+    alternatives = []
+    for alt in spec.split("/"):
+        terms = tuple(_parse_term(t) for t in alt.split("+"))
+        if len(terms) > 2:
+            raise FormatSelectorError(f"Use no máximo um vídeo e um áudio por alternativa: {alt.strip()!r}")
+        if len(terms) == 2 and (terms[0][0] != VIDEO or terms[1][0] != AUDIO):
+            if terms[0][3] is None and terms[1][3] is None:
+                raise FormatSelectorError(f"Combinação deve ser vídeo+áudio: {alt.strip()!r}")
+        alternatives.append(terms)
+    return tuple(alternatives)
+
+
+def resolution_selector(resolucao: str | None = None) -> str:
+    """
+    Expressão equivalente à escolha automática/--res: a resolução pedida com o melhor
+    áudio, senão o melhor progressivo MP4, senão o melhor vídeo com o melhor áudio.
+    """
+    fallback = "best[ext=mp4]/bestvideo+bestaudio"
+    height = _leading_int(resolucao)
+    if not resolucao or resolucao == "Automático" or height is None:
+        return fallback
+    return f"bestvideo[height={height}]+bestaudio/{fallback}"
@@ -1,31 +1,80 @@
+import itertools
 import os
-import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import subprocess
 import platform
+import sqlite3
 import sys
-
-from pytubefix import YouTube
-from YouTubeDonwloader import (
-    ffmpeg_merge,
-    ffmpeg_extract_audio,
-    stream_extension,
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from archive import get_default_archive, selection_key
+from download_engine import download_pair, download_stream
+from formats import FormatSelectorError, StreamIndex, parse_selector, resolution_selector, stream_codecs
+from job_store import DONE, FAILED, QUEUED, RUNNING, JobStore, default_store_path
+from manifest_cache import preload_extractor, resolve_video
+from media import (
+    PLAN_SUFFIXES,
+    choose_container,
     sanitize_title,
+    stream_extension,
+    submit_download_and_merge,
 )
+import metrics
+from metrics import job_scope
+from postprocess import AUDIO_PROFILES, ExtractAudio, Merge, PostTask, finishing_steps, get_postprocessor
+from progress import DEFAULT_INTERVAL_MS, ProgressBus, format_eta, format_rate
+from queue_view import QueueView
+from ratelimit import get_limiter
+from retry import describe
+from scheduler import DownloadScheduler
+
+# IDs dos itens fora da fila persistente (sem JobStore ou se a gravação falhar): negativos,
+# para não colidir com os IDs do JobStore nem alterar registros restaurados
+_item_ids = itertools.count(-1, -1)
+# Extrações de metadados simultâneas ao colar várias URLs
+PREFETCH_WORKERS = 4
+# Intervalo mínimo entre gravações dos bytes baixados na fila persistente
+PERSIST_INTERVAL = 2.0
+NO_CONVERSION = "Não converter"
+
+
+def _store_state(status: str) -> str:
+    """Estado do JobStore correspondente ao status exibido na fila."""
+    if status == "Concluído":
+        return DONE
+    if status.startswith("Erro"):
+        return FAILED
+    return RUNNING if status in ("Baixando", "Processando") else QUEUED
 
 
 class QueueItem:
-    def __init__(self, url, title, res, audio_lang, out_dir):
+    def __init__(self, url, title, res, audio_lang, out_dir, fmt="Auto", selector=None, item_id=None, audio_profile=None):
+        # Com a fila persistente, o ID é o do registro no JobStore; sem ela, um ID negativo
+        self.id = item_id if item_id is not None else next(_item_ids)
         self.url = url
         self.title = title
         self.res = res
         self.audio_lang = audio_lang
         self.out_dir = out_dir
         self.progress = 0
+        self.speed_text = ""
         self.status = "Na fila"
-        self.format = "MP4"
-        self.thread = None
+        # "Auto": contêiner conforme os codecs, sem recodificar; "MP4": sempre MP4 com AAC
+        self.format = fmt
+        # Expressão de formato (formats.py); quando presente substitui a resolução
+        self.selector = selector
+        # Perfil de postprocess.AUDIO_PROFILES: baixa só o áudio e o converte
+        self.audio_profile = audio_profile
+        self.job = None
+        # Future com o objeto do vídeo (YouTube ou manifesto em cache), resolvido em segundo plano
+        self.metadata = None
+
+    def archive_key(self) -> str:
+        """Seleção do item no arquivo de downloads (ver archive.selection_key)."""
+        return selection_key(self.res, self.audio_profile, self.format == "MP4")
 
 
 class DownloaderGUI:
@@ -45,20 +94,39 @@ class DownloaderGUI:
         self.url_var = tk.StringVar()
         self.res_var = tk.StringVar(value="Automático")
         self.audio_var = tk.StringVar(value="Automático")
+        self.mp4_var = tk.BooleanVar(value=False)
+        self.convert_var = tk.StringVar(value=NO_CONVERSION)
+        self.format_var = tk.StringVar()
         self.status_var = tk.StringVar(value="Pronto.")
+        self.rate_var = tk.StringVar(value="0")
         self.out_dir = os.getcwd()
 
-        self.queue_items = []  # até 10 itens
-        self.item_widgets = []  # widgets por linha
+        self.queue_items = {}  # item.id -> QueueItem, na ordem de inclusão
+
+        # Workers publicam bytes no barramento; a interface consome em ritmo fixo
+        self.progress_bus = ProgressBus()
 
-        # Estilos para tabela zebrada
-        self.style = ttk.Style()
-        self.style.configure("ZebraEven.TFrame", background="#f7f7f7")
-        self.style.configure("ZebraOdd.TFrame", background="#ffffff")
-        self.style.configure("ZebraEven.TLabel", background="#f7f7f7")
-        self.style.configure("ZebraOdd.TLabel", background="#ffffff")
+        # Pool fixo de workers: itens só começam quando há um worker livre
+        self.scheduler = DownloadScheduler()
+        # Resolve título e streams fora da thread da interface
+        self.prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        try:
+            self.archive = get_default_archive()
+        except (OSError, sqlite3.Error):
+            self.archive = None
+        # Fila persistente: sobrevive ao fechamento do app (ver _restore_queue)
+        try:
+            self.store = JobStore(default_store_path("gui_queue.sqlite"))
+        except (OSError, sqlite3.Error):
+            self.store = None
+        # Bytes baixados ainda não gravados: item.id -> (baixados, total)
+        self._pending_bytes = {}
+        self._persisted_at = 0.0
+        # A barra de status está mostrando a pausa por throttling (ver _poll_progress)
+        self._throttle_notice = False
 
         self._build_ui()
+        self.root.after(DEFAULT_INTERVAL_MS, self._poll_progress)
 
     def _build_ui(self):
         main_frame = ttk.Frame(self.root, padding=12)
@@ -71,7 +139,7 @@ class DownloaderGUI:
         # URL do vídeo
         ttk.Label(url_frame, text="Cole a URL do vídeo aqui:").grid(row=0, column=0, sticky="w", pady=(0, 5))
         url_entry = ttk.Entry(url_frame, textvariable=self.url_var, width=80)
-        url_entry.grid(row=1, column=0, columnspan=4, sticky="we", pady=(0, 10))
+        url_entry.grid(row=1, column=0, columnspan=5, sticky="we", pady=(0, 10))
         url_entry.focus()
 
         # Resolução - Radio buttons
@@ -83,15 +151,28 @@ class DownloaderGUI:
         ttk.Radiobutton(res_frame, text="1080p", variable=self.res_var, value="1080p").pack(side="left", padx=(0, 15))
         ttk.Radiobutton(res_frame, text="720p", variable=self.res_var, value="720p").pack(side="left", padx=(0, 15))
         ttk.Radiobutton(res_frame, text="480p", variable=self.res_var, value="480p").pack(side="left")
+        ttk.Label(res_frame, text="ou formato:").pack(side="left", padx=(15, 5))
+        ttk.Entry(res_frame, textvariable=self.format_var, width=30).pack(side="left")
 
         # Faixa de áudio - Combobox
         ttk.Label(url_frame, text="Escolha a faixa de áudio:").grid(row=2, column=2, sticky="w", padx=(20, 0), pady=(0, 5))
         audio_combo = ttk.Combobox(url_frame, textvariable=self.audio_var, values=["Automático", "Inglês", "Português"], state="readonly", width=15)
         audio_combo.grid(row=3, column=2, sticky="w", padx=(20, 0), pady=(0, 10))
 
+        # Sem a opção, as faixas são copiadas para MP4/WebM/MKV sem recodificar
+        ttk.Checkbutton(url_frame, text="Forçar MP4 (AAC)", variable=self.mp4_var).grid(
+            row=3, column=3, sticky="w", padx=(20, 0), pady=(0, 10)
+        )
+
+        # Só áudio, convertido no pós-processamento
+        ttk.Label(url_frame, text="Só áudio, em:").grid(row=2, column=4, sticky="w", padx=(20, 0), pady=(0, 5))
+        ttk.Combobox(
+            url_frame, textvariable=self.convert_var, values=[NO_CONVERSION, *AUDIO_PROFILES], state="readonly", width=12
+        ).grid(row=3, column=4, sticky="w", padx=(20, 0), pady=(0, 10))
+
         # Pasta de destino
         dest_frame = ttk.Frame(url_frame)
-        dest_frame.grid(row=4, column=0, columnspan=4, sticky="we", pady=(0, 10))
+        dest_frame.grid(row=4, column=0, columnspan=5, sticky="we", pady=(0, 10))
         
         ttk.Button(dest_frame, text="Selecionar pasta de destino", command=self.choose_folder).pack(side="left")
         self.out_label = ttk.Label(dest_frame, text=self.out_dir, foreground="#555")
@@ -99,7 +180,7 @@ class DownloaderGUI:
 
         # Botão Iniciar Download
         download_btn = ttk.Button(url_frame, text="Iniciar Download", command=self.start_download)
-        download_btn.grid(row=5, column=0, columnspan=4, pady=(10, 0))
+        download_btn.grid(row=5, column=0, columnspan=5, pady=(10, 0))
 
         url_frame.columnconfigure(0, weight=1)
 
@@ -110,37 +191,33 @@ class DownloaderGUI:
         table_frame = ttk.LabelFrame(main_frame, text="Fila de Downloads", padding=10)
         table_frame.pack(fill="both", expand=True, pady=(0, 10))
 
-        # Cabeçalho da tabela
-        header = ttk.Frame(table_frame)
-        header.pack(fill="x", pady=(0, 5))
-        
-        ttk.Label(header, text="Vídeo", width=35, font=("TkDefaultFont", 9, "bold")).grid(row=0, column=0, sticky="w")
-        ttk.Label(header, text="Resolução", width=12, font=("TkDefaultFont", 9, "bold")).grid(row=0, column=1, sticky="w")
-        ttk.Label(header, text="Local", width=25, font=("TkDefaultFont", 9, "bold")).grid(row=0, column=2, sticky="w")
-        ttk.Label(header, text="Progresso", width=15, font=("TkDefaultFont", 9, "bold")).grid(row=0, column=3, sticky="w")
-        ttk.Label(header, text="Ações", width=20, font=("TkDefaultFont", 9, "bold")).grid(row=0, column=4, sticky="w")
-
-        # Frame scrollável para a fila
-        canvas = tk.Canvas(table_frame, height=200)
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=canvas.yview)
-        self.queue_frame = ttk.Frame(canvas)
-
-        self.queue_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        canvas.create_window((0, 0), window=self.queue_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        # Fila virtualizada: só as linhas visíveis são desenhadas
+        self.queue_view = QueueView(table_frame, height=10)
+        self.queue_view.pack(fill="both", expand=True)
+        self.queue_view.bind("<Double-1>", lambda e: self._for_selected(self.open_location))
+        self.queue_view.bind("<Delete>", lambda e: self._for_selected(self.cancel_download))
 
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        # Ações sobre os itens selecionados
+        actions = ttk.Frame(table_frame)
+        actions.pack(fill="x", pady=(5, 0))
+        ttk.Button(actions, text="Abrir local", command=lambda: self._for_selected(self.open_location)).pack(side="left", padx=(0, 5))
+        ttk.Button(actions, text="Cancelar", command=lambda: self._for_selected(self.cancel_download)).pack(side="left", padx=(0, 5))
+        ttk.Button(actions, text="Priorizar", command=lambda: self._for_selected(self.prioritize)).pack(side="left", padx=(0, 5))
+        ttk.Button(actions, text="Limpar concluídos", command=self.clear_finished).pack(side="left")
 
         # Status bar
         status_frame = ttk.Frame(main_frame)
         status_frame.pack(fill="x", pady=(10, 0))
         
         ttk.Label(status_frame, textvariable=self.status_var).pack(side="left")
+
+        self.pause_btn = ttk.Button(status_frame, text="Pausar fila", command=self.toggle_pause)
+        self.pause_btn.pack(side="left", padx=(10, 0))
+
+        # Limite de banda global (KB/s), aplicado a todos os downloads em andamento
+        ttk.Label(status_frame, text="Limite (KB/s, 0 = livre):").pack(side="left", padx=(15, 5))
+        ttk.Entry(status_frame, textvariable=self.rate_var, width=7).pack(side="left")
+        ttk.Button(status_frame, text="Aplicar", command=self.apply_rate_limit).pack(side="left", padx=(5, 0))
         
         # Rodapé com versão
         version_label = ttk.Label(status_frame, text="YouTube Downloader | v0.02", foreground="#888")
@@ -152,83 +229,177 @@ class DownloaderGUI:
             self.out_dir = path
             self.out_label.config(text=self.out_dir)
 
-    def start_download(self):
-        if len(self.queue_items) >= 10:
-            messagebox.showwarning("Limite", "A fila suporta no máximo 10 itens.")
+    def toggle_pause(self):
+        """Pausa/retoma o início de novos downloads (os que já estão rodando continuam)"""
+        if self.scheduler.paused:
+            self.scheduler.resume()
+            self.pause_btn.config(text="Pausar fila")
+            self.status_var.set("Fila retomada.")
+        else:
+            self.scheduler.pause()
+            self.pause_btn.config(text="Retomar fila")
+            self.status_var.set("Fila pausada.")
+
+    def apply_rate_limit(self):
+        """Altera o limite de banda global em tempo de execução"""
+        try:
+            kbps = float(self.rate_var.get().replace(",", "."))
+        except ValueError:
+            messagebox.showwarning("Atenção", "Informe o limite em KB/s (0 para sem limite).")
             return
-            
-        url = self.url_var.get().strip()
-        if not url:
+        get_limiter().set_global_rate(int(kbps * 1024))
+        self.status_var.set("Sem limite de banda." if kbps <= 0 else f"Limite de banda: {kbps:g} KB/s")
+
+    def prioritize(self, item: QueueItem):
+        """Move um item ainda não iniciado para o início da fila"""
+        self.scheduler.move_to_front(item.id)
+        self.status_var.set(f"Priorizado: {item.title}")
+
+    def start_download(self):
+        # Aceita várias URLs coladas de uma vez (separadas por espaço ou quebra de linha)
+        urls = self.url_var.get().split()
+        if not urls:
             messagebox.showwarning("Atenção", "Informe a URL do vídeo.")
             return
 
         res = self.res_var.get()
         audio_lang = self.audio_var.get()
+        selector = self.format_var.get().strip() or None
+        if selector:
+            try:
+                parse_selector(selector)
+            except FormatSelectorError as e:
+                messagebox.showwarning("Atenção", f"Formato inválido: {e}")
+                return
+        fmt = "MP4" if self.mp4_var.get() else "Auto"
+        audio_profile = None if self.convert_var.get() == NO_CONVERSION else self.convert_var.get()
+        # O arquivo de downloads usa a expressão como seleção quando ela é informada
+        selecao = selection_key(selector or res, audio_profile, fmt == "MP4")
+
+        if self.archive is not None:
+            anteriores = [(u, e) for u, e in ((u, self.archive.lookup(u, selecao)) for u in urls) if e]
+            if len(anteriores) == 1:
+                pergunta = f"Este vídeo já foi baixado nesta resolução:\n{anteriores[0][1]['output_path']}\n\nBaixar novamente?"
+            else:
+                pergunta = f"{len(anteriores)} vídeos já foram baixados nesta resolução.\n\nBaixar novamente?"
+            if anteriores and not messagebox.askyesno("Já baixado", pergunta):
+                repetidas = {u for u, _ in anteriores}
+                urls = [u for u in urls if u not in repetidas]
 
-        try:
-            yt = YouTube(url)
-            title = sanitize_title(yt.title)
-        except Exception:
-            title = "(Sem título)"
-
-        item = QueueItem(url, title, res, audio_lang, self.out_dir)
-        self.queue_items.append(item)
-        
         # Limpa o campo de URL
         self.url_var.set("")
-        
-        self._render_queue()
-        self._start_item_download(item)
-
-    def _render_queue(self):
-        # Limpa widgets existentes
-        for widget_set in self.item_widgets:
-            for widget in widget_set:
-                if hasattr(widget, 'destroy'):
-                    widget.destroy()
-        self.item_widgets = []
-
-        # Renderiza cada item da fila
-        for idx, item in enumerate(self.queue_items):
-            row_style = "ZebraEven.TFrame" if idx % 2 == 0 else "ZebraOdd.TFrame"
-            label_style = "ZebraEven.TLabel" if idx % 2 == 0 else "ZebraOdd.TLabel"
-            
-            row = ttk.Frame(self.queue_frame, style=row_style)
-            row.pack(fill="x", pady=2)
-
-            # Título do vídeo
-            title_label = ttk.Label(row, text=item.title[:45] + "..." if len(item.title) > 45 else item.title, 
-                                  style=label_style, width=35)
-            title_label.grid(row=0, column=0, sticky="w", padx=(5, 0))
-
-            # Resolução
-            res_label = ttk.Label(row, text=item.res, style=label_style, width=12)
-            res_label.grid(row=0, column=1, sticky="w")
-
-            # Local (pasta)
-            local_text = os.path.basename(item.out_dir) if item.out_dir else "N/A"
-            local_label = ttk.Label(row, text=local_text, style=label_style, width=25)
-            local_label.grid(row=0, column=2, sticky="w")
-
-            # Barra de progresso
-            progress_bar = ttk.Progressbar(row, length=120, mode="determinate")
-            progress_bar.grid(row=0, column=3, sticky="w", padx=(5, 0))
-            progress_bar["value"] = item.progress
-
-            # Botões de ação
-            action_frame = ttk.Frame(row)
-            action_frame.grid(row=0, column=4, sticky="w", padx=(5, 0))
-
-            open_btn = ttk.Button(action_frame, text="Abrir local", width=10,
-                                command=lambda i=item: self.open_location(i))
-            open_btn.pack(side="left", padx=(0, 5))
-
-            cancel_btn = ttk.Button(action_frame, text="Cancelar", width=8,
-                                  command=lambda i=item: self.cancel_download(i))
-            cancel_btn.pack(side="left")
-
-            # Armazena widgets para atualização posterior
-            self.item_widgets.append((row, title_label, res_label, local_label, progress_bar, open_btn, cancel_btn))
+
+        # O item entra na fila na hora; título e streams chegam pelo prefetch
+        for url in urls:
+            item_id = None
+            if self.store is not None:
+                try:
+                    item_id = self.store.add(
+                        url, self.out_dir, res, selector, fmt == "MP4", audio_lang=audio_lang, audio_profile=audio_profile
+                    )["id"]
+                except sqlite3.Error:
+                    pass
+            item = QueueItem(url, "(carregando...)", selector or res, audio_lang, self.out_dir, fmt, selector, item_id, audio_profile)
+            self.queue_items[item.id] = item
+            self.queue_view.add(item)
+            self._start_item_download(item)
+            self._prefetch(item)
+        if urls:
+            self.queue_view.see(item.id)
+
+    def _restore_queue(self):
+        """
+        Recarrega a fila gravada: concluídos e com erro aparecem sem acesso à rede; os que
+        estavam na fila ou baixando voltam ao agendador (downloads parciais são retomados).
+        """
+        if self.store is None:
+            return
+        try:
+            self.store.requeue_unfinished()
+            rows = self.store.list_jobs()
+        except sqlite3.Error:
+            return
+        for row in rows:
+            if row["status"] not in (QUEUED, DONE, FAILED):
+                continue
+            item = QueueItem(
+                row["url"],
+                row["title"] or "(carregando...)",
+                row["format"] or row["resolution"],
+                row["audio_lang"],
+                row["out_dir"],
+                "MP4" if row["require_mp4"] else "Auto",
+                row["format"],
+                row["id"],
+                row["audio_profile"],
+            )
+            if row["status"] == DONE:
+                item.status, item.progress = "Concluído", 100
+            elif row["status"] == FAILED:
+                item.status = f"Erro: {row['error']}"
+            elif row["bytes_total"]:
+                item.progress = min(99.0, row["bytes_done"] / row["bytes_total"] * 100)
+            self.queue_items[item.id] = item
+            self.queue_view.add(item)
+            if row["status"] == QUEUED:
+                self._start_item_download(item)
+                self._prefetch(item)
+        retomados = sum(1 for row in rows if row["status"] == QUEUED)
+        if retomados:
+            self.status_var.set(f"{retomados} download(s) retomado(s) da sessão anterior.")
+
+    def _persist(self, item: QueueItem, **fields):
+        """Grava campos do item na fila persistente; falhas de disco não interrompem o download."""
+        if self.store is None:
+            return
+        try:
+            self.store.update(item.id, **fields)
+        except sqlite3.Error:
+            pass
+
+    def clear_finished(self):
+        """Remove da fila (e do registro persistente) os itens concluídos ou com erro"""
+        for item in list(self.queue_items.values()):
+            if item.status == "Concluído" or item.status.startswith("Erro"):
+                del self.queue_items[item.id]
+                self.queue_view.remove(item.id)
+                if self.store is not None:
+                    try:
+                        self.store.delete(item.id)
+                    except sqlite3.Error:
+                        pass
+
+    def _prefetch(self, item: QueueItem):
+        """Extrai os metadados em segundo plano e libera o job retido no agendador"""
+        def resolve():
+            with job_scope(item.id):
+                yt = resolve_video(item.url, on_progress_callback=lambda s, c, br: self._on_stream_progress(item, s, br))
+            # Título e streams são lidos aqui para a extração acontecer agora, e não no worker
+            item.title = sanitize_title(yt.title) or "(Sem título)"
+            yt.streams
+            return yt
+
+        def done(future):
+            try:
+                future.result()
+            except Exception as e:
+                self.scheduler.cancel(item.id)
+                self._set_item_status(item, f"Erro: {e}")
+                self.root.after(0, lambda msg=item.status: self.status_var.set(msg))
+                return
+            self.root.after(0, lambda: self.queue_view.update(item.id, title=item.title))
+            self._persist(item, title=item.title)
+            self.scheduler.release(item.id)
+
+        item.metadata = self.prefetch_pool.submit(resolve)
+        item.metadata.add_done_callback(done)
+
+    def _for_selected(self, action):
+        """Aplica uma ação (abrir, cancelar, priorizar) a cada item selecionado na fila"""
+        for item_id in self.queue_view.selected_ids():
+            item = self.queue_items.get(item_id)
+            if item is not None:
+                action(item)
 
     def open_location(self, item: QueueItem):
         """Abre a pasta onde o arquivo foi salvo"""
@@ -245,174 +416,235 @@ class DownloaderGUI:
     def cancel_download(self, item: QueueItem):
         """Cancela o download e remove da fila"""
         try:
-            if item in self.queue_items:
-                # Para a thread se estiver rodando
-                if hasattr(item, 'thread') and item.thread and item.thread.is_alive():
-                    # Não há como parar thread de forma segura, apenas marca como cancelado
-                    item.status = "Cancelado"
+            if item.id in self.queue_items:
+                # Itens ainda na fila saem do agendador; em execução, o cancel_event do job
+                # interrompe a rede, a mesclagem e o pós-processamento (ver _download_item).
+                # O job sai do agendador quando a rede termina: o evento é sinalizado direto
+                self.scheduler.cancel(item.id)
+                if item.job is not None:
+                    item.job.cancel_event.set()
+                self.progress_bus.forget(item.id)
+                item.status = "Cancelado"
                 
-                self.queue_items.remove(item)
-                self._render_queue()
+                del self.queue_items[item.id]
+                self.queue_view.remove(item.id)
+                self._pending_bytes.pop(item.id, None)
+                if self.store is not None:
+                    self.store.delete(item.id)
                 self.status_var.set(f"Download cancelado: {item.title}")
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao cancelar download: {e}")
 
-    def _update_progress_widget(self, idx, value):
-        """Atualiza a barra de progresso de um item específico"""
-        if idx < len(self.item_widgets):
-            progress_bar = self.item_widgets[idx][4]
-            progress_bar["value"] = max(0, min(100, value))
+    def _poll_progress(self):
+        """Aplica as atualizações acumuladas no barramento (uma por item) e reagenda"""
+        for snap in self.progress_bus.drain():
+            item = self.queue_items.get(snap.item_id)
+            if item is None:
+                continue
+            # Reserva o último 1% para a mesclagem com FFmpeg
+            item.progress = snap.percent if snap.finished else min(99.0, snap.percent)
+            item.speed_text = " · ".join(t for t in (format_rate(snap.rate), format_eta(snap.eta)) if t)
+            self.queue_view.update(item.id, progress=item.progress, speed=item.speed_text)
+            self._pending_bytes[item.id] = (snap.done, snap.total)
+        # Bytes baixados vão para o disco em lotes, não a cada amostra
+        now = time.monotonic()
+        if self._pending_bytes and now - self._persisted_at >= PERSIST_INTERVAL:
+            self._persisted_at = now
+            pending, self._pending_bytes = self._pending_bytes, {}
+            for item_id, (done, total) in pending.items():
+                if item_id in self.queue_items:
+                    self._persist(self.queue_items[item_id], bytes_done=done, bytes_total=total)
+        # Host limitando as requisições: o agendador segura a fila até o disjuntor fechar
+        hold = self.scheduler.throttled
+        if hold:
+            self._throttle_notice = True
+            self.status_var.set(f"Servidor limitando as requisições: fila pausada, retomando em {hold:.0f} s")
+        elif self._throttle_notice:
+            self._throttle_notice = False
+            self.status_var.set("Fila retomada.")
+        self.root.after(DEFAULT_INTERVAL_MS, self._poll_progress)
 
     def _start_item_download(self, item: QueueItem):
-        """Inicia o download em thread separada"""
-        def run():
+        """Enfileira o download no agendador (inicia quando houver worker livre)"""
+        def run(job):
+            self._set_item_status(item, "Baixando")
             try:
-                self._download_item(item)
-                item.status = "Concluído"
-                item.progress = 100
-                idx = self.queue_items.index(item) if item in self.queue_items else -1
-                if idx >= 0:
-                    self.root.after(0, lambda: self._update_progress_widget(idx, item.progress))
-                    self.root.after(0, lambda: self.status_var.set(f"Concluído: {item.title}"))
+                with job_scope(item.id):
+                    future, itags = self._download_item(item, job.cancel_event)
             except Exception as e:
-                item.status = f"Erro: {e}"
-                self.root.after(0, lambda: self.status_var.set(f"Erro: {e}"))
-
-        item.thread = threading.Thread(target=run, daemon=True)
-        item.thread.start()
-
-    def _download_item(self, item: QueueItem):
-        """Executa o download do item"""
-        # Preparação
-        yt = YouTube(item.url, on_progress_callback=lambda s, c, br: self._on_stream_progress(item, s, br))
-
-        # Escolha de streams baseada na resolução
-        if item.res == "Automático":
-            # Tenta progressivo primeiro
-            prog = yt.streams.filter(progressive=True, file_extension="mp4").order_by("resolution").desc().first()
-            if prog:
-                ext = stream_extension(prog)
-                filename = f"{item.title}_final.{ext}"
-                self.root.after(0, lambda: self.status_var.set(f"Baixando: {item.title} ({prog.resolution})"))
-                prog.download(output_path=item.out_dir, filename=filename)
-                item.progress = 100
-                idx = self.queue_items.index(item) if item in self.queue_items else -1
-                if idx >= 0:
-                    self.root.after(0, lambda: self._update_progress_widget(idx, item.progress))
+                if not job.cancel_event.is_set():
+                    self._fail_item(item, e)
                 return
-            # Sem progressivo: baixa melhor vídeo + melhor áudio
-            v_stream = yt.streams.filter(only_video=True).order_by("resolution").desc().first()
+            # O worker volta ao agendador; mesclagem e conversão seguem no pós-processamento
+            if not future.done():
+                self._set_item_status(item, "Processando")
+            future.add_done_callback(lambda f: self._finish_item(item, f, itags))
+
+        # Retido até o prefetch dos metadados terminar (ver _prefetch)
+        item.job = self.scheduler.submit(item.id, run, held=True)
+
+    def _finish_item(self, item: QueueItem, future, itags):
+        # Cancelado durante o pós-processamento: nada vai para o arquivo de downloads
+        cancelled = item.job.cancel_event.is_set()
+        try:
+            output_path = future.result()
+            size = os.path.getsize(output_path)
+        except Exception as e:
+            if not cancelled:
+                self._fail_item(item, e)
+            return
+        if cancelled:
+            return
+        self._persist(item, output_path=output_path, bytes_done=size, bytes_total=size)
+        self._set_item_status(item, "Concluído")
+        if self.archive is not None:
+            try:
+                self.archive.record(item.url, item.archive_key(), output_path, itags)
+            except (OSError, sqlite3.Error):
+                pass
+        self.progress_bus.finish(item.id)
+        if item.id in self.queue_items:
+            self.root.after(0, lambda: self.status_var.set(f"Concluído: {item.title}"))
+
+    def _fail_item(self, item: QueueItem, error: Exception):
+        self._set_item_status(item, f"Erro: {describe(error)}")
+        self.root.after(0, lambda msg=item.status: self.status_var.set(msg))
+
+    def _set_item_status(self, item: QueueItem, status: str):
+        """Chamado pelos workers: a célula de status é atualizada na thread da interface"""
+        item.status = status
+        if item.id in self.queue_items:
+            state = _store_state(status)
+            self._persist(item, status=state, error=status[len("Erro: "):] if state == FAILED else None)
+        self.root.after(0, lambda: self.queue_view.update(item.id, status=status))
+
+    def _download_item(self, item: QueueItem, cancel_event=None):
+        """
+        Baixa os streams do item e entrega o restante ao pós-processamento; retorna
+        (Future com o arquivo final, itags usados). cancel_event é o do job no agendador:
+        cancel_download o sinaliza e a rede, a mesclagem e os passos pendentes param.
+        """
+        # Reaproveita o objeto resolvido pelo prefetch, sem uma segunda extração
+        yt = item.metadata.result()
+
+        indice = StreamIndex.of(yt)
+        postprocessor = get_postprocessor()
+        steps = finishing_steps(yt, item.audio_profile)
+
+        # Escolha de streams: expressão de formato, só áudio, automático ou resolução específica
+        if item.selector or item.audio_profile or item.res == "Automático":
+            selector = item.selector or ("bestaudio/best" if item.audio_profile else resolution_selector())
+            plan = indice.select(selector)
+            if plan is None:
+                raise RuntimeError(f"Nenhum stream atende ao formato '{item.selector or 'automático'}'.")
         else:
-            # Busca resolução específica
-            v_stream = None
-            for s in yt.streams.filter(only_video=True).order_by("resolution").desc():
-                if s.resolution == item.res:
-                    v_stream = s
-                    break
-
-        if not v_stream:
-            raise RuntimeError(f"Stream de vídeo não encontrado para a resolução {item.res}.")
-
-        # Seleção de áudio baseada na preferência
-        a_stream = None
-        if item.audio_lang == "Inglês":
-            # Tenta encontrar áudio em inglês (isso é uma simplificação)
-            a_stream = yt.streams.filter(only_audio=True).order_by("abr").desc().first()
-        elif item.audio_lang == "Português":
-            # Tenta encontrar áudio em português (isso é uma simplificação)
-            a_stream = yt.streams.filter(only_audio=True).order_by("abr").desc().first()
-        else:  # Automático
-            a_stream = yt.streams.filter(only_audio=True).order_by("abr").desc().first()
-
-        # Baixar vídeo
-        vext = stream_extension(v_stream)
-        video_filename = f"{item.title}_video_temp.{vext}"
-        self.root.after(0, lambda: self.status_var.set(f"Baixando vídeo: {item.title} ({v_stream.resolution})"))
-        item.progress = 0
-        idx = self.queue_items.index(item) if item in self.queue_items else -1
-        if idx >= 0:
-            self.root.after(0, lambda: self._update_progress_widget(idx, item.progress))
-        v_stream.download(output_path=item.out_dir, filename=video_filename)
-        item.progress = 50
-        if idx >= 0:
-            self.root.after(0, lambda: self._update_progress_widget(idx, item.progress))
-
-        # Baixar áudio (ou fallback)
+            v_stream = indice.video_at(item.res)
+            if not v_stream:
+                raise RuntimeError(f"Stream de vídeo não encontrado para a resolução {item.res}.")
+            # A preferência de idioma ainda não filtra faixas: usa o áudio de maior bitrate
+            plan = ("adaptive", v_stream, indice.best_audio())
+        kind, v_stream, a_stream = plan
+
+        if kind != "adaptive":
+            # Um único stream (progressivo, só vídeo ou só áudio): não há mesclagem
+            suffix = "_final" if kind == "progressive" else PLAN_SUFFIXES[kind]
+            filename = f"{item.title}{suffix}.{stream_extension(v_stream)}"
+            self.root.after(0, lambda: self.status_var.set(f"Baixando: {item.title} ({v_stream.resolution or v_stream.abr})"))
+            with self.scheduler.fetch_slot:
+                output_path = download_stream(v_stream, item.out_dir, filename, cancel_event=cancel_event, job_id=item.id)
+            self.progress_bus.finish(item.id)
+            task = PostTask(steps, output_path, item.id, hide_console=True, has_video=kind != "audio", cancel_event=cancel_event)
+            return postprocessor.submit(task), [v_stream.itag]
+
+        self.progress_bus.publish(item.id, 0, 0)
+
+        # Baixar vídeo e áudio (ou progressivo para extração) em paralelo
+        on_pair_progress = lambda done, total: self._on_bytes_progress(item, done, total)
         if a_stream:
-            aext = stream_extension(a_stream)
-            audio_filename = f"{item.title}_audio_temp.{aext}"
-            self.root.after(0, lambda: self.status_var.set(f"Baixando áudio: {item.title} ({a_stream.abr})"))
-            a_stream.download(output_path=item.out_dir, filename=audio_filename)
+            self.root.after(0, lambda: self.status_var.set(f"Baixando e mesclando: {item.title} ({v_stream.resolution}, {a_stream.abr})"))
+            future = submit_download_and_merge(
+                v_stream,
+                a_stream,
+                item.out_dir,
+                item.title,
+                on_progress=on_pair_progress,
+                hide_console=True,
+                fetch_slot=self.scheduler.fetch_slot,
+                merge_slot=self.scheduler.merge_slot,
+                job_id=item.id,
+                require_mp4=item.format == "MP4",
+                steps=steps,
+                postprocessor=postprocessor,
+                cancel_event=cancel_event,
+            )
+            itags = [v_stream.itag, a_stream.itag]
         else:
             # Fallback: extrai áudio de progressivo
-            prog = yt.streams.filter(progressive=True, file_extension="mp4").order_by("resolution").desc().first()
+            prog = indice.best_progressive(ext="mp4")
             if not prog:
                 raise RuntimeError("Áudio não disponível e não foi possível baixar progressivo para extração.")
+            vext = stream_extension(v_stream)
+            video_filename = f"{item.title}_video_temp.{vext}"
             prog_ext = stream_extension(prog)
             prog_filename = f"{item.title}_prog_temp.{prog_ext}"
-            self.root.after(0, lambda: self.status_var.set(f"Baixando progressivo para extrair áudio: {item.title}"))
-            prog.download(output_path=item.out_dir, filename=prog_filename)
-            audio_filename = f"{item.title}_audio_temp.aac"
-            ffmpeg_extract_audio(
-                os.path.join(item.out_dir, prog_filename),
-                os.path.join(item.out_dir, audio_filename),
+            self.root.after(0, lambda: self.status_var.set(f"Baixando vídeo e progressivo para extrair áudio: {item.title}"))
+            with self.scheduler.fetch_slot:
+                video_path, prog_path = download_pair(
+                    v_stream, prog, item.out_dir, video_filename, prog_filename, on_progress=on_pair_progress, job_id=item.id,
+                    cancel_event=cancel_event,
+                )
+            audio_copy = stream_codecs(prog)[1] == "aac"
+            audio_path = os.path.join(item.out_dir, f"{item.title}_audio_temp.{'m4a' if audio_copy else 'aac'}")
+            ext, codec_args = choose_container(stream_codecs(v_stream)[0], "aac", item.format == "MP4")
+            output_filename = os.path.join(item.out_dir, f"{item.title}_final.{ext}")
+            # Extração e mesclagem no pós-processamento; cada passo remove os próprios temporários
+            task = PostTask(
+                [ExtractAudio(prog_path, audio_path, audio_copy), Merge(video_path, audio_path, output_filename, codec_args), *steps],
+                job_id=item.id,
+                cleanup=(video_path,),
                 hide_console=True,
+                cancel_event=cancel_event,
             )
-            try:
-                os.remove(os.path.join(item.out_dir, prog_filename))
-            except OSError:
-                pass
+            future = postprocessor.submit(task)
+            itags = [v_stream.itag, prog.itag]
 
-        item.progress = 80
-        if idx >= 0:
-            self.root.after(0, lambda: self._update_progress_widget(idx, item.progress))
-
-        # Merge final
-        self.root.after(0, lambda: self.status_var.set(f"Mesclando: {item.title}"))
-        output_filename = os.path.join(item.out_dir, f"{item.title}_final.mp4")
-        ffmpeg_merge(
-            os.path.join(item.out_dir, video_filename),
-            os.path.join(item.out_dir, audio_filename),
-            output_filename,
-            hide_console=True,
-        )
-        
-        # Limpeza de arquivos temporários
-        try:
-            os.remove(os.path.join(item.out_dir, video_filename))
-            os.remove(os.path.join(item.out_dir, audio_filename))
-        except OSError:
-            pass
+        self.progress_bus.finish(item.id)
+        return future, itags
 
-        item.progress = 100
-        if idx >= 0:
-            self.root.after(0, lambda: self._update_progress_widget(idx, item.progress))
+    def _on_bytes_progress(self, item: QueueItem, done, total):
+        """Progresso combinado das faixas baixadas em paralelo (bytes baixados / bytes totais)"""
+        self.progress_bus.publish(item.id, done, total)
 
     def _on_stream_progress(self, item: QueueItem, stream, bytes_remaining):
         """Callback de progresso do pytubefix"""
         try:
             total = getattr(stream, "filesize", None) or getattr(stream, "filesize_approx", None)
             if total:
-                downloaded = max(0, total - bytes_remaining)
-                # Progresso unificado: vídeo até 50%, áudio até 80%, merge até 100%
-                if stream.is_adaptive or (stream.includes_video_track and not stream.includes_audio_track):
-                    pct = (downloaded / total) * 50.0
-                elif stream.includes_audio_track and not stream.includes_video_track:
-                    pct = 50.0 + (downloaded / total) * 30.0
-                else:
-                    pct = (downloaded / total) * 80.0
-                
-                item.progress = min(80.0, pct)
-                idx = self.queue_items.index(item) if item in self.queue_items else -1
-                if idx >= 0:
-                    self.root.after(0, lambda: self._update_progress_widget(idx, item.progress))
+                self.progress_bus.publish(item.id, max(0, total - bytes_remaining), total)
         except Exception:
             pass
 
 
-def main():
+def open_window():
+    """
+    Cria a janela e a desenha antes de qualquer outro trabalho; a fila salva e o extrator
+    (pytubefix, contexto TLS) são carregados depois. Retorna (root, app).
+    """
     root = tk.Tk()
     app = DownloaderGUI(root)
+    root.update()
+    app._restore_queue()
+    threading.Thread(target=preload_extractor, daemon=True, name="preload").start()
+    return root, app
+
+
+def main():
+    # Saídas de métricas opcionais para sessões longas (ver metrics.py)
+    try:
+        metrics.configure(os.environ.get("YTDL_METRICS_LOG"), int(os.environ.get("YTDL_METRICS_PORT") or 0))
+    except (OSError, ValueError) as e:
+        print(f"Aviso: métricas indisponíveis: {e}")
+    root, _ = open_window()
     root.mainloop()
 
 
@@ -0,0 +1,156 @@
+"""
+Registro persistente (SQLite) dos jobs de download.
+
+Guarda o pedido (URL, seleção, faixa de áudio, perfil de conversão, pasta de saída,
+prioridade) e o estado de cada job, para que um processo reiniciado saiba o que já terminou
+e o que precisa voltar para a fila. Usado pelo daemon (jobs.sqlite) e pela fila da interface (gui_queue.sqlite).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+SKIPPED = "skipped"  # já constava no arquivo de downloads
+FINAL_STATES = (DONE, FAILED, CANCELLED, SKIPPED)
+
+COLUMNS = (
+    "id",
+    "url",
+    "resolution",
+    "format",
+    "audio_lang",
+    "require_mp4",
+    "audio_profile",
+    "out_dir",
+    "priority",
+    "status",
+    "title",
+    "output_path",
+    "error",
+    "bytes_done",
+    "bytes_total",
+    "created_at",
+    "updated_at",
+)
+
+
+def default_store_path(filename: str = "jobs.sqlite") -> str:
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "YouTubeDownloader", filename)
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "youtube-downloader", filename)
+
+
+class JobStore:
+    def __init__(self, path: str | None = None):
+        self.path = path or default_store_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    resolution TEXT,
+                    format TEXT,
+                    audio_lang TEXT,
+                    require_mp4 INTEGER NOT NULL DEFAULT 0,
+                    audio_profile TEXT,
+                    out_dir TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    title TEXT,
+                    output_path TEXT,
+                    error TEXT,
+                    bytes_done INTEGER NOT NULL DEFAULT 0,
+                    bytes_total INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL,
+                    updated_at REAL
+                )
+                """
+            )
+            # Bancos criados antes das colunas audio_lang e audio_profile
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column in ("audio_lang", "audio_profile"):
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def add(
+        self,
+        url: str,
+        out_dir: str,
+        resolution: str | None = None,
+        format: str | None = None,
+        require_mp4: bool = False,
+        priority: int = 0,
+        audio_lang: str | None = None,
+        title: str | None = None,
+        audio_profile: str | None = None,
+    ) -> dict:
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO jobs (url, resolution, format, audio_lang, require_mp4, audio_profile, out_dir, priority, status, title, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, resolution, format, audio_lang, int(require_mp4), audio_profile, out_dir, priority, QUEUED, title, now, now),
+            )
+            job_id = cur.lastrowid
+        return self.get(job_id)
+
+    def get(self, job_id: int) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_dict(row) if row else None
+
+    def update(self, job_id: int, **fields):
+        """Atualiza as colunas informadas (ex.: status, title, output_path, error, bytes_done)."""
+        unknown = set(fields) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Colunas desconhecidas: {', '.join(sorted(unknown))}")
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def list_jobs(self, status: str | None = None, limit: int | None = None) -> list[dict]:
+        query = f"SELECT {', '.join(COLUMNS)} FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [_row_dict(row) for row in rows]
+
+    def requeue_unfinished(self) -> list[dict]:
+        """Volta para a fila os jobs interrompidos (em execução quando o processo parou) e retorna os pendentes."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?", (QUEUED, time.time(), RUNNING))
+        return self.list_jobs(QUEUED)
+
+    def delete(self, job_id: int):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _row_dict(row) -> dict:
+    job = dict(zip(COLUMNS, row))
+    job["require_mp4"] = bool(job["require_mp4"])
+    return job
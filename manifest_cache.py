@@ -0,0 +1,440 @@
+"""
+Cache em disco dos manifestos de streams (título + lista de streams) por ID de vídeo.
+
+Evita repetir a extração do YouTube em execuções seguidas e em itens re-adicionados
+à fila. As entradas expiram por TTL (e nunca depois do `expire` das URLs assinadas)
+e o diretório é limitado por tamanho com remoção LRU.
+"""
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+from types import SimpleNamespace
+
+import retry
+from metrics import span
+from transport import get_transport
+
+DEFAULT_TTL = 4 * 60 * 60  # 4 horas
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+# Margem para não usar uma URL assinada prestes a expirar
+EXPIRE_MARGIN = 10 * 60
+
+_VIDEO_ID_RE = re.compile(r"(?:v=|/shorts/|/embed/|/live/|youtu\.be/)([0-9A-Za-z_-]{11})")
+
+STREAM_FIELDS = (
+    "itag",
+    "url",
+    "mime_type",
+    "codecs",
+    "resolution",
+    "abr",
+    "bitrate",
+    "fps",
+    "filesize",
+    "is_progressive",
+    "is_adaptive",
+    "includes_video_track",
+    "includes_audio_track",
+)
+
+
+def default_cache_dir() -> str:
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "YouTubeDownloader", "cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "youtube-downloader")
+
+
+def extract_video_id(url: str) -> str | None:
+    """Extrai o ID de 11 caracteres de uma URL do YouTube (ou aceita o próprio ID)."""
+    m = _VIDEO_ID_RE.search(url)
+    if m:
+        return m.group(1)
+    if re.fullmatch(r"[0-9A-Za-z_-]{11}", url):
+        return url
+    return None
+
+
+def _url_expire(url: str) -> float | None:
+    try:
+        expire = urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get("expire")
+        return float(expire[0]) if expire else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _numeric_key(value):
+    # "1080p" / "128kbps" ordenam numericamente, como no pytubefix
+    if isinstance(value, str):
+        digits = re.sub(r"\D", "", value)
+        return int(digits) if digits else 0
+    return value
+
+
+class CachedStream:
+    """Stream reconstruído do cache, com a mesma interface usada pelo downloader."""
+
+    def __init__(self, data: dict, on_progress=None, video_id: str | None = None):
+        self.video_id = video_id
+        for field in STREAM_FIELDS:
+            if field != "filesize":
+                setattr(self, field, data.get(field))
+        self._filesize = data.get("filesize") or 0
+        self._monostate = SimpleNamespace(on_progress=on_progress)
+
+    @property
+    def subtype(self) -> str:
+        return (self.mime_type or "video/mp4").split("/")[-1]
+
+    @property
+    def filesize(self) -> int:
+        # Manifestos sem contentLength consultam o tamanho só quando necessário
+        if not self._filesize:
+            self._filesize = self._head_filesize()
+        return self._filesize
+
+    def _head_filesize(self) -> int:
+        with get_transport().request("HEAD", self.url, {"User-Agent": "Mozilla/5.0"}) as resp:
+            return int(resp.headers.get("Content-Length") or 0)
+
+    def download(self, output_path: str, filename: str) -> str:
+        """Download sequencial simples (fallback de download_stream)."""
+        dest = os.path.join(output_path, filename)
+        transport = get_transport()
+        total = self.filesize
+        with transport.request("GET", self.url, {"User-Agent": "Mozilla/5.0"}) as resp, open(dest, "wb") as fh:
+            remaining = total
+            while True:
+                chunk = resp.read(transport.read_size)
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                self.on_progress(chunk, fh, max(0, remaining))
+        return dest
+
+    def on_progress(self, chunk: bytes, file_handler, bytes_remaining: int):
+        """Grava o bloco e repassa ao callback registrado, como Stream.on_progress do pytubefix."""
+        file_handler.write(chunk)
+        if self._monostate.on_progress:
+            self._monostate.on_progress(self, chunk, bytes_remaining)
+
+    def __repr__(self):
+        return f"<CachedStream itag={self.itag} mime={self.mime_type} res={self.resolution} abr={self.abr}>"
+
+
+class CachedStreamQuery:
+    """Subconjunto da StreamQuery do pytubefix: filter/order_by/desc/asc/first."""
+
+    def __init__(self, streams: list):
+        self._streams = list(streams)
+
+    def filter(self, progressive=None, adaptive=None, only_video=None, only_audio=None, file_extension=None, res=None, resolution=None):
+        res = res or resolution
+        result = []
+        for s in self._streams:
+            if progressive is not None and bool(s.is_progressive) != progressive:
+                continue
+            if adaptive is not None and bool(s.is_adaptive) != adaptive:
+                continue
+            if only_video and not (s.includes_video_track and not s.includes_audio_track):
+                continue
+            if only_audio and not (s.includes_audio_track and not s.includes_video_track):
+                continue
+            if file_extension and s.subtype != file_extension:
+                continue
+            if res and s.resolution != res:
+                continue
+            result.append(s)
+        return CachedStreamQuery(result)
+
+    def order_by(self, attribute: str):
+        present = [s for s in self._streams if getattr(s, attribute, None) is not None]
+        return CachedStreamQuery(sorted(present, key=lambda s: _numeric_key(getattr(s, attribute))))
+
+    def desc(self):
+        return CachedStreamQuery(self._streams[::-1])
+
+    def asc(self):
+        return self
+
+    def first(self):
+        return self._streams[0] if self._streams else None
+
+    def get_by_itag(self, itag: int):
+        for s in self._streams:
+            if s.itag == itag:
+                return s
+        return None
+
+    def __getitem__(self, i):
+        return self._streams[i]
+
+    def __len__(self):
+        return len(self._streams)
+
+    def __iter__(self):
+        return iter(self._streams)
+
+    def __bool__(self):
+        return bool(self._streams)
+
+
+class CachedVideo:
+    """Substituto leve de YouTube(url) montado a partir de um manifesto em cache."""
+
+    def __init__(self, manifest: dict, on_progress_callback=None):
+        self.video_id = manifest["video_id"]
+        self.title = manifest["title"]
+        self.watch_url = manifest.get("url") or f"https://www.youtube.com/watch?v={self.video_id}"
+        self.author = manifest.get("author")
+        self.thumbnail_url = manifest.get("thumbnail_url")
+        self.streams = CachedStreamQuery(CachedStream(d, on_progress_callback, self.video_id) for d in manifest["streams"])
+
+
+def snapshot_streams(yt) -> list[dict]:
+    """Converte os streams de um objeto YouTube em dicionários serializáveis."""
+    items = []
+    for s in yt.streams:
+        data = {}
+        for field in STREAM_FIELDS:
+            if field == "filesize":
+                # Evita um HEAD por stream: usa o contentLength já conhecido, se houver
+                value = getattr(s, "_filesize", None) or 0
+            else:
+                value = getattr(s, field, None)
+            data[field] = value
+        items.append(data)
+    return items
+
+
+class ManifestCache:
+    def __init__(self, cache_dir: str | None = None, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{video_id}.json")
+
+    def get(self, video_id: str) -> dict | None:
+        """Retorna o manifesto se existir e não estiver expirado; marca como usado (LRU)."""
+        path = self._path(video_id)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if time.time() >= manifest.get("expires_at", 0):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return manifest
+
+    def put(
+        self,
+        video_id: str,
+        title: str,
+        streams: list[dict],
+        url: str | None = None,
+        author: str | None = None,
+        thumbnail_url: str | None = None,
+    ) -> dict:
+        now = time.time()
+        expires_at = now + self.ttl
+        url_expires = [e for e in (_url_expire(s.get("url") or "") for s in streams) if e]
+        if url_expires:
+            expires_at = min(expires_at, min(url_expires) - EXPIRE_MARGIN)
+        manifest = {
+            "video_id": video_id,
+            "url": url,
+            "title": title,
+            "author": author,
+            "thumbnail_url": thumbnail_url,
+            "fetched_at": now,
+            "expires_at": expires_at,
+            "streams": streams,
+        }
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(video_id)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(manifest, fh)
+            os.replace(tmp, path)
+            self._evict()
+        return manifest
+
+    def invalidate(self, video_id: str):
+        try:
+            os.remove(self._path(video_id))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Remove as entradas usadas há mais tempo até caber em max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+_default_cache = None
+# Substituto de pytubefix.YouTube usado na extração (ex.: o provedor falso dos benchmarks)
+_video_factory = None
+# Substituto de Playlist/Channel na listagem de coleções
+_collection_factory = None
+
+
+def set_video_factory(factory=None):
+    """Troca o construtor usado na extração: factory(url, on_progress_callback=...); None restaura o YouTube."""
+    global _video_factory
+    _video_factory = factory
+
+
+def set_collection_factory(factory=None):
+    """Troca a listagem de playlists e canais: factory(url) -> URLs dos vídeos; None restaura o pytubefix."""
+    global _collection_factory
+    _collection_factory = factory
+
+
+def iter_collection(url: str):
+    """
+    URLs dos vídeos de uma playlist ou canal, na ordem do YouTube (canais: do mais novo ao
+    mais antigo). A listagem é paginada sob demanda: parar de consumir evita buscar o resto.
+    """
+    if _collection_factory is not None:
+        entries = _collection_factory(url)
+    else:
+        from pytubefix import Channel, Playlist
+
+        entries = (Playlist(url) if "/playlist" in url else Channel(url)).video_urls
+    for entry in entries:
+        # Conforme a versão, o pytubefix entrega URLs ou objetos YouTube
+        yield getattr(entry, "watch_url", entry)
+
+
+def _video_class():
+    # O pytubefix só é importado na primeira extração (ou por preload_extractor): é o
+    # módulo mais pesado da inicialização e não é usado em --help nem para abrir a janela
+    if _video_factory is not None:
+        return _video_factory
+    from pytubefix import YouTube
+
+    return YouTube
+
+
+def _extract(url: str, on_progress_callback=None):
+    def extract():
+        yt = _video_class()(url, on_progress_callback=on_progress_callback)
+        # O YouTube do pytubefix só busca a página ao ler streams e título: a busca acontece
+        # aqui, dentro das repetições de retry.call (throttling e falhas de rede)
+        yt.streams
+        yt.title
+        return yt
+
+    return retry.call(extract, url)
+
+
+def preload_extractor():
+    """
+    Carrega de antemão o extrator e o contexto TLS do transporte, para que a primeira URL
+    não pague por eles; a interface chama em segundo plano depois de desenhar a janela.
+    """
+    try:
+        _video_class()
+    except ImportError:
+        # A falta do pytubefix aparece na primeira extração, com a mensagem de erro de sempre
+        pass
+    getattr(get_transport(), "ssl_context", None)
+
+
+def _tag_streams(yt, video_id: str):
+    # Streams do pytubefix não guardam o vídeo de origem; o cache de conteúdo indexa por ele
+    for s in yt.streams:
+        s.video_id = video_id
+
+
+def get_default_cache() -> ManifestCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ManifestCache()
+    return _default_cache
+
+
+def resolve_video(url: str, on_progress_callback=None, cache: ManifestCache | None = None, use_cache: bool = True):
+    """
+    Retorna um objeto com .title e .streams para a URL.
+
+    Com cache válido, devolve um CachedVideo sem nenhuma requisição ao YouTube; caso
+    contrário extrai com YouTube(url) e grava o manifesto para as próximas execuções.
+    """
+    video_id = extract_video_id(url)
+    if not use_cache or not video_id:
+        with span("extract", cached=False):
+            yt = _extract(url, on_progress_callback)
+            if video_id:
+                _tag_streams(yt, video_id)
+            return yt
+
+    cache = cache or get_default_cache()
+    with span("extract", cached=False) as sp:
+        manifest = cache.get(video_id)
+        if manifest is not None:
+            sp.set(cached=True)
+            return CachedVideo(manifest, on_progress_callback)
+
+        yt = _extract(url, on_progress_callback)
+        try:
+            cache.put(
+                video_id,
+                yt.title,
+                snapshot_streams(yt),
+                url,
+                author=getattr(yt, "author", None),
+                thumbnail_url=getattr(yt, "thumbnail_url", None),
+            )
+        except OSError:
+            pass
+        _tag_streams(yt, video_id)
+        return yt
+
+
+def refresh_stream_url(stream) -> str:
+    """
+    Extrai de novo o vídeo de um stream cuja URL assinada venceu e retorna a URL atual do
+    mesmo itag; o manifesto em cache, com as URLs vencidas, é substituído pelo novo.
+    """
+    cache = get_default_cache()
+    cache.invalidate(stream.video_id)
+    yt = resolve_video(f"https://www.youtube.com/watch?v={stream.video_id}", cache=cache)
+    fresh = yt.streams.get_by_itag(stream.itag)
+    if fresh is None:
+        raise RuntimeError(f"O stream {stream.itag} não está mais disponível em {stream.video_id}")
+    return fresh.url
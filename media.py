@@ -0,0 +1,524 @@
+"""
+Operações de mídia compartilhadas pelo CLI, pelo lote, pela interface e pelo daemon:
+nomes de arquivo, escolha do contêiner da mesclagem, chamadas ao FFmpeg (mesclagem,
+extração e conversão de áudio, capa, metadados), a mesclagem por pipes durante o download
+e a seleção de streams sem interação.
+
+Fica fora de YouTubeDonwloader.py para que os módulos importados pelo CLI (postprocess,
+batch, sync) não importem o script de entrada: rodando como __main__, ele seria carregado
+uma segunda vez.
+"""
+import contextlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from download_engine import (
+    DEFAULT_SEGMENTS,
+    DEFAULT_SEGMENT_SIZE,
+    DownloadCancelled,
+    download_pair,
+    has_partial,
+    iter_stream_chunks,
+    stream_source,
+)
+from adaptive import new_controller
+from content_cache import detach, get_content_cache
+from formats import StreamIndex, resolution_selector, stream_codecs
+from metrics import span
+
+
+def sanitize_title(title: str) -> str:
+    """Cria um nome de arquivo seguro para Windows."""
+    return "".join(c for c in title if c.isalnum() or c in (" ", ".", "_", "-")).strip()
+
+
+def stream_extension(stream) -> str:
+    """Obtém a extensão do stream a partir do mime_type (fallback para mp4)."""
+    try:
+        if stream.mime_type:
+            return stream.mime_type.split("/")[-1]
+    except Exception:
+        pass
+    return "mp4"
+
+
+def _resolve_ffmpeg():
+    p = shutil.which("ffmpeg")
+    if p:
+        return p
+    exe = "ffmpeg.exe" if os.name == "nt" else "ffmpeg"
+    if getattr(sys, "frozen", False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.getcwd()
+    local = os.path.join(base, exe)
+    if os.path.exists(local):
+        return local
+    return None
+
+# Codecs que cada contêiner aceita por cópia direta (sem recodificar)
+MP4_VIDEO_CODECS = {"h264", "hevc", "av1", "vp9"}
+MP4_AUDIO_CODECS = {"aac"}
+WEBM_VIDEO_CODECS = {"vp8", "vp9", "av1"}
+WEBM_AUDIO_CODECS = {"opus", "vorbis"}
+# Comportamento antigo: copia o vídeo e recodifica o áudio para AAC
+MP4_AAC_ARGS = ["-c:v", "copy", "-c:a", "aac", "-strict", "experimental"]
+
+
+def choose_container(video_codec: str | None, audio_codec: str | None, require_mp4: bool = False) -> tuple[str, list[str]]:
+    """
+    Escolhe o contêiner de saída e os argumentos de codec do FFmpeg para a mesclagem.
+
+    Sempre que possível faz cópia pura (-c copy): MP4 para H.264/HEVC/AV1/VP9 com AAC,
+    WebM para VP8/VP9/AV1 com Opus/Vorbis e MKV para as demais combinações. Com
+    require_mp4 a saída é sempre MP4 com AAC, recodificando só o áudio que não for AAC.
+    """
+    if require_mp4:
+        if video_codec in MP4_VIDEO_CODECS and audio_codec in MP4_AUDIO_CODECS:
+            return "mp4", ["-c", "copy"]
+        return "mp4", MP4_AAC_ARGS
+    if video_codec in MP4_VIDEO_CODECS and audio_codec in MP4_AUDIO_CODECS:
+        return "mp4", ["-c", "copy"]
+    if video_codec in WEBM_VIDEO_CODECS and audio_codec in WEBM_AUDIO_CODECS:
+        return "webm", ["-c", "copy"]
+    return "mkv", ["-c", "copy"]
+
+
+def merge_plan(video_stream, audio_stream, require_mp4: bool = False) -> tuple[str, list[str]]:
+    """choose_container a partir dos streams selecionados (o áudio pode vir de um progressivo)."""
+    video_codec, _ = stream_codecs(video_stream)
+    _, audio_codec = stream_codecs(audio_stream)
+    return choose_container(video_codec, audio_codec, require_mp4)
+
+
+def ffmpeg_merge(
+    video_filename: str,
+    audio_filename: str,
+    output_filename: str,
+    hide_console: bool = False,
+    codec_args: list[str] | None = None,
+):
+    """
+    Combina as faixas; codec_args vem de choose_container (padrão: vídeo copiado, áudio em AAC).
+
+    Entradas que vieram do cache de conteúdo identificam a saída: o mesmo par com os mesmos
+    argumentos é materializado do cache sem rodar o FFmpeg, e saídas novas são guardadas nele.
+    """
+    codec_args = codec_args or MP4_AAC_ARGS
+    cache = get_content_cache()
+    key = cache.merge_key(cache.key_of(video_filename), cache.key_of(audio_filename), codec_args) if cache else None
+    if key and _materialize_merge(cache, key, output_filename):
+        return
+    ffmpeg_bin = _resolve_ffmpeg()
+    if not ffmpeg_bin:
+        raise RuntimeError("FFmpeg não encontrado. Instale e adicione ao PATH ou coloque ffmpeg.exe ao lado do executável.")
+    command = [
+        ffmpeg_bin,
+        "-y",
+        "-i",
+        video_filename,
+        "-i",
+        audio_filename,
+        "-map",
+        "0:v:0",
+        "-map",
+        "1:a:0",
+        *codec_args,
+        output_filename,
+    ]
+    creationflags = subprocess.CREATE_NO_WINDOW if os.name == "nt" and hide_console else 0
+    detach(output_filename)
+    with span("merge", copy=codec_args[:2] == ["-c", "copy"]) as sp:
+        subprocess.run(command, check=True, creationflags=creationflags, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        sp.bytes = os.path.getsize(output_filename)
+    if key:
+        cache.store(key, output_filename)
+
+
+def _materialize_merge(cache, key: str, output_filename: str) -> bool:
+    if not cache.lookup(key):
+        return False
+    with span("merge", cached=True) as sp:
+        method = cache.materialize(key, output_filename)
+        sp.set(materialized=method)
+        sp.bytes = os.path.getsize(output_filename) if method else 0
+    return bool(method)
+
+
+def cached_merge(video_stream, audio_stream, output_filename: str, codec_args: list[str] | None = None) -> bool:
+    """
+    Materializa output_filename do cache de conteúdo se esse par de streams já foi combinado
+    com os mesmos argumentos; retorna False se não houver entrada (nada é baixado).
+    """
+    cache = get_content_cache()
+    if cache is None:
+        return False
+    key = cache.merge_key(cache.stream_key(video_stream), cache.stream_key(audio_stream), codec_args or MP4_AAC_ARGS)
+    return bool(key) and _materialize_merge(cache, key, output_filename)
+
+
+def ffmpeg_extract_audio(input_filename: str, audio_out_filename: str, hide_console: bool = False, copy: bool = False):
+    """Extrai a faixa de áudio; com copy=True não recodifica (use um contêiner compatível, ex.: .m4a)."""
+    ffmpeg_bin = _resolve_ffmpeg()
+    if not ffmpeg_bin:
+        raise RuntimeError("FFmpeg não encontrado. Instale e adicione ao PATH ou coloque ffmpeg.exe ao lado do executável.")
+    command = [
+        ffmpeg_bin,
+        "-y",
+        "-i",
+        input_filename,
+        "-vn",
+        "-c:a",
+        "copy" if copy else "aac",
+        audio_out_filename,
+    ]
+    creationflags = subprocess.CREATE_NO_WINDOW if os.name == "nt" and hide_console else 0
+    detach(audio_out_filename)
+    with span("extract_audio", copy=copy) as sp:
+        subprocess.run(command, check=True, creationflags=creationflags, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        sp.bytes = os.path.getsize(audio_out_filename)
+
+
+def _run_ffmpeg(args: list[str], hide_console: bool = False):
+    ffmpeg_bin = _resolve_ffmpeg()
+    if not ffmpeg_bin:
+        raise RuntimeError("FFmpeg não encontrado. Instale e adicione ao PATH ou coloque ffmpeg.exe ao lado do executável.")
+    creationflags = subprocess.CREATE_NO_WINDOW if os.name == "nt" and hide_console else 0
+    subprocess.run([ffmpeg_bin, "-y", *args], check=True, creationflags=creationflags, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def ffmpeg_transcode_audio(input_filename: str, output_filename: str, codec_args: list[str], hide_console: bool = False):
+    """Converte a primeira faixa de áudio, descartando o vídeo; codec_args vem de um perfil (ver postprocess)."""
+    detach(output_filename)
+    with span("transcode", codec=codec_args[1] if len(codec_args) > 1 else None) as sp:
+        _run_ffmpeg(["-i", input_filename, "-vn", "-map", "0:a:0", *codec_args, output_filename], hide_console)
+        sp.bytes = os.path.getsize(output_filename)
+
+
+# Contêineres em que o FFmpeg consegue gravar uma capa (WebM e Ogg/Opus não aceitam)
+COVER_EXTENSIONS = ("mp4", "m4a", "mov", "mp3", "mkv")
+
+
+def ffmpeg_embed_thumbnail(
+    input_filename: str, image_filename: str, output_filename: str, has_video: bool = True, hide_console: bool = False
+):
+    """Grava output_filename com a imagem como capa, sem recodificar; o contêiner deve estar em COVER_EXTENSIONS."""
+    ext = os.path.splitext(output_filename)[1].lstrip(".").lower()
+    if ext == "mkv":
+        # Matroska guarda a capa como anexo
+        args = ["-i", input_filename, "-map", "0", "-c", "copy", "-attach", image_filename, "-metadata:s:t", "mimetype=image/jpeg"]
+    elif ext == "mp3":
+        args = [
+            "-i", input_filename, "-i", image_filename, "-map", "0:a", "-map", "1:0", "-c", "copy", "-id3v2_version", "3",
+            "-metadata:s:v", "title=Album cover", "-metadata:s:v", "comment=Cover (front)",
+        ]
+    else:
+        # MP4: a imagem entra como uma faixa de vídeo extra marcada como capa
+        args = [
+            "-i", input_filename, "-i", image_filename, "-map", "0", "-map", "1:0", "-c", "copy",
+            f"-disposition:v:{1 if has_video else 0}", "attached_pic",
+        ]
+    detach(output_filename)
+    with span("thumbnail") as sp:
+        _run_ffmpeg([*args, output_filename], hide_console)
+        sp.bytes = os.path.getsize(output_filename)
+
+
+def ffmpeg_tag(input_filename: str, output_filename: str, tags: dict, hide_console: bool = False):
+    """Copia todas as faixas gravando os metadados em tags (ex.: title, artist, comment)."""
+    args = ["-i", input_filename, "-map", "0", "-c", "copy"]
+    for key, value in tags.items():
+        if value:
+            args += ["-metadata", f"{key}={value}"]
+    if output_filename.lower().endswith(".mp3"):
+        args += ["-id3v2_version", "3"]
+    detach(output_filename)
+    with span("metadata") as sp:
+        _run_ffmpeg([*args, output_filename], hide_console)
+        sp.bytes = os.path.getsize(output_filename)
+
+
+def remove_temp_files(*paths: str):
+    """Remove arquivos temporários (ignorando os que já não existem), medido como a fase "cleanup"."""
+    with span("cleanup", files=len(paths)) as sp:
+        for path in paths:
+            try:
+                sp.bytes += os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                pass
+
+# Contêineres que o FFmpeg consegue ler sequencialmente por um pipe (MP4 fragmentado do DASH e WebM)
+STREAMABLE_EXTENSIONS = ("mp4", "webm")
+
+
+def can_stream_merge(*streams) -> bool:
+    """Indica se as faixas podem ser enviadas ao FFmpeg por FIFOs, sem arquivos temporários."""
+    if not hasattr(os, "mkfifo"):
+        return False
+    for stream in streams:
+        try:
+            if not stream.is_adaptive or not stream.filesize:
+                return False
+        except Exception:
+            return False
+        if stream_extension(stream) not in STREAMABLE_EXTENSIONS:
+            return False
+    return True
+
+
+def ffmpeg_stream_merge(
+    video_stream,
+    audio_stream,
+    output_filename: str,
+    segments: int = DEFAULT_SEGMENTS,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    on_progress=None,
+    hide_console: bool = False,
+    job_id=None,
+    codec_args: list[str] | None = None,
+    cancel_event=None,
+):
+    """
+    Combina vídeo e áudio enquanto são baixados, alimentando o FFmpeg por named pipes.
+
+    Não grava arquivos intermediários: os bytes de cada faixa vão direto para um FIFO
+    lido pelo FFmpeg. on_progress(bytes_baixados, bytes_totais) recebe o progresso combinado;
+    codec_args segue ffmpeg_merge. Se cancel_event for sinalizado, o FFmpeg é encerrado, o
+    arquivo parcial removido e DownloadCancelled propagado.
+    """
+    ffmpeg_bin = _resolve_ffmpeg()
+    if not ffmpeg_bin:
+        raise RuntimeError("FFmpeg não encontrado. Instale e adicione ao PATH ou coloque ffmpeg.exe ao lado do executável.")
+
+    fifo_dir = tempfile.mkdtemp(prefix="ytdl_fifo_")
+    fifos = [os.path.join(fifo_dir, "video"), os.path.join(fifo_dir, "audio")]
+    for fifo in fifos:
+        os.mkfifo(fifo)
+
+    command = [
+        ffmpeg_bin,
+        "-y",
+        "-i",
+        fifos[0],
+        "-i",
+        fifos[1],
+        "-map",
+        "0:v:0",
+        "-map",
+        "1:a:0",
+        *(codec_args or MP4_AAC_ARGS),
+        output_filename,
+    ]
+    total = video_stream.filesize + audio_stream.filesize
+    lock = threading.Lock()
+    state = {"done": 0}
+    errors = []
+    stop = threading.Event()
+
+    creationflags = subprocess.CREATE_NO_WINDOW if os.name == "nt" and hide_console else 0
+    detach(output_filename)
+    proc = subprocess.Popen(command, creationflags=creationflags, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def feed(stream, fifo):
+        controller = new_controller(segments, segment_size)
+        try:
+            # open() bloqueia até o FFmpeg abrir o FIFO para leitura
+            with open(fifo, "wb") as fh, span("download", job_id, itag=getattr(stream, "itag", None), streamed=True) as sp:
+                for chunk in iter_stream_chunks(
+                    stream_source(stream),
+                    stream.filesize,
+                    cancel_event=stop,
+                    job_id=job_id,
+                    controller=controller,
+                ):
+                    fh.write(chunk)
+                    sp.bytes += len(chunk)
+                    with lock:
+                        state["done"] += len(chunk)
+                        done = state["done"]
+                    if on_progress:
+                        on_progress(min(done, total), total)
+                sp.set(**controller.summary())
+        except (BrokenPipeError, DownloadCancelled):
+            pass
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+            proc.kill()
+
+    feeders = [
+        threading.Thread(target=feed, args=(video_stream, fifos[0]), daemon=True),
+        threading.Thread(target=feed, args=(audio_stream, fifos[1]), daemon=True),
+    ]
+    for t in feeders:
+        t.start()
+
+    try:
+        while True:
+            try:
+                returncode = proc.wait(timeout=0.2)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_event is not None and cancel_event.is_set() and not stop.is_set():
+                    errors.append(DownloadCancelled())
+                    stop.set()
+                    proc.kill()
+        if returncode != 0:
+            stop.set()
+        # Se o FFmpeg terminou sem abrir algum FIFO, abre e fecha a ponta de leitura
+        # para liberar a thread que ainda espera no open()
+        for t, fifo in zip(feeders, fifos):
+            while t.is_alive():
+                try:
+                    fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+                    os.close(fd)
+                except OSError:
+                    pass
+                t.join(0.1)
+    finally:
+        shutil.rmtree(fifo_dir, ignore_errors=True)
+
+    if errors or returncode != 0:
+        try:
+            os.remove(output_filename)
+        except OSError:
+            pass
+        if errors:
+            raise errors[0]
+        raise subprocess.CalledProcessError(returncode, command)
+
+
+def download_and_merge(
+    video_stream,
+    audio_stream,
+    out_dir: str,
+    base_title: str,
+    segments: int = DEFAULT_SEGMENTS,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    on_progress=None,
+    hide_console: bool = False,
+    streaming: bool = True,
+    fetch_slot=None,
+    merge_slot=None,
+    job_id=None,
+    require_mp4: bool = False,
+    steps=(),
+    cancel_event=None,
+) -> str:
+    """
+    Baixa e combina as faixas de vídeo e áudio, retornando o caminho do arquivo final.
+
+    O contêiner vem de merge_plan: cópia pura em MP4, WebM ou MKV conforme os codecs,
+    ou MP4 com áudio AAC quando require_mp4 for verdadeiro. Usa ffmpeg_stream_merge quando os contêineres permitem; caso contrário baixa as
+    duas faixas em paralelo para arquivos temporários e as combina no pós-processamento
+    (postprocess). Um par já combinado antes (cache de conteúdo) é materializado sem rede nem FFmpeg.
+    fetch_slot/merge_slot são context managers opcionais (ex.: semáforos do agendador)
+    que limitam a concorrência da fase de rede e da mesclagem por pipes; job_id identifica
+    o job no limitador de banda. steps são passos de postprocess aplicados ao arquivo final.
+    cancel_event interrompe a rede, a mesclagem por pipes e os passos ainda não iniciados.
+    """
+    return submit_download_and_merge(
+        video_stream,
+        audio_stream,
+        out_dir,
+        base_title,
+        segments,
+        segment_size,
+        on_progress,
+        hide_console,
+        streaming,
+        fetch_slot,
+        merge_slot,
+        job_id,
+        require_mp4,
+        steps,
+        cancel_event=cancel_event,
+    ).result()
+
+
+def submit_download_and_merge(
+    video_stream,
+    audio_stream,
+    out_dir: str,
+    base_title: str,
+    segments: int = DEFAULT_SEGMENTS,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    on_progress=None,
+    hide_console: bool = False,
+    streaming: bool = True,
+    fetch_slot=None,
+    merge_slot=None,
+    job_id=None,
+    require_mp4: bool = False,
+    steps=(),
+    postprocessor=None,
+    cancel_event=None,
+):
+    """
+    Como download_and_merge, mas retorna assim que a rede termina: a mesclagem e os passos
+    seguintes vão para a fila do pós-processamento e o Future resolve no arquivo final.
+    """
+    from postprocess import Merge, PostTask, get_postprocessor
+
+    postprocessor = postprocessor or get_postprocessor()
+    fetch_slot = fetch_slot or contextlib.nullcontext()
+    merge_slot = merge_slot or contextlib.nullcontext()
+    ext, codec_args = merge_plan(video_stream, audio_stream, require_mp4)
+    output_filename = os.path.join(out_dir, f"{base_title}_final.{ext}")
+    finishing = PostTask(steps, output_filename, job_id, hide_console=hide_console, cancel_event=cancel_event)
+    if cached_merge(video_stream, audio_stream, output_filename, codec_args):
+        if on_progress:
+            size = os.path.getsize(output_filename)
+            on_progress(size, size)
+        return postprocessor.submit(finishing)
+    video_filename = f"{base_title}_video_temp.{stream_extension(video_stream)}"
+    audio_filename = f"{base_title}_audio_temp.{stream_extension(audio_stream)}"
+    # Faixas interrompidas numa execução anterior são retomadas pelo caminho com arquivos
+    resumable = any(
+        has_partial(p) or os.path.exists(p)
+        for p in (os.path.join(out_dir, video_filename), os.path.join(out_dir, audio_filename))
+    )
+    cache = get_content_cache()
+    keys = (cache.stream_key(video_stream), cache.stream_key(audio_stream)) if cache else (None, None)
+    # Com as duas faixas no cache de conteúdo, o caminho com arquivos não usa a rede
+    cached_inputs = all(k and cache.lookup(k) for k in keys)
+    if streaming and not resumable and not cached_inputs and can_stream_merge(video_stream, audio_stream):
+        # No modo por pipes rede e FFmpeg rodam juntos: ocupa as duas vagas
+        with fetch_slot, merge_slot, span("stream_merge", job_id) as sp:
+            ffmpeg_stream_merge(
+                video_stream, audio_stream, output_filename, segments, segment_size, on_progress, hide_console, job_id, codec_args,
+                cancel_event,
+            )
+            sp.bytes = video_stream.filesize + audio_stream.filesize
+        merge_key = cache.merge_key(*keys, codec_args) if cache else None
+        if merge_key:
+            cache.store(merge_key, output_filename)
+        return postprocessor.submit(finishing)
+
+    with fetch_slot:
+        video_path, audio_path = download_pair(
+            video_stream, audio_stream, out_dir, video_filename, audio_filename, segments, segment_size, on_progress, job_id,
+            cancel_event,
+        )
+    merge = Merge(video_path, audio_path, output_filename, codec_args)
+    return postprocessor.submit(PostTask([merge, *steps], job_id=job_id, hide_console=hide_console, cancel_event=cancel_event))
+
+
+# Sufixo do arquivo para planos de um único stream (ver select_streams)
+PLAN_SUFFIXES = {"progressive": "_progressivo", "video": "_video_only", "audio": "_audio_only"}
+
+
+def select_streams(yt, resolucao: str | None = None, formato: str | None = None):
+    """
+    Escolhe os streams sem interação: a expressão `formato` (ver formats.py) ou, sem ela,
+    a mesma regra de --res/--auto. yt pode ser o vídeo ou um StreamIndex já montado.
+
+    Retorna ("adaptive", vídeo, áudio), ("progressive" | "video" | "audio", stream, None)
+    ou None se nenhum stream servir.
+    """
+    return StreamIndex.of(yt).select(formato or resolution_selector(resolucao))
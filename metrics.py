@@ -0,0 +1,275 @@
+"""
+Instrumentação por fase dos jobs: extração, download, mesclagem e limpeza.
+
+Cada fase vira um span com duração, bytes e resultado. O MetricsRecorder agrega os
+spans por fase (contagem, erros, tempo total, histograma de duração) e os repassa às
+saídas configuradas: log JSON-lines, endpoint de texto no formato do Prometheus e o
+resumo impresso por --profile ao final da CLI.
+"""
+import contextlib
+import contextvars
+import json
+import threading
+import time
+
+# Limites (em segundos) dos buckets do histograma de duração
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current_job = contextvars.ContextVar("metrics_job", default=None)
+
+
+class Span:
+    def __init__(self, phase: str, job=None, **attrs):
+        self.phase = phase
+        self.job = job
+        self.attrs = attrs
+        self.bytes = 0
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.outcome = "ok"
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        data = {
+            "ts": round(self.started_at, 3),
+            "phase": self.phase,
+            "job": self.job,
+            "duration_s": round(self.duration, 6),
+            "bytes": self.bytes,
+            "outcome": self.outcome,
+        }
+        if self.error:
+            data["error"] = self.error
+        data.update(self.attrs)
+        return data
+
+
+class PhaseStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def add(self, span: Span):
+        self.count += 1
+        if span.outcome != "ok":
+            self.errors += 1
+        self.seconds += span.duration
+        self.max_seconds = max(self.max_seconds, span.duration)
+        self.bytes += span.bytes
+        for i, limit in enumerate(DURATION_BUCKETS):
+            if span.duration <= limit:
+                self.buckets[i] += 1
+
+
+class MetricsRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._sinks = []
+        self._collectors = []
+        self._log = None
+
+    @contextlib.contextmanager
+    def span(self, phase: str, job=None, **attrs):
+        """
+        Mede o bloco como uma fase. O span é entregue ao bloco para registrar bytes
+        (span.bytes) e atributos (span.set); uma exceção marca outcome="error" e é repassada.
+        """
+        sp = Span(phase, job if job is not None else _current_job.get(), **attrs)
+        t0 = time.perf_counter()
+        try:
+            yield sp
+        except BaseException as e:
+            sp.outcome = "error"
+            sp.error = type(e).__name__
+            raise
+        finally:
+            sp.duration = time.perf_counter() - t0
+            self.record(sp)
+
+    def record(self, span: Span):
+        with self._lock:
+            stats = self._phases.get(span.phase)
+            if stats is None:
+                stats = self._phases[span.phase] = PhaseStats()
+            stats.add(span)
+            sinks = list(self._sinks)
+        for sink in sinks:
+            try:
+                sink(span)
+            except Exception:
+                pass
+
+    def add_sink(self, sink):
+        """sink(span) é chamado a cada span concluído, na thread que executou a fase."""
+        with self._lock:
+            self._sinks.append(sink)
+
+    def add_collector(self, collector):
+        """
+        collector() retorna {nome: valor} com contadores mantidos fora dos spans (ex.: o
+        reuso de conexões do transporte HTTP); entram no /metrics e no --profile.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collected(self) -> dict:
+        with self._lock:
+            collectors = list(self._collectors)
+        values = {}
+        for collector in collectors:
+            try:
+                values.update(collector())
+            except Exception:
+                pass
+        return values
+
+    def open_log(self, path: str):
+        """Grava cada span como uma linha JSON em `path` (acrescentando ao arquivo)."""
+        fh = open(path, "a", encoding="utf-8")
+        write_lock = threading.Lock()
+
+        def write(span: Span):
+            line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+            with write_lock:
+                fh.write(line + "\n")
+                fh.flush()
+
+        self._log = fh
+        self.add_sink(write)
+
+    def close(self):
+        with self._lock:
+            self._sinks.clear()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def phases(self) -> dict[str, PhaseStats]:
+        with self._lock:
+            return {name: _copy_stats(stats) for name, stats in self._phases.items()}
+
+    def reset(self):
+        with self._lock:
+            self._phases.clear()
+
+    # --- saídas ---
+
+    def prometheus_text(self) -> str:
+        """Métricas no formato de exposição em texto do Prometheus."""
+        lines = [
+            "# HELP ytdl_phase_duration_seconds Duração de cada fase dos jobs.",
+            "# TYPE ytdl_phase_duration_seconds histogram",
+        ]
+        phases = sorted(self.phases().items())
+        for name, stats in phases:
+            for limit, count in zip(DURATION_BUCKETS, stats.buckets):
+                lines.append(f'ytdl_phase_duration_seconds_bucket{{phase="{name}",le="{limit}"}} {count}')
+            lines.append(f'ytdl_phase_duration_seconds_bucket{{phase="{name}",le="+Inf"}} {stats.count}')
+            lines.append(f'ytdl_phase_duration_seconds_sum{{phase="{name}"}} {stats.seconds:.6f}')
+            lines.append(f'ytdl_phase_duration_seconds_count{{phase="{name}"}} {stats.count}')
+        lines += ["# HELP ytdl_phase_bytes_total Bytes processados por fase.", "# TYPE ytdl_phase_bytes_total counter"]
+        lines += [f'ytdl_phase_bytes_total{{phase="{name}"}} {stats.bytes}' for name, stats in phases]
+        lines += ["# HELP ytdl_phase_errors_total Fases que terminaram com erro.", "# TYPE ytdl_phase_errors_total counter"]
+        lines += [f'ytdl_phase_errors_total{{phase="{name}"}} {stats.errors}' for name, stats in phases]
+        for name, value in sorted(self.collected().items()):
+            lines.append(f"# TYPE ytdl_{name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"ytdl_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def format_profile(self) -> str:
+        """Tabela por fase para o --profile: spans, erros, tempo total/médio/máximo e vazão."""
+        phases = self.phases()
+        if not phases:
+            return "Nenhuma fase registrada."
+        total = sum(s.seconds for s in phases.values()) or 1.0
+        lines = [
+            "--- PERFIL POR FASE ---",
+            f"{'fase':<14} {'spans':>5} {'erros':>5} {'total (s)':>10} {'%':>6} {'média (s)':>10} {'máx (s)':>9} {'MiB':>9} {'MiB/s':>8}",
+        ]
+        for name, s in sorted(phases.items(), key=lambda kv: -kv[1].seconds):
+            mib = s.bytes / (1024 * 1024)
+            rate = f"{mib / s.seconds:8.2f}" if s.bytes and s.seconds else f"{'-':>8}"
+            lines.append(
+                f"{name:<14} {s.count:>5} {s.errors:>5} {s.seconds:>10.3f} {s.seconds / total * 100:>5.1f}% "
+                f"{s.seconds / s.count:>10.3f} {s.max_seconds:>9.3f} {mib:>9.1f} {rate}"
+            )
+        collected = self.collected()
+        if collected:
+            lines.append("--- CONTADORES ---")
+            lines += [f"{name:<34} {value}" for name, value in sorted(collected.items())]
+        return "\n".join(lines)
+
+
+def _copy_stats(stats: PhaseStats) -> PhaseStats:
+    copy = PhaseStats()
+    copy.__dict__.update(stats.__dict__, buckets=list(stats.buckets))
+    return copy
+
+
+@contextlib.contextmanager
+def job_scope(job_id):
+    """Associa os spans abertos nesta thread (sem job explícito) ao job informado."""
+    token = _current_job.set(job_id)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", recorder: MetricsRecorder | None = None):
+    """Serve /metrics em texto do Prometheus numa thread daemon; retorna o servidor."""
+    # Importado só quando o endpoint é pedido: o http.server pesa na inicialização
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    recorder = recorder or get_recorder()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = recorder.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
+
+
+_recorder = MetricsRecorder()
+
+
+def get_recorder() -> MetricsRecorder:
+    return _recorder
+
+
+def configure(log_path: str | None = None, port: int | None = None, host: str = "127.0.0.1"):
+    """Liga as saídas opcionais do recorder padrão; retorna o servidor de /metrics ou None."""
+    if log_path:
+        _recorder.open_log(log_path)
+    if port:
+        return start_metrics_server(port, host)
+    return None
+
+
+def span(phase: str, job=None, **attrs):
+    """Atalho para get_recorder().span(...)."""
+    return _recorder.span(phase, job, **attrs)
@@ -0,0 +1,249 @@
+"""
+Estágio de pós-processamento: os workers de rede entregam os arquivos baixados a uma fila
+e seguem para o próximo job, enquanto um pool dimensionado pelo número de núcleos executa,
+por job, uma cadeia de passos:
+
+  Merge           combina vídeo e áudio (ffmpeg_merge) e remove os temporários
+  ExtractAudio    extrai o áudio de um progressivo (para combinar com um vídeo sem áudio)
+  TranscodeAudio  converte só o áudio para um perfil de AUDIO_PROFILES (mp3, opus, ...)
+  EmbedThumbnail  embute a miniatura do vídeo como capa
+  TagMetadata     grava título, autor e URL nos metadados do contêiner
+
+Cada passo recebe o caminho produzido pelo anterior e retorna o seu. O trabalho pesado de
+todos eles é um processo do FFmpeg, então as threads do pool só acompanham esses processos:
+o pool limita quantos rodam ao mesmo tempo sem serializar argumentos entre processos, e as
+fases continuam no mesmo coletor de métricas (spans "merge", "transcode", "thumbnail"...).
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from download_engine import DownloadCancelled
+from media import (
+    COVER_EXTENSIONS,
+    ffmpeg_embed_thumbnail,
+    ffmpeg_extract_audio,
+    ffmpeg_merge,
+    ffmpeg_tag,
+    ffmpeg_transcode_audio,
+    remove_temp_files,
+)
+from metrics import get_recorder, job_scope
+from transport import get_transport
+
+# Perfil -> (extensão, argumentos de codec do FFmpeg)
+AUDIO_PROFILES = {
+    "mp3": ("mp3", ["-c:a", "libmp3lame", "-q:a", "2"]),  # VBR, ~190 kbps
+    "mp3-320": ("mp3", ["-c:a", "libmp3lame", "-b:a", "320k"]),
+    "opus": ("opus", ["-c:a", "libopus", "-b:a", "128k"]),
+    "opus-voz": ("opus", ["-c:a", "libopus", "-b:a", "48k", "-application", "voip"]),
+}
+
+
+def _temp_sibling(path: str, tag: str) -> str:
+    # Mantém a extensão: o FFmpeg escolhe o contêiner de saída por ela
+    root, ext = os.path.splitext(path)
+    return f"{root}.{tag}{ext}"
+
+
+class Merge:
+    name = "merge"
+
+    def __init__(self, video_path: str, audio_path: str, output_path: str, codec_args: list[str] | None = None):
+        self.video_path = video_path
+        self.audio_path = audio_path
+        self.output_path = output_path
+        self.codec_args = codec_args
+
+    def __call__(self, path, task) -> str:
+        try:
+            ffmpeg_merge(self.video_path, self.audio_path, self.output_path, task.hide_console, self.codec_args)
+        finally:
+            remove_temp_files(self.video_path, self.audio_path)
+        return self.output_path
+
+
+class ExtractAudio:
+    name = "extract_audio"
+
+    def __init__(self, input_path: str, output_path: str, copy: bool = False):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.copy = copy
+
+    def __call__(self, path, task) -> str:
+        try:
+            ffmpeg_extract_audio(self.input_path, self.output_path, task.hide_console, self.copy)
+        finally:
+            remove_temp_files(self.input_path)
+        return self.output_path
+
+
+class TranscodeAudio:
+    name = "transcode"
+
+    def __init__(self, profile: str):
+        if profile not in AUDIO_PROFILES:
+            raise ValueError(f"Perfil de áudio desconhecido: {profile!r} (opções: {', '.join(AUDIO_PROFILES)})")
+        self.profile = profile
+
+    def __call__(self, path, task) -> str:
+        ext, codec_args = AUDIO_PROFILES[self.profile]
+        output_path = f"{os.path.splitext(path)[0]}.{ext}"
+        if output_path == path:
+            output_path = _temp_sibling(path, self.profile)
+        ffmpeg_transcode_audio(path, output_path, codec_args, task.hide_console)
+        remove_temp_files(path)
+        task.has_video = False
+        return output_path
+
+
+class EmbedThumbnail:
+    name = "thumbnail"
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def __call__(self, path, task) -> str:
+        if os.path.splitext(path)[1].lstrip(".").lower() not in COVER_EXTENSIONS:
+            return path
+        image_path = f"{os.path.splitext(path)[0]}.thumb.jpg"
+        transport = get_transport()
+        with transport.request("GET", self.url, {"User-Agent": "Mozilla/5.0"}) as resp, open(image_path, "wb") as fh:
+            for chunk in iter(lambda: resp.read(transport.read_size), b""):
+                fh.write(chunk)
+        tmp = _temp_sibling(path, "thumb")
+        try:
+            ffmpeg_embed_thumbnail(path, image_path, tmp, task.has_video, task.hide_console)
+            os.replace(tmp, path)
+        finally:
+            remove_temp_files(image_path, tmp)
+        return path
+
+
+class TagMetadata:
+    name = "metadata"
+
+    def __init__(self, tags: dict):
+        self.tags = tags
+
+    def __call__(self, path, task) -> str:
+        tmp = _temp_sibling(path, "tags")
+        try:
+            ffmpeg_tag(path, tmp, self.tags, task.hide_console)
+            os.replace(tmp, path)
+        finally:
+            remove_temp_files(tmp)
+        return path
+
+
+def thumbnail_url(yt) -> str | None:
+    url = getattr(yt, "thumbnail_url", None)
+    if url:
+        return url
+    video_id = getattr(yt, "video_id", None)
+    return f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg" if video_id else None
+
+
+def video_tags(yt) -> dict:
+    return {
+        "title": getattr(yt, "title", None),
+        "artist": getattr(yt, "author", None),
+        "comment": getattr(yt, "watch_url", None),
+    }
+
+
+def finishing_steps(yt, audio_profile: str | None = None, thumbnail: bool = False, metadata: bool = False) -> list:
+    """Passos aplicados depois do download (e da mesclagem, se houver), na ordem em que rodam."""
+    steps = []
+    if audio_profile:
+        steps.append(TranscodeAudio(audio_profile))
+    if thumbnail and thumbnail_url(yt):
+        steps.append(EmbedThumbnail(thumbnail_url(yt)))
+    if metadata:
+        steps.append(TagMetadata(video_tags(yt)))
+    return steps
+
+
+class PostTask:
+    """
+    Cadeia de passos de um job. input_path é o arquivo já baixado (None quando o primeiro
+    passo produz o seu, como Merge); cleanup lista temporários removidos se algum passo falhar.
+    Com cancel_event sinalizado, os passos que ainda não começaram não rodam (DownloadCancelled).
+    """
+
+    def __init__(self, steps: list, input_path: str | None = None, job_id=None, cleanup=(), hide_console: bool = False, has_video: bool = True, cancel_event=None):
+        self.steps = list(steps)
+        self.input_path = input_path
+        self.job_id = job_id
+        self.cleanup = tuple(cleanup)
+        self.hide_console = hide_console
+        self.has_video = has_video
+        self.cancel_event = cancel_event
+
+    def run(self) -> str:
+        path = self.input_path
+        try:
+            with job_scope(self.job_id):
+                for step in self.steps:
+                    if self.cancel_event is not None and self.cancel_event.is_set():
+                        raise DownloadCancelled()
+                    path = step(path, self)
+        except BaseException:
+            remove_temp_files(*self.cleanup)
+            raise
+        return path
+
+
+class PostProcessor:
+    """Pool do pós-processamento: submit() enfileira um PostTask e retorna um Future com o arquivo final."""
+
+    def __init__(self, workers: int | None = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="postprocess")
+        self._lock = threading.Lock()
+        self.pending = 0
+
+    def submit(self, task: PostTask) -> Future:
+        if not task.steps:
+            future = Future()
+            future.set_result(task.input_path)
+            return future
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(task.run)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_default = None
+_default_lock = threading.Lock()
+_workers = None
+
+
+def configure(workers: int | None = None):
+    """Tamanho do pool compartilhado (padrão: número de núcleos); vale se ainda não foi criado."""
+    global _workers
+    _workers = workers
+
+
+def get_postprocessor() -> PostProcessor:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PostProcessor(_workers)
+        return _default
+
+
+def _collect() -> dict:
+    return {"postprocess_pending": _default.pending if _default is not None else 0}
+
+
+get_recorder().add_collector(_collect)
@@ -0,0 +1,102 @@
+"""
+Barramento de progresso entre as threads de download e a interface.
+
+Os workers apenas publicam (bytes_baixados, bytes_totais) por item — uma atribuição de
+tupla num dicionário, sem lock. A thread da interface chama drain() em ritmo fixo e
+recebe só a amostra mais recente de cada item que mudou, com vazão e ETA calculados.
+"""
+import time
+
+DEFAULT_INTERVAL_MS = 100  # 10 Hz
+# Peso da amostra nova na média móvel da vazão
+RATE_SMOOTHING = 0.3
+
+
+class ProgressSnapshot:
+    def __init__(self, item_id, done: int, total: int, finished: bool, rate: float | None):
+        self.item_id = item_id
+        self.done = done
+        self.total = total
+        self.finished = finished
+        self.rate = rate
+
+    @property
+    def percent(self) -> float:
+        if self.finished:
+            return 100.0
+        return (self.done / self.total) * 100.0 if self.total else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """Segundos restantes estimados pela vazão média; None se ainda não há vazão."""
+        if self.finished or not self.rate or not self.total:
+            return None
+        return max(0, self.total - self.done) / self.rate
+
+
+class ProgressBus:
+    def __init__(self):
+        # item_id -> (baixados, total, instante, concluído); substituído inteiro a cada publicação
+        self._latest = {}
+        # Estado só da thread consumidora
+        self._seen = {}
+        self._rates = {}
+
+    # --- lado dos workers ---
+
+    def publish(self, item_id, done: int, total: int):
+        self._latest[item_id] = (done, total, time.monotonic(), False)
+
+    def finish(self, item_id):
+        done, total, _, _ = self._latest.get(item_id, (0, 0, 0.0, False))
+        self._latest[item_id] = (max(done, total), total, time.monotonic(), True)
+
+    def forget(self, item_id):
+        self._latest.pop(item_id, None)
+
+    # --- lado da interface ---
+
+    def drain(self) -> list[ProgressSnapshot]:
+        """Amostras novas desde a última chamada, uma por item (as intermediárias são descartadas)."""
+        updates = []
+        for item_id, sample in list(self._latest.items()):
+            if self._seen.get(item_id) is sample:
+                continue
+            self._seen[item_id] = sample
+            done, total, when, finished = sample
+            updates.append(ProgressSnapshot(item_id, done, total, finished, self._update_rate(item_id, done, when)))
+        for item_id in [i for i in self._seen if i not in self._latest]:
+            self._seen.pop(item_id, None)
+            self._rates.pop(item_id, None)
+        return updates
+
+    def _update_rate(self, item_id, done: int, when: float) -> float | None:
+        last = self._rates.get(item_id)
+        if last is None or done < last[1]:
+            self._rates[item_id] = (when, done, None)
+            return None
+        last_when, last_done, rate = last
+        elapsed = when - last_when
+        if elapsed <= 0:
+            return rate
+        current = (done - last_done) / elapsed
+        rate = current if rate is None else rate + RATE_SMOOTHING * (current - rate)
+        self._rates[item_id] = (when, done, rate)
+        return rate
+
+
+def format_rate(rate: float | None) -> str:
+    if not rate:
+        return ""
+    if rate >= 1024 * 1024:
+        return f"{rate / (1024 * 1024):.1f} MiB/s"
+    return f"{rate / 1024:.0f} KiB/s"
+
+
+def format_eta(seconds: float | None) -> str:
+    if seconds is None:
+        return ""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
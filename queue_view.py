@@ -0,0 +1,154 @@
+"""
+Visualização da fila de downloads sobre ttk.Treeview.
+
+O Treeview só desenha as linhas visíveis, então a fila continua leve com milhares de
+itens. Inclusões, remoções e atualizações são aplicadas como diferenças: cada linha é
+identificada pelo ID do item e só as células que mudaram são reescritas. As listras
+alternadas também: depois de remoções e a cada rolagem, só as linhas visíveis são
+reclassificadas.
+"""
+import os
+from tkinter import ttk
+
+COLUMNS = (
+    ("title", "Vídeo", 280),
+    ("res", "Resolução", 80),
+    ("local", "Local", 140),
+    ("progress", "Progresso", 150),
+    ("speed", "Velocidade", 130),
+    ("status", "Status", 120),
+)
+_COLUMN_KEYS = tuple(key for key, _, _ in COLUMNS)
+_BAR_CELLS = 10
+
+
+def title_text(title: str) -> str:
+    return title[:60] + "..." if len(title) > 60 else title
+
+
+def progress_text(percent: float) -> str:
+    """Barra de texto para a célula de progresso, ex.: "████░░░░░░  40%"."""
+    percent = max(0.0, min(100.0, percent))
+    filled = int(percent / 100 * _BAR_CELLS)
+    return "█" * filled + "░" * (_BAR_CELLS - filled) + f" {percent:4.0f}%"
+
+
+class QueueView:
+    def __init__(self, parent, height: int = 10):
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=_COLUMN_KEYS, show="headings", height=height, selectmode="extended")
+        for key, heading, width in COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=width, anchor="w", stretch=key == "title")
+        self.tree.tag_configure("even", background="#f7f7f7")
+        self.tree.tag_configure("odd", background="#ffffff")
+        self._scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self._scrollbar.pack(side="right", fill="y")
+        # Último valor escrito em cada célula, para pular atualizações sem mudança
+        self._cells = {}
+        # Listra atual de cada linha, se há uma reclassificação agendada e o índice da
+        # primeira linha visível na última rolagem
+        self._stripes = {}
+        self._restripe_pending = False
+        self._top = None
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def _row_values(self, item) -> dict:
+        return {
+            "title": title_text(item.title),
+            "res": item.res,
+            "local": os.path.basename(item.out_dir) if item.out_dir else "N/A",
+            "progress": progress_text(item.progress),
+            "speed": item.speed_text,
+            "status": item.status,
+        }
+
+    def add(self, item):
+        iid = str(item.id)
+        values = self._row_values(item)
+        tag = "even" if len(self._cells) % 2 == 0 else "odd"
+        self.tree.insert("", "end", iid=iid, values=[values[k] for k in _COLUMN_KEYS], tags=(tag,))
+        self._cells[iid] = values
+        self._stripes[iid] = tag
+
+    def remove(self, item_id):
+        iid = str(item_id)
+        if iid not in self._cells:
+            return
+        self.tree.delete(iid)
+        del self._cells[iid]
+        del self._stripes[iid]
+        # As linhas seguintes trocam de listra; várias remoções seguidas (ex.: limpar os
+        # concluídos) reclassificam as linhas visíveis uma única vez
+        if not self._restripe_pending:
+            self._restripe_pending = True
+            self.tree.after_idle(self._restripe_visible)
+
+    def _on_scroll(self, first, last):
+        self._scrollbar.set(first, last)
+        # O Treeview chama yscrollcommand também a cada inclusão; só reclassifica quando a
+        # rolagem muda a primeira linha visível
+        top = round(float(first) * len(self._cells))
+        if top != self._top:
+            self._top = top
+            self._restripe_visible()
+
+    def _first_visible(self) -> str:
+        """iid da primeira linha visível, logo abaixo dos cabeçalhos ("" se não houver)."""
+        for y in range(0, self.tree.winfo_height(), 4):
+            iid = self.tree.identify_row(y)
+            if iid:
+                return iid
+        return ""
+
+    def _restripe_visible(self):
+        """Corrige a listra das linhas visíveis; as demais são corrigidas ao rolar até elas."""
+        self._restripe_pending = False
+        if not self._cells:
+            return
+        iid = self._first_visible()
+        if not iid:
+            return
+        # Percorre só a janela visível: bbox() fica vazio na primeira linha fora dela
+        index = self.tree.index(iid)
+        while iid and self.tree.bbox(iid):
+            tag = "even" if index % 2 == 0 else "odd"
+            if self._stripes.get(iid) != tag:
+                self.tree.item(iid, tags=(tag,))
+                self._stripes[iid] = tag
+            iid = self.tree.next(iid)
+            index += 1
+
+    def update(self, item_id, **values):
+        """Reescreve só as células informadas que mudaram (progress em %, demais como texto)."""
+        iid = str(item_id)
+        cells = self._cells.get(iid)
+        if cells is None:
+            return
+        if "title" in values:
+            values["title"] = title_text(values["title"])
+        if "progress" in values:
+            values["progress"] = progress_text(values["progress"])
+        for key, value in values.items():
+            if cells.get(key) != value:
+                cells[key] = value
+                self.tree.set(iid, key, value)
+
+    def selected_ids(self) -> list[int]:
+        return [int(iid) for iid in self.tree.selection()]
+
+    def see(self, item_id):
+        iid = str(item_id)
+        if iid in self._cells:
+            self.tree.see(iid)
+
+    def __len__(self):
+        return len(self._cells)
+
+    def bind(self, sequence: str, callback):
+        self.tree.bind(sequence, callback)
+
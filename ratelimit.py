@@ -0,0 +1,162 @@
+"""
+Limitador de banda global (token bucket) compartilhado por todos os downloads do processo.
+
+Há um limite global, limites por job ajustáveis em tempo de execução e uma agenda por
+horário do dia que substitui o limite global dentro de cada janela.
+"""
+import re
+import threading
+import time
+
+# Fatia máxima de espera: permite que mudanças de limite valham em até 250 ms
+_SLEEP_SLICE = 0.25
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+_RATE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*$", re.IGNORECASE)
+_WINDOW_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(.+)$")
+
+
+def parse_rate(text: str) -> int:
+    """Converte "500K", "2M", "1.5MB/s" ou "0" (sem limite) em bytes por segundo."""
+    m = _RATE_RE.match(str(text))
+    if not m:
+        raise ValueError(f"Limite de banda inválido: {text!r}")
+    return int(float(m.group(1)) * _UNITS[m.group(2).upper()])
+
+
+def parse_schedule(text: str) -> list[tuple[int, int, int]]:
+    """
+    Converte "08:00-18:00=1M,22:00-06:00=0" em [(início_min, fim_min, bytes/s), ...].
+    Janelas que cruzam a meia-noite são aceitas.
+    """
+    windows = []
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        m = _WINDOW_RE.match(part)
+        if not m:
+            raise ValueError(f"Janela de agenda inválida: {part!r}")
+        h1, m1, h2, m2, rate = m.groups()
+        windows.append((int(h1) * 60 + int(m1), int(h2) * 60 + int(m2), parse_rate(rate)))
+    return windows
+
+
+class TokenBucket:
+    """Token bucket thread-safe; rate=0 desativa o limite."""
+
+    def __init__(self, rate: int = 0, burst: int | None = None):
+        self._lock = threading.Lock()
+        self.rate = 0
+        self.capacity = 0
+        self.tokens = 0.0
+        self._last = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: int, burst: int | None = None):
+        with self._lock:
+            self._refill()
+            self.rate = max(0, int(rate))
+            # Rajada padrão de 1/4 s de banda, para não acumular picos longos
+            self.capacity = burst or max(self.rate // 4, 16 * 1024)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def consume(self, n: int):
+        """Retira n bytes do balde, bloqueando até haver saldo (o saldo pode ficar negativo)."""
+        with self._lock:
+            if not self.rate:
+                return
+            self._refill()
+            self.tokens -= n
+        while True:
+            with self._lock:
+                if not self.rate:
+                    return
+                self._refill()
+                deficit = -self.tokens
+                rate = self.rate
+            if deficit <= 0:
+                return
+            time.sleep(min(deficit / rate, _SLEEP_SLICE))
+
+
+class BandwidthLimiter:
+    def __init__(self, global_rate: int = 0, schedule: list[tuple[int, int, int]] | None = None):
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_rate)
+        self._base_rate = global_rate
+        self._schedule = schedule or []
+        self._jobs = {}
+        self._job_rates = {}
+        self._checked_minute = None
+
+    def set_global_rate(self, rate: int):
+        with self._lock:
+            self._base_rate = rate
+            self._checked_minute = None
+
+    def set_schedule(self, schedule: list[tuple[int, int, int]]):
+        with self._lock:
+            self._schedule = list(schedule)
+            self._checked_minute = None
+
+    def set_job_rate(self, job_id, rate: int):
+        """Define (ou altera em tempo de execução) o limite de um job; 0 remove o limite."""
+        with self._lock:
+            self._job_rates[job_id] = rate
+            bucket = self._jobs.get(job_id)
+        if bucket is not None:
+            bucket.set_rate(rate)
+
+    def release_job(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._job_rates.pop(job_id, None)
+
+    def effective_global_rate(self, now: float | None = None) -> int:
+        t = time.localtime(now)
+        minute = t.tm_hour * 60 + t.tm_min
+        for start, end, rate in self._schedule:
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return rate
+        return self._base_rate
+
+    def _update_global(self):
+        minute = int(time.time() // 60)
+        with self._lock:
+            if minute == self._checked_minute:
+                return
+            self._checked_minute = minute
+            rate = self.effective_global_rate()
+        if rate != self._global.rate:
+            self._global.set_rate(rate)
+
+    def _job_bucket(self, job_id) -> TokenBucket | None:
+        with self._lock:
+            rate = self._job_rates.get(job_id, 0)
+            if not rate:
+                return None
+            bucket = self._jobs.get(job_id)
+            if bucket is None:
+                bucket = self._jobs[job_id] = TokenBucket(rate)
+            return bucket
+
+    def throttle(self, nbytes: int, job_id=None):
+        """Bloqueia o chamador até que nbytes possam passar pelos limites do job e global."""
+        if job_id is not None:
+            bucket = self._job_bucket(job_id)
+            if bucket is not None:
+                bucket.consume(nbytes)
+        self._update_global()
+        self._global.consume(nbytes)
+
+
+_limiter = BandwidthLimiter()
+
+
+def get_limiter() -> BandwidthLimiter:
+    """Limitador único do processo, usado por todas as buscas de streams."""
+    return _limiter
@@ -0,0 +1,346 @@
+"""
+Recuperação de falhas na extração e nas buscas de streams.
+
+classify() separa as exceções em quatro tipos, que decidem o que fazer com elas:
+
+  THROTTLED  429/503 (e 403 de uma URL ainda válida): o host está limitando; espera e
+             repete, e a resposta conta no disjuntor do host
+  EXPIRED    410, ou 403 de uma URL assinada cujo `expire` já passou: o vídeo é extraído
+             de novo e a busca segue com a URL nova
+  TRANSIENT  conexão derrubada, timeout, resposta truncada, 5xx: repete com backoff,
+             continuando do último byte recebido
+  FATAL      404, vídeo indisponível, laço de redirecionamentos, certificado TLS
+             inválido, erros de disco e o resto: falha na hora
+
+backoff() é exponencial com jitter: quem falhou junto (as faixas de um download, os jobs
+de uma fila) não volta junto. Cada host tem um CircuitBreaker: BREAKER_THRESHOLD respostas
+de throttling em BREAKER_WINDOW segundos abrem o circuito e as requisições novas ao host
+esperam o cooldown; depois dele uma única requisição de teste passa e, se for aceita, o
+circuito fecha. Enquanto algum circuito está aberto o agendador não inicia jobs novos
+(ver throttle_pause).
+"""
+import http.client
+import random
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+from metrics import get_recorder
+from transport import TooManyRedirects
+
+THROTTLED = "throttled"
+EXPIRED = "expired"
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+DEFAULT_RETRIES = 8  # falhas transitórias por faixa (ou por extração)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+MAX_URL_RENEWALS = 2  # reextrações por faixa
+BREAKER_THRESHOLD = 6
+BREAKER_WINDOW = 60.0
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 600.0
+
+# Margem para tratar como vencida uma URL assinada que expira durante a requisição
+_EXPIRE_SLACK = 30
+_TRANSIENT_STATUSES = (408, 500, 502, 504)
+# Exceções do pytubefix (comparadas pelo nome: o pacote só é importado na extração) que uma
+# nova tentativa não resolve
+_FATAL_EXTRACTION = (
+    "VideoUnavailable",
+    "VideoPrivate",
+    "MembersOnly",
+    "AgeRestrictedError",
+    "LiveStreamError",
+    "VideoRegionBlocked",
+    "RecordingUnavailable",
+)
+
+
+class TruncatedResponse(IOError):
+    """O servidor encerrou a resposta antes do último byte pedido."""
+
+
+def _url_expired(url: str | None) -> bool:
+    if not url:
+        return False
+    try:
+        expire = urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get("expire")
+        return bool(expire) and float(expire[0]) <= time.time() + _EXPIRE_SLACK
+    except (ValueError, TypeError):
+        return False
+
+
+def status_of(exc: BaseException) -> int | None:
+    """Status HTTP de transport.HTTPStatusError ou urllib.error.HTTPError (usado pelo pytubefix)."""
+    status = getattr(exc, "status", None)
+    if not isinstance(status, int):
+        status = getattr(exc, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(exc: BaseException) -> float | None:
+    try:
+        return max(0.0, float(exc.headers.get("Retry-After")))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def classify(exc: BaseException) -> str:
+    """Tipo da falha: THROTTLED, EXPIRED, TRANSIENT ou FATAL."""
+    if isinstance(exc, TooManyRedirects):
+        # Repetir segue os mesmos redirecionamentos
+        return FATAL
+    status = status_of(exc)
+    if status is not None:
+        if status in (429, 503):
+            return THROTTLED
+        if status == 410 or (status == 403 and _url_expired(getattr(exc, "url", None))):
+            return EXPIRED
+        if status == 403:
+            return THROTTLED
+        if status in _TRANSIENT_STATUSES:
+            return TRANSIENT
+        return FATAL
+    if any(cls.__name__ in _FATAL_EXTRACTION for cls in type(exc).__mro__):
+        return FATAL
+    if isinstance(exc, urllib.error.URLError):
+        # Sem status: o urllib embrulha a falha de rede (DNS, conexão recusada, TLS...) em
+        # reason; um texto em vez de exceção é erro na própria URL
+        return classify(exc.reason) if isinstance(exc.reason, BaseException) else FATAL
+    if isinstance(exc, ssl.SSLError):
+        # Certificado inválido ou handshake recusado não mudam na próxima tentativa; só a
+        # conexão encerrada no meio (ou que expirou) é de rede
+        if isinstance(exc, (ssl.SSLEOFError, ssl.SSLZeroReturnError)) or "timed out" in str(exc):
+            return TRANSIENT
+        return FATAL
+    if isinstance(exc, (TruncatedResponse, ConnectionError, TimeoutError, socket.timeout, socket.gaierror, http.client.HTTPException)):
+        return TRANSIENT
+    return FATAL
+
+
+def describe(exc: BaseException) -> str:
+    """Mensagem da falha com o tipo, para o usuário saber se vale tentar de novo."""
+    kind = classify(exc)
+    if kind == THROTTLED:
+        return f"o servidor está limitando as requisições, tente mais tarde ({exc})"
+    if kind == EXPIRED:
+        return f"link do vídeo expirado ({exc})"
+    if kind == TRANSIENT:
+        return f"falha de rede ({exc})"
+    return str(exc)
+
+
+def backoff(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """
+    Espera antes da tentativa attempt + 1: metade de min(cap, base * 2^attempt) fixa e a
+    outra metade sorteada, para que falhas simultâneas não voltem todas no mesmo instante.
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def host_of(url: str) -> str:
+    return (urllib.parse.urlsplit(url).hostname or "").lower()
+
+
+class CircuitBreaker:
+    """
+    Disjuntor de um host. Fechado, deixa tudo passar; aberto, segura as requisições novas
+    até o fim do cooldown (que dobra a cada reabertura, até BREAKER_MAX_COOLDOWN); meio
+    aberto, deixa passar uma requisição de teste: aceita, o circuito fecha; recusada, reabre.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, host: str, threshold: int = BREAKER_THRESHOLD, window: float = BREAKER_WINDOW, cooldown: float = BREAKER_COOLDOWN):
+        self.host = host
+        self.threshold = max(1, threshold)
+        self.window = window
+        self.base_cooldown = cooldown
+        self.state = self.CLOSED
+        self.trips = 0
+        self._cond = threading.Condition()
+        self._throttles = []  # instantes das respostas de throttling recentes
+        self._cooldown = cooldown
+        self._open_until = 0.0
+        self._probing = False
+
+    def remaining(self) -> float:
+        """Segundos até o circuito voltar a aceitar requisições (0 se já aceita)."""
+        with self._cond:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self._open_until - time.monotonic())
+
+    def acquire(self, cancel_event=None) -> bool | None:
+        """
+        Bloqueia enquanto o circuito estiver aberto ou outra requisição de teste estiver em
+        curso. Retorna None se cancel_event for sinalizado; senão, se esta é a requisição de
+        teste, valor que deve voltar em record() junto com o resultado.
+        """
+        with self._cond:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                if self.state == self.OPEN:
+                    left = self._open_until - time.monotonic()
+                    if left > 0:
+                        self._cond.wait(min(left, 0.25))
+                        continue
+                    self.state = self.HALF_OPEN
+                if self.state == self.CLOSED:
+                    return False
+                if not self._probing:
+                    self._probing = True
+                    return True
+                self._cond.wait(0.25)
+
+    def record(self, kind: str | None, delay: float | None = None, probe: bool = False):
+        """
+        Resultado de uma requisição que passou por acquire(): None para sucesso ou o tipo da
+        falha (classify). delay é o Retry-After do servidor, se houver.
+        """
+        now = time.monotonic()
+        with self._cond:
+            if probe:
+                self._probing = False
+                if kind is None:
+                    self.state = self.CLOSED
+                    self._cooldown = self.base_cooldown
+                    self._throttles.clear()
+                elif kind == THROTTLED:
+                    self._cooldown = min(BREAKER_MAX_COOLDOWN, self._cooldown * 2)
+                    self._trip(now, delay)
+            elif kind == THROTTLED and self.state == self.CLOSED:
+                # Com o circuito já aberto, são respostas de requisições enviadas antes dele abrir
+                self._throttles = [t for t in self._throttles if now - t < self.window]
+                self._throttles.append(now)
+                if len(self._throttles) >= self.threshold:
+                    self._trip(now, delay)
+            self._cond.notify_all()
+
+    def _trip(self, now: float, delay: float | None):
+        pause = max(self._cooldown, delay or 0.0)
+        self.state = self.OPEN
+        self._open_until = now + pause + random.uniform(0, pause / 10)
+        self._throttles.clear()
+        self.trips += 1
+
+
+_retried = {THROTTLED: 0, EXPIRED: 0, TRANSIENT: 0}
+_retried_lock = threading.Lock()
+
+
+def note_retry(kind: str):
+    """Conta uma nova tentativa depois de uma falha do tipo kind (aparece nas métricas)."""
+    with _retried_lock:
+        _retried[kind] += 1
+
+
+_settings = {"retries": DEFAULT_RETRIES, "threshold": BREAKER_THRESHOLD, "cooldown": BREAKER_COOLDOWN, "enabled": True}
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def configure(retries: int | None = None, cooldown: float | None = None, threshold: int | None = None, breaker: bool = True):
+    """Tentativas por falha transitória e parâmetros dos disjuntores criados daqui em diante."""
+    if retries is not None:
+        _settings["retries"] = max(0, retries)
+    if cooldown is not None:
+        _settings["cooldown"] = max(0.0, cooldown)
+    if threshold is not None:
+        _settings["threshold"] = max(1, threshold)
+    _settings["enabled"] = breaker
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def max_retries() -> int:
+    return _settings["retries"]
+
+
+def get_breaker(url: str) -> CircuitBreaker | None:
+    """Disjuntor do host de url (None se desativado em configure)."""
+    if not _settings["enabled"]:
+        return None
+    host = host_of(url)
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host, _settings["threshold"], cooldown=_settings["cooldown"])
+        return breaker
+
+
+def open_circuits() -> dict[str, float]:
+    """{host: segundos restantes} dos circuitos abertos."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.host: left for b in breakers if (left := b.remaining()) > 0}
+
+
+def throttle_pause() -> float:
+    """Segundos até o último circuito aberto fechar; 0 se nenhum host está limitando."""
+    return max(open_circuits().values(), default=0.0)
+
+
+def wait_circuits(cancel_event=None) -> bool:
+    """Espera todos os circuitos fecharem; retorna False se cancel_event for sinalizado antes."""
+    while (left := throttle_pause()) > 0:
+        if cancel_event is not None:
+            if cancel_event.wait(min(left, 1.0)):
+                return False
+        else:
+            time.sleep(min(left, 1.0))
+    return True
+
+
+def call(fn, url: str):
+    """
+    Executa fn() com as regras de repetição de classify: throttling e falhas transitórias
+    esperam (Retry-After ou backoff()) e repetem, até max_retries() vezes; o resto propaga.
+    Usado na extração, que não tem o que retomar.
+    """
+    breaker = get_breaker(url)
+    attempt = 0
+    while True:
+        probe = breaker.acquire() if breaker is not None else False
+        try:
+            result = fn()
+        except Exception as e:
+            kind = classify(e)
+            if breaker is not None:
+                breaker.record(kind, retry_after(e), probe)
+            if kind not in (THROTTLED, TRANSIENT) or attempt >= max_retries():
+                raise
+            delay = retry_after(e) if kind == THROTTLED else None
+            note_retry(kind)
+            time.sleep(backoff(attempt) if delay is None else min(delay, BACKOFF_MAX))
+            attempt += 1
+        else:
+            if breaker is not None:
+                breaker.record(None, probe=probe)
+            return result
+
+
+def _collect() -> dict:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    with _retried_lock:
+        retried = dict(_retried)
+    return {
+        "retries_throttled_total": retried[THROTTLED],
+        "retries_expired_total": retried[EXPIRED],
+        "retries_transient_total": retried[TRANSIENT],
+        "circuit_open_hosts": sum(1 for b in breakers if b.remaining() > 0),
+        "circuit_trips_total": sum(b.trips for b in breakers),
+    }
+
+
+get_recorder().add_collector(_collect)
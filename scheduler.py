@@ -0,0 +1,214 @@
+"""
+Agendador da fila de downloads: pool fixo de workers, limites separados para
+conexões de rede e mesclagens FFmpeg, prioridades e pausa/retomada. Enquanto um host
+limita as requisições (disjuntor aberto, ver retry.py), nenhum job novo é iniciado.
+"""
+import heapq
+import itertools
+import os
+import threading
+
+import retry
+
+DEFAULT_WORKERS = 3
+DEFAULT_MAX_FETCHES = 3
+DEFAULT_MAX_MERGES = max(1, (os.cpu_count() or 2) // 2)
+
+QUEUED = "queued"
+HELD = "held"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job:
+    def __init__(self, job_id, fn, priority: int):
+        self.job_id = job_id
+        self.fn = fn
+        self.priority = priority
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self._entry = None
+
+    def __repr__(self):
+        return f"<Job {self.job_id!r} {self.state} prio={self.priority}>"
+
+
+class DownloadScheduler:
+    """
+    Executa jobs com um número fixo de threads, em ordem de prioridade.
+
+    Prioridades menores saem primeiro; empates seguem a ordem de envio. O job recebe
+    o próprio Job como argumento e deve usar fetch_slot/merge_slot em volta das fases
+    de rede e de FFmpeg para respeitar os limites de concorrência de cada uma.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        max_fetches: int = DEFAULT_MAX_FETCHES,
+        max_merges: int = DEFAULT_MAX_MERGES,
+    ):
+        self.fetch_slot = threading.BoundedSemaphore(max(1, max_fetches))
+        self.merge_slot = threading.BoundedSemaphore(max(1, max_merges))
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._paused = False
+        self._shutdown = False
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+
+    # --- fila ---
+
+    def _push(self, job: Job):
+        entry = [job.priority, next(self._seq), job]
+        job._entry = entry
+        heapq.heappush(self._heap, entry)
+
+    def _pop_runnable(self) -> Job | None:
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            job = entry[2]
+            # Entradas antigas (após reordenação) ou de jobs retidos/cancelados são descartadas
+            if job._entry is entry and job.state == QUEUED:
+                job._entry = None
+                return job
+        return None
+
+    def submit(self, job_id, fn, priority: int = 0, held: bool = False) -> Job:
+        """Enfileira o job; com held=True ele entra retido e só roda após release()."""
+        job = Job(job_id, fn, priority)
+        with self._cond:
+            self._jobs[job_id] = job
+            if held:
+                job.state = HELD
+            else:
+                self._push(job)
+                self._cond.notify()
+        return job
+
+    def get(self, job_id) -> Job | None:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def pending(self) -> list:
+        """IDs dos jobs na fila, na ordem em que serão executados."""
+        with self._cond:
+            queued = [j for j in self._jobs.values() if j.state in (QUEUED, HELD)]
+            return [j.job_id for j in sorted(queued, key=lambda j: (j.priority, j._entry[1] if j._entry else 0))]
+
+    def set_priority(self, job_id, priority: int):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in (QUEUED, HELD):
+                return
+            job.priority = priority
+            if job.state == QUEUED:
+                self._push(job)
+                self._cond.notify()
+
+    def move_to_front(self, job_id):
+        with self._cond:
+            queued = [j.priority for j in self._jobs.values() if j.state in (QUEUED, HELD)]
+        self.set_priority(job_id, min(queued, default=0) - 1)
+
+    def hold(self, job_id):
+        """Pausa um job ainda na fila: ele não será iniciado até release()."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None and job.state == QUEUED:
+                job.state = HELD
+                job._entry = None
+
+    def release(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None and job.state == HELD:
+                job.state = QUEUED
+                self._push(job)
+                self._cond.notify()
+
+    def cancel(self, job_id) -> bool:
+        """
+        Cancela o job. Retorna True se ele ainda não tinha começado; se já estiver
+        rodando, apenas sinaliza job.cancel_event.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.cancel_event.set()
+            if job.state in (QUEUED, HELD):
+                job.state = CANCELLED
+                job._entry = None
+                job.done_event.set()
+                del self._jobs[job_id]
+                return True
+            return False
+
+    # --- controle global ---
+
+    def pause(self):
+        """Impede o início de novos jobs; os que já estão rodando continuam."""
+        with self._cond:
+            self._paused = True
+
+    def resume(self):
+        with self._cond:
+            self._paused = False
+            self._cond.notify_all()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def throttled(self) -> float:
+        """Segundos até a fila voltar a iniciar jobs por causa de um host limitando (0 se não está)."""
+        return retry.throttle_pause()
+
+    def shutdown(self, wait: bool = False):
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    # --- workers ---
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._shutdown:
+                    if not self._paused:
+                        hold = retry.throttle_pause()
+                        if hold > 0:
+                            # Jobs novos só iriam esperar o disjuntor com o manifesto envelhecendo
+                            self._cond.wait(hold)
+                            continue
+                        job = self._pop_runnable()
+                        if job is not None:
+                            break
+                    self._cond.wait()
+                if job is None:
+                    return
+                job.state = RUNNING
+            try:
+                job.result = job.fn(job)
+                job.state = CANCELLED if job.cancel_event.is_set() else DONE
+            except Exception as e:
+                job.error = e
+                job.state = FAILED
+            finally:
+                with self._cond:
+                    self._jobs.pop(job.job_id, None)
+                job.done_event.set()
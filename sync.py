@@ -0,0 +1,207 @@
+"""
+Sincronização incremental de playlists e canais (--sync).
+
+Cada fonte tem uma marca d'água no SyncState (SQLite): os IDs já vistos na sua listagem,
+cada um pendente ou concluído. Canais e a playlist de uploads de um canal (list=UU...)
+listam do vídeo mais novo ao mais antigo, então a listagem para no primeiro ID conhecido e
+só as páginas com conteúdo novo são buscadas. Nas demais playlists a ordem é do dono e a
+listagem vai até o fim, mas só as entradas novas são resolvidas e baixadas. Entradas novas
+e as pendentes de execuções anteriores seguem pelo pipeline do lote (batch.BatchRunner) e,
+concluídas, deixam de ser pendentes; as que falham são tentadas de novo nas execuções
+seguintes, até MAX_ATTEMPTS.
+"""
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batch import DEFAULT_RESOLVERS, BatchRunner, print_summary
+from job_store import default_store_path
+from manifest_cache import extract_video_id, iter_collection
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+# Execuções em que uma entrada pode falhar antes de deixar de ser tentada (vídeo removido ou privado)
+MAX_ATTEMPTS = 3
+
+
+def newest_first(url: str) -> bool:
+    """Canais e a playlist de uploads de um canal (list=UU...) listam do vídeo mais novo ao mais antigo."""
+    if "/playlist" not in url:
+        return True
+    return "list=UU" in url
+
+
+class SyncState:
+    def __init__(self, path: str | None = None):
+        self.path = path or default_store_path("sync.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            # complete: a última listagem chegou ao fim ou a um ID já conhecido (não foi interrompida)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sources (
+                    url TEXT PRIMARY KEY,
+                    complete INTEGER NOT NULL DEFAULT 0,
+                    last_sync REAL,
+                    last_new INTEGER
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    source TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    first_seen REAL,
+                    done_at REAL,
+                    PRIMARY KEY (source, video_id)
+                )
+                """
+            )
+
+    def source(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT url, complete, last_sync, last_new FROM sources WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("url", "complete", "last_sync", "last_new"), row))
+
+    def is_known(self, source: str, video_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM entries WHERE source = ? AND video_id = ?", (source, video_id)).fetchone()
+        return row is not None
+
+    def add_pending(self, source: str, entries: list[tuple[str, str]]):
+        """Registra (ID do vídeo, URL) como pendentes; IDs já registrados não mudam de estado."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO entries (source, video_id, url, state, first_seen) VALUES (?, ?, ?, ?, ?)",
+                [(source, video_id, url, PENDING, now) for video_id, url in entries],
+            )
+
+    def mark_listed(self, source: str, complete: bool, new: int):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (url, complete, last_sync, last_new) VALUES (?, ?, ?, ?)",
+                (source, int(complete), time.time(), new),
+            )
+
+    def pending(self, source: str) -> list[tuple[str, str]]:
+        """(ID do vídeo, URL) ainda não concluídos da fonte, na ordem em que apareceram."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT video_id, url FROM entries WHERE source = ? AND state = ? ORDER BY first_seen, rowid",
+                (source, PENDING),
+            ).fetchall()
+
+    def mark_done(self, source: str, video_id: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE entries SET state = ?, done_at = ? WHERE source = ? AND video_id = ?", (DONE, time.time(), source, video_id)
+            )
+
+    def mark_failed(self, source: str, video_id: str, max_attempts: int = MAX_ATTEMPTS):
+        """Conta uma falha; depois de max_attempts a entrada sai das pendentes."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE entries SET attempts = attempts + 1, state = CASE WHEN attempts + 1 >= ? THEN ? ELSE state END "
+                "WHERE source = ? AND video_id = ?",
+                (max_attempts, FAILED, source, video_id),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def scan_source(state: SyncState, url: str) -> tuple[int, int]:
+    """
+    Lista a fonte e registra as entradas novas como pendentes; retorna (novas, lidas). Se a
+    listagem vem do mais novo ao mais antigo e a anterior foi completa, para no primeiro ID
+    conhecido: tudo o que vem depois já foi visto.
+    """
+    info = state.source(url)
+    stop_at_known = newest_first(url) and info is not None and bool(info["complete"])
+    new = []
+    seen = set()
+    read = 0
+    complete = False
+    try:
+        for video_url in iter_collection(url):
+            read += 1
+            video_id = extract_video_id(video_url)
+            if not video_id or video_id in seen:
+                continue
+            seen.add(video_id)
+            if state.is_known(url, video_id):
+                if stop_at_known:
+                    break
+                continue
+            new.append((video_id, video_url))
+        complete = True
+    finally:
+        # Uma listagem interrompida guarda o que leu, mas a próxima vai até o fim: as
+        # entradas mais antigas que faltaram ficariam atrás dos IDs agora conhecidos
+        state.add_pending(url, new)
+        state.mark_listed(url, complete, len(new))
+    return len(new), read
+
+
+def run_sync(urls: list[str], out_dir: str | None = None, state: SyncState | None = None, **kwargs) -> int:
+    """
+    Sincroniza as fontes: lista só o conteúdo novo de cada uma (em paralelo), baixa as
+    entradas novas e pendentes pelo pipeline do lote e retorna o código de saída.
+    kwargs vão para o BatchRunner.
+    """
+    out_dir = out_dir or os.getcwd()
+    state = state or SyncState()
+
+    def safe_scan(url):
+        try:
+            return scan_source(state, url), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, kwargs.get("resolvers", DEFAULT_RESOLVERS))) as pool:
+        scans = list(pool.map(safe_scan, urls))
+    failures = 0
+    for url, (counts, error) in zip(urls, scans):
+        if error is not None:
+            failures += 1
+            print(f"Não foi possível listar {url}: {error}")
+        else:
+            print(f"{url}: {counts[0]} vídeo(s) novo(s) ({counts[1]} entrada(s) lida(s))")
+
+    # Um vídeo presente em mais de uma fonte é baixado uma vez e concluído em todas
+    sources_of = {}
+    targets = []
+    for url in urls:
+        for video_id, video_url in state.pending(url):
+            if video_id not in sources_of:
+                sources_of[video_id] = []
+                targets.append(video_url)
+            sources_of[video_id].append(url)
+    if not targets:
+        print("Nada novo para baixar.")
+        return 1 if failures else 0
+
+    print(f"Baixando {len(targets)} vídeo(s)...")
+    jobs = BatchRunner(out_dir, **kwargs).run(targets)
+    for job in jobs:
+        video_id = extract_video_id(job.url)
+        for source in sources_of.get(video_id, ()):
+            if job.ok:
+                state.mark_done(source, video_id)
+            else:
+                state.mark_failed(source, video_id)
+    print_summary(jobs)
+    return 0 if all(j.ok for j in jobs) and not failures else 1
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Os módulos do projeto ficam na raiz do repositório, sem pacote; o servidor de testes, em tools/
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+
+@pytest.fixture(autouse=True)
+def fresh_retry():
+    """Cada teste começa com os parâmetros padrão de retry.py e sem disjuntores de outro teste."""
+    import retry
+
+    def reset():
+        retry.configure(retries=retry.DEFAULT_RETRIES, cooldown=retry.BREAKER_COOLDOWN, threshold=retry.BREAKER_THRESHOLD)
+
+    reset()
+    yield
+    reset()
+
+
+@pytest.fixture
+def serve():
+    """serve(payload, **opções de range_server.start_server) -> url; os servidores param no fim do teste."""
+    from range_server import start_server
+
+    servers = []
+
+    def start(payload, **kwargs):
+        server, url = start_server(payload, **kwargs)
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,108 @@
+"""Download segmentado (download_engine.py) contra o servidor local de tools/range_server.py."""
+import json
+import threading
+
+import pytest
+
+import download_engine
+import retry
+from adaptive import TransferController
+from download_engine import DownloadCancelled, download_segmented, has_partial, journal_path
+from range_server import Faults, synthetic_payload
+from transport import HTTPStatusError
+
+SIZE = 1 << 20
+CHUNK = 128 << 10
+
+
+def test_failed_range_does_not_cancel_caller(serve, tmp_path):
+    payload = synthetic_payload(SIZE)
+    faults = Faults([404])
+    url = serve(payload, rate=4 * SIZE, faults=faults)
+    cancel_event = threading.Event()
+    with pytest.raises(HTTPStatusError) as info:
+        download_segmented(url, SIZE, str(tmp_path / "x"), cancel_event=cancel_event, controller=TransferController(4, CHUNK))
+    assert info.value.status == 404
+    # A falha para as outras faixas por um evento interno: o do job continua limpo
+    assert not cancel_event.is_set()
+    assert faults.injected == 1
+
+
+def test_caller_cancel_stops_all_ranges(serve, tmp_path):
+    url = serve(synthetic_payload(SIZE), rate=SIZE // 8)
+    cancel_event = threading.Event()
+    threading.Timer(0.3, cancel_event.set).start()
+    with pytest.raises(DownloadCancelled):
+        download_segmented(url, SIZE, str(tmp_path / "x"), cancel_event=cancel_event, controller=TransferController(4, CHUNK))
+    assert not (tmp_path / "x").exists()
+
+
+@pytest.fixture
+def requested(monkeypatch):
+    """Faixas (início, fim) pedidas ao servidor, na ordem."""
+    ranges = []
+    iter_range = download_engine._iter_range
+
+    def recording(url, start, end, *args, **kwargs):
+        ranges.append((start, end))
+        return iter_range(url, start, end, *args, **kwargs)
+
+    monkeypatch.setattr(download_engine, "_iter_range", recording)
+    return ranges
+
+
+def test_resume_from_journal_after_dropped_range(serve, tmp_path, requested):
+    payload = synthetic_payload(SIZE)
+    faults = Faults()
+    url = serve(payload, faults=faults)
+    dest = str(tmp_path / "x")
+    # Sem repetições, a queda no meio da quinta faixa derruba o download
+    retry.configure(retries=0)
+
+    def progress(chunk, remaining):
+        if remaining == SIZE - 4 * CHUNK:
+            faults.drop(1, after=CHUNK // 2)
+
+    with pytest.raises(retry.TruncatedResponse):
+        download_segmented(url, SIZE, dest, on_progress=progress, resume_key="itag", controller=TransferController(1, CHUNK))
+    assert faults.dropped == 1 and has_partial(dest)
+    with open(journal_path(dest), encoding="utf-8") as fh:
+        done = {int(start) for start in json.load(fh)["done"]}
+    assert done == {i * CHUNK for i in range(4)}
+
+    requested.clear()
+    download_segmented(url, SIZE, dest, resume_key="itag", controller=TransferController(1, CHUNK))
+    with open(dest, "rb") as fh:
+        assert fh.read() == payload
+    assert not has_partial(dest)
+    # Só o que faltava foi pedido: a faixa derrubada inteira e as seguintes
+    assert requested[0][0] == 4 * CHUNK
+    assert all(start >= 4 * CHUNK for start, _ in requested)
+
+
+def test_resume_skips_verified_ranges_and_refetches_corrupted(serve, tmp_path, requested):
+    payload = synthetic_payload(SIZE)
+    url = serve(payload)
+    dest = str(tmp_path / "x")
+    cancel_event = threading.Event()
+
+    def progress(chunk, remaining):
+        if remaining == SIZE - 4 * CHUNK:
+            cancel_event.set()
+
+    with pytest.raises(DownloadCancelled):
+        download_segmented(url, SIZE, dest, on_progress=progress, cancel_event=cancel_event, resume_key="itag", controller=TransferController(1, CHUNK))
+    assert has_partial(dest)
+    # Um byte trocado na segunda faixa: o CRC32 dela deixa de conferir com o do diário
+    with open(dest + ".part", "r+b") as fh:
+        fh.seek(CHUNK + 10)
+        fh.write(bytes([payload[CHUNK + 10] ^ 0xFF]))
+
+    requested.clear()
+    download_segmented(url, SIZE, dest, resume_key="itag", controller=TransferController(1, CHUNK))
+    with open(dest, "rb") as fh:
+        assert fh.read() == payload
+    starts = {start for start, _ in requested}
+    assert CHUNK in starts
+    assert not starts & {0, 2 * CHUNK, 3 * CHUNK}
+    assert min(starts - {CHUNK}) == 4 * CHUNK
@@ -0,0 +1,173 @@
+"""Seleção de formatos (formats.py) sobre listas de streams sintéticas."""
+from types import SimpleNamespace
+
+import pytest
+
+from formats import FormatSelectorError, StreamIndex, parse_selector, resolution_selector
+
+
+def video(itag, height, fps=30, mime="video/mp4", codec="avc1.640028", bitrate=None):
+    return SimpleNamespace(
+        itag=itag,
+        mime_type=mime,
+        resolution=f"{height}p",
+        fps=fps,
+        abr=None,
+        bitrate=bitrate or height * 1000,
+        codecs=[codec],
+        is_progressive=False,
+        includes_video_track=True,
+        includes_audio_track=False,
+    )
+
+
+def audio(itag, kbps, mime="audio/mp4", codec="mp4a.40.2"):
+    return SimpleNamespace(
+        itag=itag,
+        mime_type=mime,
+        resolution=None,
+        fps=None,
+        abr=f"{kbps}kbps",
+        bitrate=kbps * 1000,
+        codecs=[codec],
+        is_progressive=False,
+        includes_video_track=False,
+        includes_audio_track=True,
+    )
+
+
+def progressive(itag, height, mime="video/mp4"):
+    return SimpleNamespace(
+        itag=itag,
+        mime_type=mime,
+        resolution=f"{height}p",
+        fps=30,
+        abr="96kbps",
+        bitrate=height * 1000,
+        codecs=["avc1.42001E", "mp4a.40.2"],
+        is_progressive=True,
+        includes_video_track=True,
+        includes_audio_track=True,
+    )
+
+
+STREAMS = [
+    video(137, 1080, 30),
+    video(299, 1080, 60, bitrate=2_000_000),
+    video(248, 1080, 30, mime="video/webm", codec="vp9"),
+    video(136, 720, 30),
+    video(313, 2160, 30, mime="video/webm", codec="vp9"),
+    audio(140, 128),
+    audio(251, 160, mime="audio/webm", codec="opus"),
+    audio(139, 48),
+    progressive(18, 360),
+]
+
+
+@pytest.fixture
+def index():
+    return StreamIndex(STREAMS)
+
+
+def itags(plan):
+    kind, first, second = plan
+    return kind, first.itag, second.itag if second is not None else None
+
+
+def test_best_and_worst_atoms(index):
+    assert itags(index.select("bestvideo")) == ("video", 313, None)
+    assert itags(index.select("worstvideo")) == ("video", 136, None)
+    assert itags(index.select("bestaudio")) == ("audio", 251, None)
+    assert itags(index.select("wa")) == ("audio", 139, None)
+    assert itags(index.select("best")) == ("progressive", 18, None)
+
+
+def test_video_audio_pair(index):
+    assert itags(index.select("bestvideo+bestaudio")) == ("adaptive", 313, 251)
+    assert itags(index.select("bv+ba")) == ("adaptive", 313, 251)
+
+
+def test_alternatives_are_tried_in_order(index):
+    # Nenhum vídeo em 4320p: cai na segunda alternativa
+    assert itags(index.select("bestvideo[height=4320]+bestaudio/bestvideo[height=720]+bestaudio")) == ("adaptive", 136, 251)
+    assert itags(index.select("bestvideo[height=4320]/best")) == ("progressive", 18, None)
+    assert index.select("bestvideo[height=4320]/bestaudio[abr>500]") is None
+
+
+def test_bare_itags(index):
+    assert itags(index.select("137+140")) == ("adaptive", 137, 140)
+    assert itags(index.select("140")) == ("audio", 140, None)
+    assert index.select("999+140") is None
+    # O filtro também vale para termos por itag
+    assert index.select("137[height<=720]+140") is None
+
+
+def test_ext_filters(index):
+    assert itags(index.select("bestaudio[ext=m4a]")) == ("audio", 140, None)
+    # [ext=mp4] também casa com áudio em MP4
+    assert itags(index.select("bestaudio[ext=mp4]")) == ("audio", 140, None)
+    assert itags(index.select("bestvideo[ext=mp4]+bestaudio[ext=m4a]")) == ("adaptive", 299, 140)
+    assert itags(index.select("bestvideo[ext!=mp4]")) == ("video", 313, None)
+
+
+def test_numeric_filters(index):
+    assert itags(index.select("bestvideo[height<=1080][fps<=30]")) == ("video", 137, None)
+    assert itags(index.select("bestvideo[height<=1080][fps>30]")) == ("video", 299, None)
+    assert itags(index.select("bestvideo[height<1080]")) == ("video", 136, None)
+    assert itags(index.select("bestaudio[abr<=128]")) == ("audio", 140, None)
+
+
+def test_codec_filters(index):
+    assert itags(index.select("bestvideo[vcodec=vp9][height<=1080]")) == ("video", 248, None)
+    assert itags(index.select("bestvideo[vcodec^=avc1]")) == ("video", 299, None)
+    assert itags(index.select("bestaudio[acodec=opus]")) == ("audio", 251, None)
+
+
+def test_optional_filter_accepts_missing_field(index):
+    # Áudio não tem fps: sem "?" o filtro recusa, com "?" aceita
+    assert index.select("bestaudio[fps<=30]") is None
+    assert itags(index.select("bestaudio[fps<=?30]")) == ("audio", 251, None)
+
+
+def test_resolution_selector(index):
+    assert resolution_selector() == "best[ext=mp4]/bestvideo+bestaudio"
+    assert resolution_selector("Automático") == resolution_selector()
+    assert resolution_selector("720p") == "bestvideo[height=720]+bestaudio/best[ext=mp4]/bestvideo+bestaudio"
+    assert itags(index.select(resolution_selector("720p"))) == ("adaptive", 136, 251)
+    # Resolução inexistente: melhor progressivo MP4
+    assert itags(index.select(resolution_selector("1440p"))) == ("progressive", 18, None)
+    assert itags(index.select(resolution_selector())) == ("progressive", 18, None)
+
+
+def test_resolution_selector_without_progressive():
+    index = StreamIndex([s for s in STREAMS if not s.is_progressive])
+    assert itags(index.select(resolution_selector())) == ("adaptive", 313, 251)
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        "",
+        "   ",
+        "bestvídeo",
+        "melhor",
+        "bestvideo+bestaudio+bestaudio",
+        "bestaudio+bestvideo",
+        "best+bestaudio",
+        "bestvideo[height<=abc]",
+        "bestvideo[height^=1]",
+        "bestaudio[ext<m4a]",
+        "bestvideo[cor=azul]",
+        "bestvideo[height<=1080",
+        "bestvideo x[height<=1080]",
+    ],
+)
+def test_invalid_selectors(spec):
+    with pytest.raises(FormatSelectorError):
+        parse_selector(spec)
+
+
+def test_selector_error_is_value_error():
+    # Chamadores que já tratam ValueError (CLI, daemon) recebem os erros de formato
+    with pytest.raises(ValueError):
+        StreamIndex(STREAMS).select("bestvideo[cor=azul]")
@@ -0,0 +1,127 @@
+"""Classificação de falhas, backoff e disjuntores (retry.py)."""
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+
+import pytest
+
+import retry
+from download_engine import _read_range
+from range_server import Faults, synthetic_payload
+
+SIZE = 1 << 20
+CHUNK = 128 << 10
+
+
+@pytest.mark.parametrize(
+    "exc, kind",
+    [
+        (ssl.SSLCertVerificationError(1, "certificate verify failed"), retry.FATAL),
+        (urllib.error.URLError(ssl.SSLCertVerificationError(1, "certificate verify failed")), retry.FATAL),
+        (ssl.SSLError(1, "wrong version number"), retry.FATAL),
+        (ssl.SSLEOFError(8, "EOF occurred in violation of protocol"), retry.TRANSIENT),
+        (urllib.error.URLError(ssl.SSLEOFError(8, "EOF occurred in violation of protocol")), retry.TRANSIENT),
+        (urllib.error.URLError(ConnectionRefusedError(111, "Connection refused")), retry.TRANSIENT),
+        (urllib.error.URLError(socket.gaierror(-3, "Temporary failure in name resolution")), retry.TRANSIENT),
+        (urllib.error.URLError("unknown url type: htp"), retry.FATAL),
+    ],
+)
+def test_classify_urllib_and_tls(exc, kind):
+    assert retry.classify(exc) == kind
+
+
+def _failure(url):
+    """Exceção levantada ao pedir a primeira faixa de url (None se a resposta veio inteira)."""
+    try:
+        _read_range(url, 0, CHUNK - 1, {})
+    except Exception as e:
+        return e
+    return None
+
+
+@pytest.mark.parametrize("status, kind", [(403, retry.THROTTLED), (429, retry.THROTTLED), (410, retry.EXPIRED), (500, retry.TRANSIENT), (503, retry.THROTTLED), (404, retry.FATAL)])
+def test_classify_server_status(serve, status, kind):
+    url = serve(synthetic_payload(SIZE), faults=Faults([status]))
+    exc = _failure(url)
+    assert retry.status_of(exc) == status
+    assert retry.classify(exc) == kind
+
+
+def test_classify_403_of_expired_url(serve):
+    faults = Faults(check_expire=True)
+    url = serve(synthetic_payload(SIZE), faults=faults)
+    exc = _failure(f"{url}?expire={int(time.time()) - 60}")
+    assert retry.status_of(exc) == 403 and faults.expired == 1
+    assert retry.classify(exc) == retry.EXPIRED
+    # Ainda válida, a mesma URL é atendida
+    assert _failure(f"{url}?expire={int(time.time()) + 3600}") is None
+
+
+def test_classify_truncated_body(serve):
+    faults = Faults(drop_after=CHUNK // 4, drops=1)
+    url = serve(synthetic_payload(SIZE), faults=faults)
+    exc = _failure(url)
+    assert faults.dropped == 1
+    assert retry.classify(exc) == retry.TRANSIENT
+
+
+@pytest.mark.parametrize("attempt", range(10))
+def test_backoff_bounds(attempt):
+    delay = min(10.0, 0.5 * 2 ** attempt)
+    waits = [retry.backoff(attempt, base=0.5, cap=10.0) for _ in range(200)]
+    assert all(delay / 2 <= w <= delay for w in waits)
+    # Com jitter, falhas simultâneas não esperam todas o mesmo tempo
+    assert len(set(waits)) > 1
+
+
+def test_breaker_opens_after_threshold():
+    breaker = retry.CircuitBreaker("host", threshold=2, window=10.0, cooldown=0.2)
+    breaker.record(retry.THROTTLED)
+    assert breaker.state == breaker.CLOSED
+    breaker.record(retry.TRANSIENT)
+    assert breaker.state == breaker.CLOSED
+    breaker.record(retry.THROTTLED)
+    assert breaker.state == breaker.OPEN and breaker.trips == 1
+    assert 0 < breaker.remaining() <= 0.2 * 1.1
+    # Aberto, segura as requisições até o cancelamento
+    cancel_event = threading.Event()
+    cancel_event.set()
+    assert breaker.acquire(cancel_event) is None
+
+
+def test_breaker_half_open_probe():
+    breaker = retry.CircuitBreaker("host", threshold=1, window=10.0, cooldown=0.1)
+    breaker.record(retry.THROTTLED)
+    t0 = time.monotonic()
+    assert breaker.acquire() is True
+    assert time.monotonic() - t0 >= 0.09
+    assert breaker.state == breaker.HALF_OPEN
+    # Com o teste em curso, as outras requisições esperam o resultado dele
+    waiter = {}
+    thread = threading.Thread(target=lambda: waiter.setdefault("probe", breaker.acquire()))
+    thread.start()
+    thread.join(0.3)
+    assert thread.is_alive()
+    # Recusado: reabre com o cooldown dobrado
+    breaker.record(retry.THROTTLED, probe=True)
+    assert breaker.state == breaker.OPEN and breaker.trips == 2
+    assert breaker.remaining() > 0.15
+    thread.join(2)
+    assert waiter["probe"] is True
+    breaker.record(None, probe=True)
+    assert breaker.state == breaker.CLOSED
+    assert breaker.acquire() is False
+
+
+def test_call_trips_and_recovers_breaker(serve):
+    retry.configure(threshold=2, cooldown=0.1)
+    faults = Faults([429, 429, 429], retry_after=0)
+    url = serve(synthetic_payload(SIZE), faults=faults)
+    assert len(retry.call(lambda: _read_range(url, 0, CHUNK - 1, {}), url)) == CHUNK
+    assert faults.injected == 3
+    breaker = retry.get_breaker(url)
+    # Dois 429 abrem o circuito, a requisição de teste recebe o terceiro e ele reabre
+    assert breaker.trips == 2
+    assert breaker.state == breaker.CLOSED
@@ -0,0 +1,73 @@
+"""
+Benchmark do ajuste automático de conexões e tamanho de faixa (adaptive.py).
+
+Cada perfil configura o range_server local como um tipo de host e compara o download com
+valores fixos (--segments / --segment-size) contra o AdaptiveController partindo deles,
+mostrando as conexões e o tamanho de faixa a que o controlador chegou:
+
+  saturado     banda total limitada: poucas conexões já enchem o link
+  estrangulado cada resposta cai para uma banda baixa depois de um pico inicial
+  limitado     acima de algumas respostas simultâneas o servidor devolve 429
+
+Uso: python tools/bench_adaptive.py --size 33554432 --profiles saturado estrangulado limitado
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adaptive import AdaptiveController, TransferController  # noqa: E402
+from download_engine import download_segmented  # noqa: E402
+from range_server import start_server, synthetic_payload  # noqa: E402
+
+MIB = 1024 * 1024
+
+PROFILES = {
+    "saturado": {"rate": 6 * MIB, "total_rate": 8 * MIB, "latency": 0.02},
+    "estrangulado": {"rate": 0, "throttle_after": 256 * 1024, "throttle_rate": 512 * 1024, "latency": 0.02},
+    "limitado": {"rate": 2 * MIB, "max_active": 4, "latency": 0.02},
+}
+
+
+def run(url: str, payload: bytes, controller) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        dest = os.path.join(tmp, "out.bin")
+        t0 = time.perf_counter()
+        download_segmented(url, len(payload), dest, controller=controller)
+        elapsed = time.perf_counter() - t0
+        with open(dest, "rb") as fh:
+            if fh.read() != payload:
+                raise RuntimeError("Conteúdo baixado difere do original")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do ajuste automático de conexões")
+    parser.add_argument("--size", type=int, default=32 * MIB)
+    parser.add_argument("--profiles", nargs="+", choices=sorted(PROFILES), default=list(PROFILES))
+    parser.add_argument("--segments", type=int, default=4, help="Conexões fixas e ponto de partida do ajuste")
+    parser.add_argument("--segment-size", type=int, default=8 * MIB, help="Faixa fixa e ponto de partida do ajuste")
+    parser.add_argument("--max-connections", type=int, default=16)
+    args = parser.parse_args()
+
+    payload = synthetic_payload(args.size)
+    for name in args.profiles:
+        server, url = start_server(payload, **PROFILES[name])
+        try:
+            for mode in ("fixo", "adaptativo"):
+                if mode == "fixo":
+                    controller = TransferController(args.segments, args.segment_size)
+                else:
+                    controller = AdaptiveController(args.segments, args.segment_size, max_connections=args.max_connections)
+                elapsed = run(url, payload, controller)
+                s = controller.summary()
+                print(
+                    f"{name:<13} {mode:<11} {elapsed:7.2f}s {args.size / elapsed / MIB:7.2f} MiB/s  "
+                    f"conexões={s['connections']:<2} (pico {s['peak_connections']:<2}) "
+                    f"faixa={s['chunk_size'] / MIB:5.2f} MiB  throttling={s['throttles']}"
+                )
+        finally:
+            server.shutdown()
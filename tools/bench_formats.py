@@ -0,0 +1,93 @@
+"""
+Microbenchmarks da seleção de streams sobre listas sintéticas: as cadeias
+filter/order_by/desc usadas antes contra o StreamIndex e as expressões de formato.
+
+Uso: python tools/bench_formats.py --streams 20 80 300 --number 2000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formats import StreamIndex, parse_selector, resolution_selector  # noqa: E402
+from manifest_cache import CachedStream, CachedStreamQuery  # noqa: E402
+
+HEIGHTS = [144, 240, 360, 480, 720, 1080, 1440, 2160]
+SELECTORS = [
+    resolution_selector(),
+    resolution_selector("1080p"),
+    "bestvideo[height<=1080][fps<=30]+bestaudio[ext=m4a]/best",
+    "bestvideo[vcodec=vp9][height>=720]+bestaudio[acodec=opus]/bestvideo+bestaudio",
+]
+
+
+def synthetic_streams(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    streams = []
+    for i in range(n):
+        kind = rng.choice(("video", "video", "audio", "progressive"))
+        container = rng.choice(("mp4", "webm"))
+        height = rng.choice(HEIGHTS)
+        if kind == "audio":
+            codecs = ["mp4a.40.2"] if container == "mp4" else ["opus"]
+            streams.append(CachedStream(dict(
+                itag=1000 + i, mime_type=f"audio/{container}", codecs=codecs, resolution=None, fps=None,
+                abr=f"{rng.choice((48, 64, 128, 160))}kbps", bitrate=rng.randrange(10**5, 10**6), filesize=1,
+                is_progressive=False, is_adaptive=True, includes_video_track=False, includes_audio_track=True,
+            )))
+            continue
+        vcodec = "avc1.640028" if container == "mp4" else "vp9"
+        progressive = kind == "progressive"
+        streams.append(CachedStream(dict(
+            itag=1000 + i, mime_type=f"video/{container}", codecs=[vcodec, "mp4a.40.2"] if progressive else [vcodec],
+            resolution=f"{height}p", fps=rng.choice((24, 30, 60)), abr="96kbps" if progressive else None,
+            bitrate=rng.randrange(10**6, 10**7), filesize=1, is_progressive=progressive, is_adaptive=not progressive,
+            includes_video_track=True, includes_audio_track=progressive,
+        )))
+    return streams
+
+
+def legacy_pick(query: CachedStreamQuery, resolucao: str | None):
+    """Seleção antiga de select_streams: várias cadeias filter/order_by por chamada."""
+    audio = query.filter(only_audio=True).order_by("abr").desc().first()
+    if resolucao:
+        for s in query.filter(only_video=True).order_by("resolution").desc():
+            if s.resolution == resolucao:
+                if audio:
+                    return ("adaptive", s, audio)
+                break
+    prog = query.filter(progressive=True, file_extension="mp4").order_by("resolution").desc().first()
+    if prog:
+        return ("progressive", prog, None)
+    video = query.filter(only_video=True).order_by("resolution").desc().first()
+    return ("adaptive", video, audio) if video and audio else None
+
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks do índice de streams e das expressões de formato")
+    parser.add_argument("--streams", type=int, nargs="+", default=[20, 80, 300])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"parse (com cache)            {per_call_us(lambda: parse_selector(SELECTORS[2]), args.number):9.2f} µs")
+    print(f"parse (sem cache)            {per_call_us(lambda: parse_selector.__wrapped__(SELECTORS[2]), args.number):9.2f} µs")
+    for n in args.streams:
+        streams = synthetic_streams(n)
+        query = CachedStreamQuery(streams)
+        index = StreamIndex(streams)
+        print(f"\n--- {n} streams ---")
+        print(f"construção do índice         {per_call_us(lambda: StreamIndex(streams), max(1, args.number // 10)):9.2f} µs")
+        for res in (None, "1080p"):
+            label = res or "auto"
+            print(f"antigo filter/order_by {label:<5} {per_call_us(lambda: legacy_pick(query, res), args.number):9.2f} µs")
+            print(f"índice select {label:<14} {per_call_us(lambda: index.select(resolution_selector(res)), args.number):9.2f} µs")
+        print(f"índice video_at              {per_call_us(lambda: index.video_at('1080p'), args.number):9.2f} µs")
+        for spec in SELECTORS[2:]:
+            print(f"select {spec[:48]:<48} {per_call_us(lambda: index.select(spec), args.number):9.2f} µs")
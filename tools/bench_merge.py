@@ -0,0 +1,110 @@
+"""
+Benchmark da mesclagem FFmpeg: recodificação de áudio para AAC (comportamento antigo)
+contra a cópia pura escolhida por choose_container, medindo tempo real e tempo de CPU.
+
+Sem --video/--audio, gera amostras locais com o próprio FFmpeg (H.264+AAC em MP4 e,
+se os codificadores existirem, VP9+Opus em WebM).
+
+Uso: python tools/bench_merge.py --duration 120 --repeat 3
+     python tools/bench_merge.py --video v.mp4 --audio a.m4a
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media import MP4_AAC_ARGS, _resolve_ffmpeg, ffmpeg_merge, merge_plan  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows: só o tempo real é medido
+    resource = None
+
+# (rótulo, extensão, argumentos de vídeo, extensão, argumentos de áudio)
+SAMPLES = [
+    ("h264+aac", "mp4", ["-c:v", "libx264", "-preset", "ultrafast"], "m4a", ["-c:a", "aac", "-b:a", "128k"]),
+    ("vp9+opus", "webm", ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8"], "webm", ["-c:a", "libopus", "-b:a", "128k"]),
+]
+
+
+def _children_cpu() -> float:
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def local_stream(path: str, kind: str):
+    """Objeto com mime_type suficiente para stream_codecs deduzir o codec pela extensão."""
+    ext = os.path.splitext(path)[1].lstrip(".").lower()
+    subtype = "mp4" if ext in ("mp4", "m4a") else ext
+    return SimpleNamespace(
+        mime_type=f"{kind}/{subtype}",
+        includes_video_track=kind == "video",
+        includes_audio_track=kind == "audio",
+    )
+
+
+def make_samples(ffmpeg_bin: str, tmp: str, duration: int) -> list[tuple[str, str, str]]:
+    samples = []
+    for label, vext, vargs, aext, aargs in SAMPLES:
+        video = os.path.join(tmp, f"{label}_video.{vext}")
+        audio = os.path.join(tmp, f"{label}_audio.{aext}")
+        try:
+            subprocess.run(
+                [ffmpeg_bin, "-y", "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={duration}", "-an", *vargs, video],
+                check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                [ffmpeg_bin, "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}", "-vn", *aargs, audio],
+                check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+        except subprocess.CalledProcessError:
+            print(f"Amostra {label} ignorada (codificador indisponível neste FFmpeg)")
+            continue
+        samples.append((label, video, audio))
+    return samples
+
+
+def measure(video: str, audio: str, output: str, codec_args: list[str], repeat: int) -> tuple[float, float]:
+    walls, cpus = [], []
+    for _ in range(repeat):
+        cpu0 = _children_cpu()
+        t0 = time.perf_counter()
+        ffmpeg_merge(video, audio, output, codec_args=codec_args)
+        walls.append(time.perf_counter() - t0)
+        cpus.append(_children_cpu() - cpu0)
+        os.remove(output)
+    return statistics.median(walls), statistics.median(cpus)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da mesclagem: recodificação AAC x cópia pura")
+    parser.add_argument("--video", help="Arquivo de vídeo local (sem áudio)")
+    parser.add_argument("--audio", help="Arquivo de áudio local")
+    parser.add_argument("--duration", type=int, default=60, help="Duração das amostras geradas, em segundos")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ffmpeg_bin = _resolve_ffmpeg()
+    if not ffmpeg_bin:
+        sys.exit("FFmpeg não encontrado.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.video and args.audio:
+            samples = [("local", args.video, args.audio)]
+        else:
+            samples = make_samples(ffmpeg_bin, tmp, args.duration)
+        for label, video, audio in samples:
+            ext, copy_args = merge_plan(local_stream(video, "video"), local_stream(audio, "audio"))
+            modes = [("recodifica AAC", "mp4", MP4_AAC_ARGS), (f"cópia -> {ext}", ext, copy_args)]
+            for name, out_ext, codec_args in modes:
+                wall, cpu = measure(video, audio, os.path.join(tmp, f"out.{out_ext}"), codec_args, args.repeat)
+                cpu_text = f"{cpu:7.2f}s" if resource is not None else "    n/d"
+                print(f"{label:<10} {name:<16} tempo={wall:7.2f}s  cpu={cpu_text}")
@@ -0,0 +1,128 @@
+"""
+Benchmark da fila da interface: custo por inclusão e por atualização de progresso em
+filas de tamanhos diferentes, comparando o QueueView (Treeview) com a reconstrução
+completa de linhas de widgets usada antes.
+
+Requer um display (no Linux sem interface, use xvfb-run).
+
+Uso: python tools/bench_queue_view.py --sizes 100 1000 5000 10000 --legacy-max 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queue_view import QueueView  # noqa: E402
+
+
+def make_item(i: int):
+    return SimpleNamespace(id=i, title=f"Vídeo de teste {i}", res="1080p", out_dir="/tmp/videos", progress=0.0, speed_text="", status="Na fila")
+
+
+class LegacyRows:
+    """Reprodução do _render_queue antigo: destrói e recria todas as linhas a cada mudança."""
+
+    def __init__(self, parent):
+        self.frame = ttk.Frame(parent)
+        self.frame.pack(fill="both", expand=True)
+        self.items = []
+        self.rows = []
+
+    def render(self):
+        for widgets in self.rows:
+            widgets[0].destroy()
+        self.rows = []
+        for item in self.items:
+            row = ttk.Frame(self.frame)
+            row.pack(fill="x", pady=2)
+            ttk.Label(row, text=item.title, width=35).grid(row=0, column=0)
+            ttk.Label(row, text=item.res, width=12).grid(row=0, column=1)
+            ttk.Label(row, text=item.out_dir, width=25).grid(row=0, column=2)
+            bar = ttk.Progressbar(row, length=120, mode="determinate")
+            bar.grid(row=0, column=3)
+            ttk.Button(row, text="Abrir local").grid(row=0, column=4)
+            ttk.Button(row, text="Cancelar").grid(row=0, column=5)
+            self.rows.append((row, bar))
+
+    def add(self, item):
+        self.items.append(item)
+        self.render()
+
+    def update(self, index: int, progress: float):
+        self.rows[index][1]["value"] = progress
+
+
+def bench_view(root, size: int, adds: int, updates: int) -> tuple[float, float]:
+    container = ttk.Frame(root)
+    container.pack(fill="both", expand=True)
+    view = QueueView(container, height=20)
+    view.pack(fill="both", expand=True)
+    for i in range(size):
+        view.add(make_item(i))
+    root.update()
+
+    t0 = time.perf_counter()
+    for i in range(size, size + adds):
+        view.add(make_item(i))
+    root.update()
+    per_add = (time.perf_counter() - t0) / adds
+
+    ids = [random.randrange(size) for _ in range(updates)]
+    t0 = time.perf_counter()
+    for n, item_id in enumerate(ids):
+        view.update(item_id, progress=n % 100, speed=f"{n % 50} MiB/s")
+    root.update()
+    per_update = (time.perf_counter() - t0) / updates
+    container.destroy()
+    return per_add, per_update
+
+
+def bench_legacy(root, size: int, adds: int, updates: int) -> tuple[float, float]:
+    container = ttk.Frame(root)
+    container.pack(fill="both", expand=True)
+    rows = LegacyRows(container)
+    rows.items = [make_item(i) for i in range(size)]
+    rows.render()
+    root.update()
+
+    t0 = time.perf_counter()
+    for i in range(size, size + adds):
+        rows.add(make_item(i))
+    root.update()
+    per_add = (time.perf_counter() - t0) / adds
+
+    indexes = [random.randrange(size) for _ in range(updates)]
+    t0 = time.perf_counter()
+    for n, index in enumerate(indexes):
+        rows.update(index, n % 100)
+    root.update()
+    per_update = (time.perf_counter() - t0) / updates
+    container.destroy()
+    return per_add, per_update
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da fila da interface")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 10000])
+    parser.add_argument("--adds", type=int, default=20, help="Inclusões medidas por tamanho")
+    parser.add_argument("--updates", type=int, default=2000, help="Atualizações de progresso medidas por tamanho")
+    parser.add_argument("--legacy-max", type=int, default=500, help="Maior fila medida no modo antigo (0 desativa)")
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    root.geometry("900x600")
+    try:
+        for size in args.sizes:
+            per_add, per_update = bench_view(root, size, args.adds, args.updates)
+            print(f"treeview  itens={size:<6} inclusão={per_add * 1000:8.3f} ms  atualização={per_update * 1e6:8.1f} µs")
+            if size <= args.legacy_max:
+                per_add, per_update = bench_legacy(root, size, args.adds, args.updates)
+                print(f"antigo    itens={size:<6} inclusão={per_add * 1000:8.3f} ms  atualização={per_update * 1e6:8.1f} µs")
+    finally:
+        root.destroy()
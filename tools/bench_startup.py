@@ -0,0 +1,168 @@
+"""
+Benchmark de inicialização: quanto tempo o usuário espera até ver algo.
+
+  help_cli      python YouTubeDonwloader.py --help, até o processo terminar
+  help_daemon   python daemon.py --help, até o processo terminar
+  first_frame   gui_app.open_window(), até a janela estar desenhada (exige display)
+
+Cada medida roda --repeat vezes em processos novos (com o interpretador, como no uso real)
+e reporta mediana e mínimo. Além do tempo, roda cada ponto de entrada com -X importtime e
+lista os módulos mais caros e os que deveriam ficar para depois (DEFERRED): se algum deles
+aparecer na inicialização, um import no topo de módulo desfez o carregamento preguiçoso.
+O resultado é gravado em JSON; --compare mostra a variação contra uma execução anterior.
+
+Uso: python tools/bench_startup.py --output startup.json
+     python tools/bench_startup.py --repeat 20 --compare startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos carregados só no primeiro uso (ou em segundo plano, na interface); o daemon é
+# ele mesmo um servidor HTTP
+DEFERRED = {
+    "help_cli": ("pytubefix", "http.server", "urllib.request"),
+    "help_daemon": ("pytubefix", "urllib.request"),
+    "first_frame": ("pytubefix", "http.server", "urllib.request"),
+}
+
+# Programa do filho que mede o primeiro quadro: imprime uma linha quando a janela está desenhada
+_FIRST_FRAME = """
+import sys
+sys.path.insert(0, {root!r})
+from gui_app import open_window
+root, _ = open_window()
+print("frame", flush=True)
+root.destroy()
+"""
+
+TARGETS = {
+    "help_cli": [os.path.join(ROOT, "YouTubeDonwloader.py"), "--help"],
+    "help_daemon": [os.path.join(ROOT, "daemon.py"), "--help"],
+    "first_frame": ["-c", _FIRST_FRAME.format(root=ROOT)],
+}
+# Módulo de cada alvo para o perfil de imports
+MODULES = {"help_cli": "YouTubeDonwloader", "help_daemon": "daemon", "first_frame": "gui_app"}
+
+
+def _env(data_dir: str) -> dict:
+    # Fila, arquivo de downloads e caches numa pasta própria: a do usuário fica intocada
+    return dict(os.environ, XDG_CACHE_HOME=data_dir, XDG_DATA_HOME=data_dir, LOCALAPPDATA=data_dir)
+
+
+def time_once(argv: list[str], env: dict) -> float:
+    """Segundos do início do processo até a primeira linha "frame" (ou até o fim, se não houver)."""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, *argv], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=ROOT, env=env)
+    elapsed = None
+    for line in proc.stdout:
+        if line.strip() == "frame":
+            elapsed = time.perf_counter() - t0
+    _, err = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError((err.strip().splitlines() or ["falha sem saída"])[-1])
+    return elapsed if elapsed is not None else time.perf_counter() - t0
+
+
+def import_profile(module: str, deferred: tuple, env: dict, top: int) -> dict:
+    """Tempo de import de module (-X importtime), os módulos com mais tempo próprio e os de deferred carregados."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, cwd=ROOT, env=env
+    )
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            entries.append((name, int(self_us), int(cumulative_us)))
+    total = next((cum for name, _, cum in entries if name == module), None)
+    loaded = {name for name, _, _ in entries}
+    return {
+        "import_s": round(total / 1e6, 4) if total is not None else None,
+        "modules": len(entries),
+        "top_self_ms": [(name, round(us / 1000, 2)) for name, us, _ in sorted(entries, key=lambda e: -e[1])[:top]],
+        "deferred_loaded": sorted(m for m in deferred if m in loaded),
+        "error": None if proc.returncode == 0 else (proc.stderr.strip().splitlines() or ["falha sem saída"])[-1],
+    }
+
+
+def run_target(name: str, repeat: int, top: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as data_dir:
+        env = _env(data_dir)
+        # Uma execução descartada: grava os .pyc e aquece o cache de disco
+        try:
+            time_once(TARGETS[name], env)
+        except RuntimeError as e:
+            return {"error": str(e)}
+        samples = [time_once(TARGETS[name], env) for _ in range(repeat)]
+        profile = import_profile(MODULES[name], DEFERRED[name], env, top)
+    return {
+        "median_s": round(statistics.median(samples), 4),
+        "min_s": round(min(samples), 4),
+        "max_s": round(max(samples), 4),
+        "samples": len(samples),
+        **profile,
+    }
+
+
+def print_report(results: dict, previous: dict | None = None):
+    print(f"{'medida':<13} {'mediana (s)':>12} {'mín (s)':>9} {'import (s)':>11} {'módulos':>8}")
+    for name, r in results.items():
+        if "median_s" not in r:
+            print(f"{name:<13} falhou: {r['error']}")
+            continue
+        imported = f"{r['import_s']:>11.3f}" if r.get("import_s") is not None else f"{'-':>11}"
+        print(f"{name:<13} {r['median_s']:>12.3f} {r['min_s']:>9.3f} {imported} {r['modules']:>8}")
+        before = (previous or {}).get(name)
+        if before and before.get("median_s"):
+            deltas = [f"mediana {(r['median_s'] - before['median_s']) / before['median_s'] * 100:+.1f}%"]
+            if before.get("import_s") and r.get("import_s") is not None:
+                deltas.append(f"import {(r['import_s'] - before['import_s']) / before['import_s'] * 100:+.1f}%")
+            print(f"{'':<13} vs. anterior: {', '.join(deltas)}")
+        print(f"{'':<13} mais caros: {', '.join(f'{m} {ms:.1f} ms' for m, ms in r['top_self_ms'])}")
+        if r["deferred_loaded"]:
+            print(f"{'':<13} ATENÇÃO: carregados na inicialização: {', '.join(r['deferred_loaded'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização (ajuda do CLI e primeiro quadro da interface)")
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=10, help="Execuções medidas por alvo")
+    parser.add_argument("--top", type=int, default=8, help="Módulos listados por tempo próprio de import")
+    parser.add_argument("--output", help="Arquivo JSON de resultados (padrão: startup_<data>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.targets:
+        print(f"Medindo {name}...", flush=True)
+        results[name] = run_target(name, max(1, args.repeat), args.top)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            previous = json.load(fh).get("targets")
+    print()
+    print_report(results, previous)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "targets": results,
+    }
+    output = args.output or f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+    print(f"\nResultados gravados em {output}")
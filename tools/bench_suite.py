@@ -0,0 +1,350 @@
+"""
+Suíte de benchmarks offline de ponta a ponta.
+
+Um FakeCatalog (fake_youtube.py) substitui o YouTube e o range_server local serve os
+bytes com Range, latência por requisição e limite de banda. Os cenários passam pelos
+mesmos caminhos de código dos downloads reais:
+
+  single_large      baixar_video_youtube (CLI) com um arquivo grande
+  many_small        pipeline de lote com muitos vídeos pequenos
+  merge_heavy       pipeline de lote com faixas separadas e mesclagem FFmpeg
+  queue_saturation  DownloaderGUI._download_item com a fila bem maior que os workers
+
+Cada cenário roda num processo próprio (o pico de RSS é por cenário) e reporta MB/s,
+latência p50/p95 por job, tempo de CPU (processo + filhos, como o FFmpeg), pico de RSS e
+o reuso de conexões do transporte HTTP (--transport urllib mede sem o pool keep-alive).
+O resultado é gravado em JSON; --compare mostra a variação contra uma execução anterior.
+
+Uso: python tools/bench_suite.py --output resultados.json
+     python tools/bench_suite.py --scenarios many_small queue_saturation --compare antes.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_youtube import FakeCatalog  # noqa: E402
+from range_server import synthetic_payload  # noqa: E402
+from transport import PooledTransport, UrllibTransport, set_transport  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows: sem CPU dos filhos nem pico de RSS
+    resource = None
+
+MIB = 1024 * 1024
+SCENARIOS = ("single_large", "many_small", "merge_heavy", "queue_saturation")
+TRANSPORTS = {"pooled": PooledTransport, "urllib": UrllibTransport}
+
+
+def _cpu_seconds() -> float:
+    if resource is None:
+        return time.process_time()
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return peak / MIB if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Descarta as mensagens de progresso impressas pela CLI e pelo lote."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def media_payloads(duration: int) -> tuple[bytes, bytes, bool]:
+    """
+    Faixas H.264 e AAC reais (MP4 fragmentado, legível por pipe na mesclagem em streaming)
+    geradas pelo FFmpeg. Sem FFmpeg utilizável, usa bytes sintéticos e retorna real=False.
+    """
+    from media import _resolve_ffmpeg
+
+    ffmpeg_bin = _resolve_ffmpeg()
+    if ffmpeg_bin:
+        with tempfile.TemporaryDirectory() as tmp:
+            video, audio = os.path.join(tmp, "v.mp4"), os.path.join(tmp, "a.m4a")
+            frag = ["-movflags", "frag_keyframe+empty_moov"]
+            try:
+                subprocess.run(
+                    [ffmpeg_bin, "-y", "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={duration}",
+                     "-an", "-c:v", "libx264", "-preset", "ultrafast", *frag, video],
+                    check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                subprocess.run(
+                    [ffmpeg_bin, "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+                     "-vn", "-c:a", "aac", "-b:a", "128k", *frag, audio],
+                    check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                with open(video, "rb") as v, open(audio, "rb") as a:
+                    return v.read(), a.read(), True
+            except (OSError, subprocess.CalledProcessError):
+                pass
+    return synthetic_payload(4 * MIB), synthetic_payload(MIB // 2), False
+
+
+# --- cenários: cada um recebe (catálogo, pasta de saída, args) e retorna (jobs, latências, erros, notas) ---
+
+
+def scenario_single_large(catalog: FakeCatalog, out_dir: str, args) -> tuple[int, list[float], int, dict]:
+    from YouTubeDonwloader import baixar_video_youtube
+
+    url = catalog.add_progressive("arquivo grande", synthetic_payload(args.large_mb * MIB))
+    t0 = time.perf_counter()
+    with _quiet():
+        baixar_video_youtube(url, modo_auto=True, saida_dir=out_dir, segmentos=args.segments, usar_cache=False)
+    latency = time.perf_counter() - t0
+    errors = 0 if os.listdir(out_dir) else 1
+    return 1, [latency], errors, {}
+
+
+def _run_batch(urls: list[str], out_dir: str, args) -> tuple[list[float], int]:
+    from batch import BatchRunner
+
+    runner = BatchRunner(out_dir, downloads=args.workers, segments=args.segments, usar_cache=False)
+    with _quiet():
+        jobs = runner.run(urls)
+    return [j.elapsed for j in jobs], sum(1 for j in jobs if not j.ok)
+
+
+def scenario_many_small(catalog: FakeCatalog, out_dir: str, args) -> tuple[int, list[float], int, dict]:
+    payload = synthetic_payload(args.small_kb * 1024)
+    urls = [catalog.add_progressive(f"pequeno {i}", payload) for i in range(args.small_count)]
+    latencies, errors = _run_batch(urls, out_dir, args)
+    return len(urls), latencies, errors, {}
+
+
+def scenario_merge_heavy(catalog: FakeCatalog, out_dir: str, args) -> tuple[int, list[float], int, dict]:
+    video, audio, real = media_payloads(args.merge_duration)
+    urls = [catalog.add_adaptive(f"mesclagem {i}", video, audio) for i in range(args.merge_count)]
+    latencies, errors = _run_batch(urls, out_dir, args)
+    return len(urls), latencies, errors, {"real_media": real}
+
+
+class _NoTk:
+    """Raiz e widgets nulos: as atualizações de tela são descartadas."""
+
+    def after(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+def scenario_queue_saturation(catalog: FakeCatalog, out_dir: str, args) -> tuple[int, list[float], int, dict]:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from gui_app import PREFETCH_WORKERS, DownloaderGUI, QueueItem
+    from progress import ProgressBus
+    from scheduler import DownloadScheduler
+
+    class HeadlessGUI(DownloaderGUI):
+        """DownloaderGUI sem Tk: só o estado usado por _start_item_download, _prefetch e _download_item."""
+
+        def __init__(self, workers: int):
+            self.root = _NoTk()
+            self.status_var = _NoTk()
+            self.queue_view = _NoTk()
+            self.queue_items = {}
+            self.progress_bus = ProgressBus()
+            self.scheduler = DownloadScheduler(workers=workers, max_fetches=workers)
+            self.prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+            self.archive = None
+            self.store = None
+            self._pending_bytes = {}
+            self._persisted_at = 0.0
+            self.finished_at = {}
+
+        def _set_item_status(self, item, status):
+            super()._set_item_status(item, status)
+            if status == "Concluído" or status.startswith("Erro"):
+                self.finished_at[item.id] = time.perf_counter()
+
+    gui = HeadlessGUI(args.workers)
+    payload = synthetic_payload(args.queue_kb * 1024)
+    submitted = {}
+    items = []
+    for i in range(args.queue_count):
+        item = QueueItem(catalog.add_progressive(f"fila {i}", payload), "(carregando...)", "Automático", "Automático", out_dir)
+        gui.queue_items[item.id] = item
+        submitted[item.id] = time.perf_counter()
+        gui._start_item_download(item)
+        gui._prefetch(item)
+        items.append(item)
+    for item in items:
+        item.job.done_event.wait()
+    gui.scheduler.shutdown()
+    gui.prefetch_pool.shutdown()
+    latencies = [gui.finished_at[i.id] - submitted[i.id] for i in items if i.id in gui.finished_at]
+    errors = sum(1 for i in items if i.status != "Concluído")
+    return len(items), latencies, errors, {}
+
+
+def run_scenario(name: str, args) -> dict:
+    catalog = FakeCatalog(
+        rate=args.rate,
+        total_rate=args.total_rate,
+        latency=args.latency,
+        extract_latency=args.extract_latency,
+        connect_latency=args.connect_latency,
+    )
+    transport = TRANSPORTS[args.transport]()
+    set_transport(transport).close()
+    out_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        with catalog:
+            cpu0 = _cpu_seconds()
+            t0 = time.perf_counter()
+            jobs, latencies, errors, notes = globals()[f"scenario_{name}"](catalog, out_dir, args)
+            wall = time.perf_counter() - t0
+            cpu = _cpu_seconds() - cpu0
+        total_bytes = _dir_bytes(out_dir)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return {
+        "jobs": jobs,
+        "errors": errors,
+        "bytes": total_bytes,
+        "wall_s": round(wall, 4),
+        "mb_s": round(total_bytes / MIB / wall, 3) if wall else None,
+        "latency_p50_s": _round(_percentile(latencies, 50)),
+        "latency_p95_s": _round(_percentile(latencies, 95)),
+        "latency_mean_s": _round(statistics.fmean(latencies) if latencies else None),
+        "cpu_s": round(cpu, 4),
+        "peak_rss_mb": _round(_peak_rss_mb()),
+        "http_requests": transport.stats.requests,
+        "http_connections": transport.stats.connections_opened,
+        "http_reuse_ratio": _round(transport.stats.reuse_ratio),
+        **notes,
+    }
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 4)
+
+
+def run_isolated(name: str, argv: list[str]) -> dict:
+    """
+    Roda o cenário num processo filho, que imprime o resultado em JSON na última linha.
+    O filho usa uma pasta de cache própria: manifestos de execuções anteriores apontariam
+    para servidores que já não existem (e o cache do usuário fica intocado).
+    """
+    with tempfile.TemporaryDirectory(prefix="bench_cache_") as cache_dir:
+        env = dict(os.environ, XDG_CACHE_HOME=cache_dir, LOCALAPPDATA=cache_dir)
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, "--child", name], capture_output=True, text=True, env=env)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr.strip().splitlines() or ["falha sem saída"])[-1]}
+    return json.loads(lines[-1])
+
+
+def print_report(results: dict, previous: dict | None = None):
+    print(
+        f"{'cenário':<18} {'jobs':>5} {'erros':>5} {'MB/s':>9} {'p50 (s)':>9} {'p95 (s)':>9} {'CPU (s)':>9} {'RSS (MB)':>9} {'reuso':>7}"
+    )
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:<18} falhou: {r['error']}")
+            continue
+        cells = [r["mb_s"], r["latency_p50_s"], r["latency_p95_s"], r["cpu_s"], r["peak_rss_mb"]]
+        reuse = f"{r['http_reuse_ratio']:>7.1%}" if r.get("http_reuse_ratio") is not None else f"{'-':>7}"
+        print(
+            f"{name:<18} {r['jobs']:>5} {r['errors']:>5} "
+            + " ".join(f"{c:>9.3f}" if c is not None else f"{'-':>9}" for c in cells)
+            + f" {reuse}"
+        )
+        before = (previous or {}).get(name)
+        if before and "error" not in before:
+            deltas = []
+            for key, label in (("mb_s", "MB/s"), ("latency_p95_s", "p95"), ("cpu_s", "CPU"), ("peak_rss_mb", "RSS")):
+                if before.get(key) and r.get(key) is not None:
+                    deltas.append(f"{label} {(r[key] - before[key]) / before[key] * 100:+.1f}%")
+            print(f"{'':<18} vs. anterior: {', '.join(deltas)}")
+        if r.get("real_media") is False:
+            print(f"{'':<18} (sem FFmpeg utilizável: mesclagem medida com bytes sintéticos)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks offline de ponta a ponta")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--output", help="Arquivo JSON de resultados (padrão: bench_<data>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--rate", type=int, default=8 * MIB, help="Banda por conexão em bytes/s (0 = sem limite)")
+    parser.add_argument("--total-rate", type=int, default=0, help="Banda total do servidor em bytes/s (0 = sem limite)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latência por requisição em segundos")
+    parser.add_argument("--extract-latency", type=float, default=0.05, help="Tempo simulado de extração por vídeo")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="Atraso por conexão nova (handshake TCP/TLS)")
+    parser.add_argument("--transport", choices=sorted(TRANSPORTS), default="pooled", help="Transporte HTTP dos downloads")
+    parser.add_argument("--workers", type=int, default=3, help="Downloads simultâneos no lote e na fila")
+    parser.add_argument("--segments", type=int, default=4)
+    parser.add_argument("--large-mb", type=int, default=128)
+    parser.add_argument("--small-count", type=int, default=100)
+    parser.add_argument("--small-kb", type=int, default=512)
+    parser.add_argument("--merge-count", type=int, default=8)
+    parser.add_argument("--merge-duration", type=int, default=30, help="Duração em segundos das faixas geradas")
+    parser.add_argument("--queue-count", type=int, default=200)
+    parser.add_argument("--queue-kb", type=int, default=256)
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args)))
+        sys.exit(0)
+
+    argv = sys.argv[1:]
+    results = {}
+    for name in args.scenarios:
+        print(f"Executando {name}...", flush=True)
+        results[name] = run_isolated(name, argv)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            previous = json.load(fh).get("scenarios")
+    print()
+    print_report(results, previous)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "child", "scenarios")},
+        "scenarios": results,
+    }
+    output = args.output or f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+    print(f"\nResultados gravados em {output}")
@@ -0,0 +1,181 @@
+"""
+Substituto local do YouTube para os benchmarks offline.
+
+Um FakeCatalog guarda vídeos sintéticos (título + manifesto de streams) cujos bytes são
+servidos pelo range_server local. Instalado com manifest_cache.set_video_factory, faz a
+CLI, o lote e a interface resolverem URLs "https://www.youtube.com/watch?v=<id>" sem
+nenhum acesso à rede externa, pelo mesmo caminho de código dos downloads reais. Com
+url_ttl, as URLs dos streams vencem como as assinadas do YouTube (o servidor responde 403
+depois do `expire`) e cada extração entrega URLs novas; faults injeta falhas no servidor.
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manifest_cache import CachedVideo, extract_video_id, set_collection_factory, set_video_factory  # noqa: E402
+from range_server import Faults, start_server  # noqa: E402
+
+# (mime_type, codecs) por tipo de faixa
+PROGRESSIVE_MP4 = ("video/mp4", ["avc1.64001F", "mp4a.40.2"])
+VIDEO_MP4 = ("video/mp4", ["avc1.640028"])
+AUDIO_MP4 = ("audio/mp4", ["mp4a.40.2"])
+# Entradas por página na listagem de playlists e canais, como no YouTube
+COLLECTION_PAGE = 30
+# Miniatura servida em /<id>/thumb.jpg (só os bytes importam para --embed-thumbnail)
+THUMBNAIL = b"\xff\xd8\xff\xe0" + bytes(1020)
+
+
+def _stream(itag: int, path: str, payload: bytes, kind: str, mime: tuple, resolution: str | None, abr: str | None) -> dict:
+    mime_type, codecs = mime
+    return {
+        "itag": itag,
+        "url": path,
+        "mime_type": mime_type,
+        "codecs": codecs,
+        "resolution": resolution,
+        "abr": abr,
+        "bitrate": len(payload) * 8,
+        "fps": 30 if kind != "audio" else None,
+        "filesize": len(payload),
+        "is_progressive": kind == "progressive",
+        "is_adaptive": kind != "progressive",
+        "includes_video_track": kind != "audio",
+        "includes_audio_track": kind != "video",
+    }
+
+
+class FakeCatalog:
+    """
+    Catálogo de vídeos falsos servido por um range_server em thread daemon.
+
+    O próprio catálogo é a fábrica passada a set_video_factory: chamado com a URL, espera
+    extract_latency (simulando a extração) e devolve um CachedVideo com URLs locais. As
+    extrações são contadas em extractions.
+    """
+
+    def __init__(
+        self,
+        rate: int = 0,
+        total_rate: int = 0,
+        latency: float = 0.0,
+        extract_latency: float = 0.0,
+        connect_latency: float = 0.0,
+        faults: Faults | None = None,
+        url_ttl: float = 0.0,
+    ):
+        self.extract_latency = extract_latency
+        self.url_ttl = url_ttl
+        self.extractions = 0
+        if url_ttl:
+            faults = faults or Faults()
+            faults.check_expire = True
+        self.faults = faults
+        self._manifests = {}
+        # URL da coleção -> URLs dos vídeos na ordem da listagem
+        self._collections = {}
+        self.pages_listed = 0
+        # O servidor consulta este dicionário a cada requisição, então vídeos podem ser
+        # incluídos depois de iniciado
+        self._payloads = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.server, self.base_url = start_server(
+            self._payloads, rate, latency=latency, total_rate=total_rate, connect_latency=connect_latency, faults=faults
+        )
+
+    def _new_id(self) -> str:
+        with self._lock:
+            self._next_id += 1
+            return f"bench{self._next_id:06d}"
+
+    def _add(self, title: str, tracks: list) -> str:
+        video_id = self._new_id()
+        streams = []
+        for n, (kind, payload, mime, resolution, abr) in enumerate(tracks):
+            path = f"/{video_id}/{n}"
+            self._payloads[path] = payload
+            streams.append(_stream(100 + n, self.base_url + path, payload, kind, mime, resolution, abr))
+        self._payloads[f"/{video_id}/thumb.jpg"] = THUMBNAIL
+        self._manifests[video_id] = {
+            "video_id": video_id,
+            "title": title,
+            "author": "Canal de teste",
+            "thumbnail_url": f"{self.base_url}/{video_id}/thumb.jpg",
+            "streams": streams,
+        }
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+    def add_progressive(self, title: str, payload: bytes, resolution: str = "720p") -> str:
+        """Vídeo com um único stream progressivo MP4; retorna a URL de watch."""
+        return self._add(title, [("progressive", payload, PROGRESSIVE_MP4, resolution, "128kbps")])
+
+    def add_adaptive(self, title: str, video: bytes, audio: bytes, resolution: str = "1080p", video_mime=VIDEO_MP4, audio_mime=AUDIO_MP4) -> str:
+        """Vídeo só com faixas separadas (exige mesclagem); retorna a URL de watch."""
+        return self._add(title, [("video", video, video_mime, resolution, None), ("audio", audio, audio_mime, None, "128kbps")])
+
+    def add_channel(self, name: str, video_urls=()) -> str:
+        """Canal com os vídeos dados (do mais antigo ao mais novo); lista do mais novo ao mais antigo."""
+        url = f"https://www.youtube.com/@{name}"
+        self._collections[url] = list(video_urls)[::-1]
+        return url
+
+    def add_playlist(self, name: str, video_urls=()) -> str:
+        """Playlist com os vídeos na ordem dada; novos vídeos entram no fim."""
+        url = f"https://www.youtube.com/playlist?list=PL{name}"
+        self._collections[url] = list(video_urls)
+        return url
+
+    def publish(self, collection_url: str, video_url: str):
+        """Acrescenta um vídeo: no topo de um canal, no fim de uma playlist."""
+        entries = self._collections[collection_url]
+        if "/playlist" in collection_url:
+            entries.append(video_url)
+        else:
+            entries.insert(0, video_url)
+
+    def list_collection(self, url: str):
+        """Fábrica de set_collection_factory: entrega as URLs por páginas, contando as buscadas."""
+        entries = self._collections.get(url)
+        if entries is None:
+            raise RuntimeError(f"Playlist ou canal indisponível: {url}")
+        entries = list(entries)
+        for start in range(0, len(entries), COLLECTION_PAGE):
+            with self._lock:
+                self.pages_listed += 1
+            if self.extract_latency:
+                time.sleep(self.extract_latency)
+            yield from entries[start:start + COLLECTION_PAGE]
+
+    def __call__(self, url: str, on_progress_callback=None):
+        if self.extract_latency:
+            time.sleep(self.extract_latency)
+        manifest = self._manifests.get(extract_video_id(url) or "")
+        if manifest is None:
+            raise RuntimeError(f"Vídeo indisponível: {url}")
+        with self._lock:
+            self.extractions += 1
+        if self.url_ttl:
+            expire = int(time.time() + self.url_ttl)
+            streams = [dict(st, url=f"{st['url']}?expire={expire}") for st in manifest["streams"]]
+            manifest = dict(manifest, streams=streams)
+        return CachedVideo(manifest, on_progress_callback)
+
+    def install(self):
+        set_video_factory(self)
+        set_collection_factory(self.list_collection)
+
+    def close(self):
+        set_video_factory(None)
+        set_collection_factory(None)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,312 @@
+"""
+Servidor HTTP local com suporte a Range, usado pelos benchmarks.
+
+Serve um arquivo sintético (bytes determinísticos) em /file, ou vários arquivos por
+caminho, e pode limitar a banda por conexão e no total e acrescentar latência a cada
+requisição para simular o comportamento do YouTube. Com um Faults, injeta as falhas de que
+a recuperação dos downloads (retry.py) precisa dar conta: status de erro, conexões
+derrubadas no meio da resposta e URLs assinadas vencidas.
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ratelimit import TokenBucket  # noqa: E402
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+def synthetic_payload(size: int) -> bytes:
+    """Gera um conteúdo determinístico de size bytes."""
+    block = bytes(range(256)) * 4096
+    reps, rest = divmod(size, len(block))
+    return block * reps + block[:rest]
+
+
+class Faults:
+    """
+    Falhas injetadas nas respostas GET:
+
+      statuses      status devolvidos, em ordem, às próximas requisições (ex.: [429, 503, 500])
+      retry_after   Retry-After enviado junto com 429 e 503
+      drop_after    bytes enviados antes de derrubar a conexão, nas próximas `drops` respostas
+      check_expire  403 para URLs cujo parâmetro expire (epoch) já passou, como as assinadas do YouTube
+
+    Pode ser alterado com o servidor rodando (inject, drop); os contadores dizem o que aconteceu.
+    """
+
+    def __init__(self, statuses=(), retry_after: float | None = None, drop_after: int = 0, drops: int = 0, check_expire: bool = False):
+        self.retry_after = retry_after
+        self.check_expire = check_expire
+        self.injected = 0
+        self.dropped = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        self._statuses = deque(statuses)
+        self._drop_after = drop_after
+        self._drops = drops
+
+    def inject(self, *statuses: int):
+        with self._lock:
+            self._statuses.extend(statuses)
+
+    def drop(self, count: int, after: int):
+        """Derruba as próximas count respostas depois de after bytes."""
+        with self._lock:
+            self._drops, self._drop_after = count, after
+
+    def status_for(self, path: str) -> int | None:
+        """Status de erro para esta requisição, ou None para respondê-la normalmente."""
+        with self._lock:
+            if self.check_expire:
+                expire = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query).get("expire")
+                if expire and float(expire[0]) <= time.time():
+                    self.expired += 1
+                    return 403
+            if self._statuses:
+                self.injected += 1
+                return self._statuses.popleft()
+        return None
+
+    def cut_after(self) -> int | None:
+        """Bytes a enviar antes de derrubar esta resposta, ou None para enviá-la inteira."""
+        with self._lock:
+            if self._drops <= 0:
+                return None
+            self._drops -= 1
+            self.dropped += 1
+            return self._drop_after
+
+
+def make_handler(
+    payload: bytes | dict,
+    rate: int = 0,
+    write_chunk: int = 16 * 1024,
+    latency: float = 0.0,
+    total_rate: int = 0,
+    connect_latency: float = 0.0,
+    throttle_after: int = 0,
+    throttle_rate: int = 0,
+    max_active: int = 0,
+    faults: Faults | None = None,
+):
+    """
+    payload pode ser bytes (servido em qualquer caminho) ou {caminho: bytes}. rate limita
+    cada conexão, total_rate a soma de todas; latency (s) atrasa o início de cada resposta
+    e connect_latency (s) cada conexão nova, simulando o handshake TCP/TLS.
+
+    Para simular hosts que estrangulam: depois de throttle_after bytes de uma resposta, a
+    banda dela cai para throttle_rate; com mais de max_active respostas simultâneas, as
+    excedentes recebem 429 com Retry-After. faults injeta as falhas descritas em Faults.
+    """
+    shared = TokenBucket(total_rate) if total_rate else None
+    active = {"count": 0}
+    active_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            if connect_latency:
+                time.sleep(connect_latency)
+
+        def _payload(self) -> bytes | None:
+            if isinstance(payload, (bytes, bytearray)):
+                return payload
+            return payload.get(self.path.split("?", 1)[0])
+
+        def _not_found(self):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_HEAD(self):
+            data = self._payload()
+            if data is None:
+                self._not_found()
+                return
+            self.send_response(200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+
+        def _fail(self, status: int):
+            self.send_response(status)
+            if status in (429, 503) and faults.retry_after is not None:
+                self.send_header("Retry-After", f"{faults.retry_after:g}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            data = self._payload()
+            if data is None:
+                self._not_found()
+                return
+            status = faults.status_for(self.path) if faults is not None else None
+            if status is not None:
+                self._fail(status)
+                return
+            with active_lock:
+                rejected = bool(max_active) and active["count"] >= max_active
+                if not rejected:
+                    active["count"] += 1
+            if rejected:
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            try:
+                self._send_range(data)
+            finally:
+                with active_lock:
+                    active["count"] -= 1
+
+        def _send_range(self, data: bytes):
+            if latency:
+                time.sleep(latency)
+            total = len(data)
+            start, end = 0, total - 1
+            status = 200
+            header = self.headers.get("Range")
+            if header:
+                m = _RANGE_RE.match(header)
+                if m:
+                    start = int(m.group(1))
+                    if m.group(2):
+                        end = min(int(m.group(2)), total - 1)
+                    status = 206
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{total}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{total}")
+            self.end_headers()
+
+            cut = faults.cut_after() if faults is not None else None
+            if cut is not None:
+                # Content-Length promete a faixa inteira: o cliente vê a resposta truncada
+                end = min(end, start + cut - 1)
+                self.close_connection = True
+            pos = start
+            t0 = time.perf_counter()
+            sent = 0
+            throttled_at = throttled_sent = None
+            while pos <= end:
+                n = min(write_chunk, end - pos + 1)
+                try:
+                    self.wfile.write(data[pos:pos + n])
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                pos += n
+                sent += n
+                if shared is not None:
+                    shared.consume(n)
+                if throttle_rate and sent > throttle_after:
+                    if throttled_at is None:
+                        throttled_at, throttled_sent = time.perf_counter(), sent
+                    ahead = (sent - throttled_sent) / throttle_rate - (time.perf_counter() - throttled_at)
+                elif rate:
+                    # Limita a banda desta conexão a `rate` bytes/s
+                    ahead = sent / rate - (time.perf_counter() - t0)
+                else:
+                    ahead = 0
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    return Handler
+
+
+def start_server(
+    payload: bytes | dict,
+    rate: int = 0,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    total_rate: int = 0,
+    connect_latency: float = 0.0,
+    throttle_after: int = 0,
+    throttle_rate: int = 0,
+    max_active: int = 0,
+    faults: Faults | None = None,
+):
+    """
+    Inicia o servidor em thread daemon e retorna (server, url). Com payload em bytes a
+    url aponta para /file; com um dicionário de caminhos, é a raiz do servidor.
+    """
+    handler = make_handler(
+        payload,
+        rate,
+        latency=latency,
+        total_rate=total_rate,
+        connect_latency=connect_latency,
+        throttle_after=throttle_after,
+        throttle_rate=throttle_rate,
+        max_active=max_active,
+        faults=faults,
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://{host}:{server.server_address[1]}"
+    return server, base + "/file" if isinstance(payload, (bytes, bytearray)) else base
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor HTTP local com suporte a Range")
+    parser.add_argument("--size", type=int, default=64 * 1024 * 1024, help="Tamanho do arquivo sintético em bytes")
+    parser.add_argument("--rate", type=int, default=0, help="Limite de banda por conexão em bytes/s (0 = sem limite)")
+    parser.add_argument("--total-rate", type=int, default=0, help="Limite de banda somando todas as conexões (0 = sem limite)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Atraso em segundos antes de cada resposta")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="Atraso em segundos a cada conexão nova")
+    parser.add_argument("--throttle-after", type=int, default=0, help="Bytes de cada resposta antes do estrangulamento")
+    parser.add_argument("--throttle-rate", type=int, default=0, help="Banda (bytes/s) de uma resposta estrangulada")
+    parser.add_argument("--max-active", type=int, default=0, help="Respostas simultâneas antes de responder 429")
+    parser.add_argument("--fail", default="", help="Status devolvidos às primeiras requisições, em ordem (ex.: 429,429,503)")
+    parser.add_argument("--retry-after", type=float, help="Retry-After (s) enviado com os 429/503 de --fail")
+    parser.add_argument("--drop-after", type=int, default=0, help="Bytes enviados antes de derrubar a conexão (com --drops)")
+    parser.add_argument("--drops", type=int, default=0, help="Respostas derrubadas depois de --drop-after bytes")
+    parser.add_argument("--check-expire", action="store_true", help="Responde 403 a URLs com o parâmetro expire vencido")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    srv, url = start_server(
+        synthetic_payload(args.size),
+        args.rate,
+        port=args.port,
+        latency=args.latency,
+        total_rate=args.total_rate,
+        connect_latency=args.connect_latency,
+        throttle_after=args.throttle_after,
+        throttle_rate=args.throttle_rate,
+        max_active=args.max_active,
+        faults=Faults(
+            [int(s) for s in args.fail.split(",") if s.strip()], args.retry_after, args.drop_after, args.drops, args.check_expire
+        ),
+    )
+    print(f"Servindo {args.size} bytes em {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,286 @@
+"""
+Camada de transporte HTTP usada em todas as buscas de streams.
+
+O PooledTransport mantém conexões keep-alive por host (esquema, host, porta): cada faixa
+de bytes reaproveita uma conexão já aberta em vez de pagar TCP e TLS de novo, entre o
+vídeo, o áudio e os jobs seguintes. O UrllibTransport reproduz o comportamento antigo
+(uma conexão por requisição). O transporte ativo é trocado com set_transport, por
+exemplo nos benchmarks, e seus contadores aparecem nas métricas (ver metrics.py).
+"""
+import collections
+import http.client
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+
+from metrics import get_recorder
+
+DEFAULT_POOL_SIZE = 8  # conexões ociosas guardadas por host
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_READ_SIZE = 64 * 1024
+# Conexões ociosas há mais tempo que isso são descartadas (servidores fecham antes)
+IDLE_TIMEOUT = 60
+MAX_REDIRECTS = 5
+# Resto de corpo pequeno o bastante para ler e devolver a conexão ao pool
+_DRAIN_LIMIT = 64 * 1024
+_REDIRECTS = (301, 302, 303, 307, 308)
+# Erros de uma conexão reaproveitada que o servidor já fechou: repete numa conexão nova
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class HTTPStatusError(IOError):
+    """Resposta 4xx/5xx (ex.: 403 de URL expirada, 429 de throttling)."""
+
+    def __init__(self, status: int, url: str, headers=None):
+        super().__init__(f"HTTP {status} para {url}")
+        self.status = status
+        self.url = url
+        self.headers = headers
+
+
+class TooManyRedirects(IOError):
+    """A URL redirecionou mais de MAX_REDIRECTS vezes (provável laço de redirecionamento)."""
+
+    def __init__(self, url: str):
+        super().__init__(f"Mais de {MAX_REDIRECTS} redirecionamentos para {url}")
+        self.url = url
+
+
+class TransportStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.stale_retries = 0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Fração das requisições atendidas por uma conexão já aberta."""
+        return self.connections_reused / self.requests if self.requests else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "http_requests_total": self.requests,
+            "http_connections_opened_total": self.connections_opened,
+            "http_connections_reused_total": self.connections_reused,
+            "http_stale_retries_total": self.stale_retries,
+            "http_connection_reuse_ratio": round(self.reuse_ratio, 4),
+        }
+
+
+class PooledResponse:
+    """Resposta de PooledTransport.request; ao fechar, a conexão volta ao pool se puder ser reusada."""
+
+    def __init__(self, transport, key, conn, resp):
+        self._transport = transport
+        self._key = key
+        self._conn = conn
+        self._resp = resp
+        self.status = resp.status
+        self.headers = resp.headers
+
+    def read(self, amt: int | None = None) -> bytes:
+        return self._resp.read(amt)
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        resp = self._resp
+        try:
+            if not resp.isclosed() and resp.length is not None and resp.length <= _DRAIN_LIMIT:
+                resp.read()
+        except (OSError, http.client.HTTPException):
+            pass
+        if resp.isclosed() and not resp.will_close:
+            self._transport._release(self._key, conn)
+        else:
+            resp.close()
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PooledTransport:
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        read_size: int = DEFAULT_READ_SIZE,
+        socket_buffer: int = 0,
+    ):
+        """
+        pool_size limita as conexões ociosas guardadas por host (não as simultâneas, que
+        dependem dos segmentos em uso); read_size é o tamanho de cada leitura do corpo e
+        socket_buffer, se informado, o SO_RCVBUF de cada conexão.
+        """
+        self.pool_size = max(0, pool_size)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.read_size = read_size
+        self.socket_buffer = socket_buffer
+        self.stats = TransportStats()
+        self._lock = threading.Lock()
+        self._idle = collections.defaultdict(collections.deque)  # chave -> deque[(conexão, instante)]
+        self._ssl_context = None
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        """
+        Contexto TLS compartilhado, criado na primeira conexão HTTPS: carregar os certificados
+        do sistema leva dezenas de ms (mais no Windows) e não deve atrasar a abertura do app.
+        """
+        with self._lock:
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            return self._ssl_context
+
+    def _connect(self, key):
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=self.connect_timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.socket_buffer:
+            conn.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.socket_buffer)
+        self.stats.add(connections_opened=1)
+        return conn
+
+    def _acquire(self, key):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle[key]
+            while idle:
+                conn, released = idle.pop()
+                if now - released < IDLE_TIMEOUT:
+                    return conn, True
+                conn.close()
+        return self._connect(key), False
+
+    def _release(self, key, conn):
+        with self._lock:
+            idle = self._idle[key]
+            if len(idle) < self.pool_size:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def request(self, method: str, url: str, headers: dict | None = None) -> PooledResponse:
+        """
+        Envia a requisição (seguindo redirecionamentos) e retorna a resposta; 4xx/5xx levantam
+        HTTPStatusError e mais de MAX_REDIRECTS redirecionamentos, TooManyRedirects.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed = urllib.parse.urlsplit(url)
+            scheme = parsed.scheme.lower()
+            key = (scheme, parsed.hostname, parsed.port or (443 if scheme == "https" else 80))
+            path = urllib.parse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+            resp = self._send(key, method, path, headers or {})
+            if resp.status in _REDIRECTS and resp.headers.get("Location"):
+                resp.close()
+                url = urllib.parse.urljoin(url, resp.headers["Location"])
+                continue
+            if resp.status >= 400:
+                resp.close()
+                raise HTTPStatusError(resp.status, url, resp.headers)
+            return resp
+        raise TooManyRedirects(url)
+
+    def _send(self, key, method: str, path: str, headers: dict) -> PooledResponse:
+        while True:
+            conn, reused = self._acquire(key)
+            try:
+                conn.request(method, path, headers=headers)
+                resp = conn.getresponse()
+            except _STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # Conexão ociosa que o servidor fechou: tenta de novo (as próximas também podem estar velhas)
+                self.stats.add(stale_retries=1)
+                continue
+            except BaseException:
+                conn.close()
+                raise
+            self.stats.add(requests=1, connections_reused=int(reused))
+            return PooledResponse(self, key, conn, resp)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, collections.defaultdict(collections.deque)
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+
+class UrllibTransport:
+    """Uma conexão nova por requisição, como o urllib.request usado antes do pool."""
+
+    def __init__(self, read_timeout: float = DEFAULT_READ_TIMEOUT, read_size: int = DEFAULT_READ_SIZE):
+        self.read_timeout = read_timeout
+        self.read_size = read_size
+        self.stats = TransportStats()
+
+    def request(self, method: str, url: str, headers: dict | None = None):
+        # Só os benchmarks usam este transporte: o urllib.request fica fora da inicialização
+        import urllib.error
+        import urllib.request
+
+        req = urllib.request.Request(url, method=method, headers=headers or {})
+        try:
+            resp = urllib.request.urlopen(req, timeout=self.read_timeout)
+        except urllib.error.HTTPError as e:
+            e.close()
+            raise HTTPStatusError(e.code, url, e.headers) from None
+        self.stats.add(requests=1, connections_opened=1)
+        return resp
+
+    def close(self):
+        pass
+
+
+_transport = PooledTransport()
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    return _transport
+
+
+def set_transport(transport):
+    """Troca o transporte usado pelos downloads e retorna o anterior (que é fechado pelo chamador, se quiser)."""
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    return previous
+
+
+def configure(pool_size: int | None = None, read_timeout: float | None = None, read_size: int | None = None):
+    """Substitui o transporte padrão por um PooledTransport com os parâmetros informados."""
+    transport = PooledTransport(
+        pool_size=DEFAULT_POOL_SIZE if pool_size is None else pool_size,
+        read_timeout=read_timeout or DEFAULT_READ_TIMEOUT,
+        read_size=read_size or DEFAULT_READ_SIZE,
+    )
+    set_transport(transport).close()
+    return transport
+
+
+get_recorder().add_collector(lambda: get_transport().stats.snapshot())